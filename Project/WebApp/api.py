@@ -1,47 +1,330 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, make_response, flash
-from helper_scripts.db_utils import DBManager
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, make_response, flash, g, stream_with_context
+from markupsafe import Markup, escape
+from helper_scripts.db_utils import DBManager, BATCH_QUERY_SIZE
+from helper_scripts.full_text import HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE
+from helper_scripts.pagination import MAX_PAGE_SIZE
 import helper_scripts.db_init as db_init
 import pathlib as pl
 import datetime
+import ipaddress
+import json
 import os
 import sys
 import secrets
+import time
 # from werkzeug.security import generate_password_hash
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(101432 ^ 10203)
 
 DB_PATH = '/evanr/ece464.sqlite3'
+DB_INIT_PATH = pl.Path(__file__).resolve().parent / 'db_init.sql'
 ARTICLES_PATH = pl.Path('/evanr')
-db = DBManager(DB_PATH, ARTICLES_PATH)
-
-# @app.route('/api/create_user', methods=['POST'])
-# def create_user_api():
-#     data = request.json
-#     success, message = db.create_user(data['username'], data['password'])
-#     return jsonify({'success': success, 'message': message})
-
-# @app.route('/api/login', methods=['POST'])
-# def login_api():
-#     data = request.json
-#     success, token = db.log_in(data['username'], data['password'])
-#     return jsonify({'success': success, 'token': token})
-
-# @app.route('/api/logout', methods=['POST'])
-# def logout_api():
-#     data = request.json
-#     success, message = db.log_out(token=data['token'])
-#     return jsonify({'success': success, 'message': message})
-
-# @app.route('/api/create_article', methods=['POST'])
-# def create_article_api():
-#     data = request.json
-#     try:
-#         pub_date = datetime.datetime.strptime(data['publish_date'], '%Y-%m-%d').date()
-#     except ValueError:
-#         return jsonify({'success': False, 'message': 'Invalid date format. Use YYYY-MM-DD.'})
-#     success, result = db.create_article(data['token'], data['content'], data['title'], pub_date, data['authors'])
-#     return jsonify({'success': success, 'result': result})
+
+# schema and migrations are applied once per start, before DBManager reads the tables (under gunicorn.conf.py
+# this module is imported once, in the master process, and the workers are forked from it)
+if not db_init.db_init(DB_PATH, DB_INIT_PATH):
+    raise RuntimeError('Unable to initialize database.')
+# models load on first use unless WARM_UP_MODELS=1, in which case they load in the background at startup
+db = DBManager(
+    DB_PATH, ARTICLES_PATH,
+    warm_up_models=os.environ.get('WARM_UP_MODELS', '0') == '1',
+    allow_model_downloads=os.environ.get('ALLOW_MODEL_DOWNLOADS', '0') == '1',
+    session_backend=os.environ.get('SESSION_BACKEND', 'sqlite'),
+    article_store=os.environ.get('ARTICLE_STORE', 'directory'),
+    # USE_PASSAGE_INDEX=1 scores recommendations passage by passage, more precise for long articles but each one
+    # scans the whole passage matrix once per passage, and every passage vector is loaded at startup
+    use_passage_index=os.environ.get('USE_PASSAGE_INDEX', '0') == '1',
+    enable_metrics=os.environ.get('METRICS_ENABLED', '1') == '1',
+    slow_query_ms=float(os.environ['SLOW_QUERY_MS']) if os.environ.get('SLOW_QUERY_MS') else None,
+)
+
+# per-route latency and status counts, registered on the DBManager's registry so /metrics serves both
+if db.metrics is not None:
+    request_seconds = db.metrics.histogram('http_request_duration_seconds', 'Time to handle a request, by route pattern.', ('method', 'route'))
+    requests_total = db.metrics.counter('http_requests_total', 'Handled requests, by route pattern and status.', ('method', 'route', 'status'))
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            request_seconds.observe((request.method, route), time.perf_counter() - started)
+            requests_total.inc((request.method, route, str(response.status_code)))
+        return response
+
+# part of the article page etag so cached pages are revalidated after the templates change
+TEMPLATE_VERSION = format(int(max(os.path.getmtime(pl.Path(app.root_path) / 'templates' / name) for name in ('article.html', 'base.html'))), 'x')
+
+# adds the validators to an article page response, no-cache makes browsers and proxies revalidate
+# every time (the session check still runs) but a matching etag is answered with an empty 304
+def set_article_cache_headers(response, etag: str, last_modified: datetime.datetime):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Cookie')
+    return response
+
+# escapes a search snippet and turns the fts highlight markers into <mark> tags
+def highlight_snippet(snippet: str) -> Markup:
+    return Markup(str(escape(snippet)).replace(HIGHLIGHT_OPEN, '<mark>').replace(HIGHLIGHT_CLOSE, '</mark>'))
+
+# JSON API
+
+# ids accepted by one batch request, larger sets should be split or streamed in several requests
+API_MAX_BATCH = 5000
+API_MAX_CREATE_BATCH = 1000
+
+# the session token comes from an "Authorization: Bearer <token>" header, a "token" field in the json
+# body or the session cookie, returns (token, user_id) with user_id -1 when the session is invalid
+def api_session() -> tuple[str | None, int]:
+    authorization = request.headers.get('Authorization', '')
+    token = authorization[len('Bearer '):].strip() if authorization.startswith('Bearer ') else None
+    if not token:
+        body = request.get_json(silent=True)
+        token = body.get('token') if isinstance(body, dict) else None
+    if not token:
+        token = request.cookies.get('session_token')
+    if not token:
+        return (None, -1)
+    return (token, db.session_manager.validate_session(token))
+
+def api_error(message: str, status: int):
+    return jsonify({'success': False, 'message': message}), status
+
+def api_json_body() -> dict | None:
+    body = request.get_json(silent=True)
+    return body if isinstance(body, dict) else None
+
+# a list of at most limit positive integer ids, or None
+def parse_ids(value, limit: int = API_MAX_BATCH) -> list[int] | None:
+    if not isinstance(value, list) or len(value) > limit:
+        return None
+    if not all(isinstance(item, int) and not isinstance(item, bool) and item > 0 for item in value):
+        return None
+    return value
+
+# large batches can be streamed as json lines (one object per line) with ?format=jsonl or
+# "Accept: application/x-ndjson", so the client can start on the first rows while the rest are fetched
+def wants_json_lines() -> bool:
+    return request.args.get('format') == 'jsonl' or request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+def json_lines(rows):
+    return Response(stream_with_context(json.dumps(row) + '\n' for row in rows), mimetype='application/x-ndjson')
+
+# ?limit=&cursor= of a listing page, returns (limit, cursor) or None when limit is not a number in range
+# the cursor is checked by the DBManager, which answers 'Invalid cursor.' for one it did not hand out
+def page_args(default_limit: int = 20) -> tuple[int, str | None] | None:
+    try:
+        limit = int(request.args.get('limit', default_limit))
+    except ValueError:
+        return None
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return None
+    return (limit, request.args.get('cursor') or None)
+
+def page_response(result: tuple[list[tuple], str | None], fields: tuple[str, ...]):
+    rows, next_cursor = result
+    return jsonify({'success': True, 'articles': [dict(zip(fields, row)) for row in rows], 'next_cursor': next_cursor})
+
+def parse_publish_date(value) -> datetime.date | None:
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/api/create_user', methods=['POST'])
+def create_user_api():
+    data = api_json_body()
+    if data is None or not isinstance(data.get('username'), str) or not isinstance(data.get('password'), str):
+        return api_error('Expected a json object with username and password.', 400)
+    success, message = db.create_user(data['username'], data['password'])
+    return jsonify({'success': success, 'message': message})
+
+@app.route('/api/login', methods=['POST'])
+def login_api():
+    data = api_json_body()
+    if data is None or not isinstance(data.get('username'), str) or not isinstance(data.get('password'), str):
+        return api_error('Expected a json object with username and password.', 400)
+    success, token = db.log_in(data['username'], data['password'])
+    if not success:
+        return api_error(token, 401)
+    return jsonify({'success': success, 'token': token})
+
+@app.route('/api/logout', methods=['POST'])
+def logout_api():
+    token, user_id = api_session()
+    if user_id == -1:
+        return api_error('Invalid Session', 401)
+    success, message = db.log_out(token=token)
+    return jsonify({'success': success, 'message': message})
+
+# validates one {title, authors, content, publish_date} object and creates the article
+def create_article_from_json(token: str, article) -> tuple[bool, str | int | None]:
+    if not isinstance(article, dict) or not all(isinstance(article.get(key), str) for key in ('title', 'authors', 'content')):
+        return (False, 'Expected title, authors and content strings.')
+    publish_date = parse_publish_date(article.get('publish_date')) if article.get('publish_date') else datetime.date.today()
+    if publish_date is None:
+        return (False, 'Invalid date format. Use YYYY-MM-DD.')
+    return db.create_article(token, article['content'], article['title'], publish_date, article['authors'])
+
+@app.route('/api/create_article', methods=['POST'])
+def create_article_api():
+    token, user_id = api_session()
+    if user_id == -1:
+        return api_error('Invalid Session', 401)
+    success, result = create_article_from_json(token, api_json_body())
+    return jsonify({'success': success, 'result': result}), 200 if success else 400
+
+# {"articles": [{title, authors, content, publish_date}, ...]}, one result per article in order:
+# {"index": i, "success": true, "article_id": id} or {"index": i, "success": false, "message": ...}
+@app.route('/api/articles/create_batch', methods=['POST'])
+def create_articles_api():
+    token, user_id = api_session()
+    if user_id == -1:
+        return api_error('Invalid Session', 401)
+    data = api_json_body()
+    articles = data.get('articles') if data is not None else None
+    if not isinstance(articles, list) or len(articles) > API_MAX_CREATE_BATCH:
+        return api_error(f'Expected "articles", a list of at most {API_MAX_CREATE_BATCH} articles.', 400)
+
+    def results():
+        for index, article in enumerate(articles):
+            success, result = create_article_from_json(token, article)
+            yield {'index': index, 'success': True, 'article_id': result} if success else {'index': index, 'success': False, 'message': result}
+
+    if wants_json_lines():
+        return json_lines(results())
+    return jsonify({'success': True, 'results': list(results())})
+
+# {"ids": [...], "fields": ["metadata", "text", "summary"]}, metadata is always included
+# returns the active articles among ids in request order, unknown and deleted ids are left out
+@app.route('/api/articles/batch', methods=['POST'])
+def articles_batch_api():
+    token, user_id = api_session()
+    if user_id == -1:
+        return api_error('Invalid Session', 401)
+    data = api_json_body()
+    article_ids = parse_ids(data.get('ids')) if data is not None else None
+    fields = data.get('fields', ['metadata']) if data is not None else None
+    if article_ids is None:
+        return api_error(f'Expected "ids", a list of at most {API_MAX_BATCH} article ids.', 400)
+    if not isinstance(fields, list) or not set(fields) <= {'metadata', 'text', 'summary'}:
+        return api_error('"fields" may contain metadata, text and summary.', 400)
+    include_text, include_summary = 'text' in fields, 'summary' in fields
+
+    if wants_json_lines():
+        def rows():
+            for start in range(0, len(article_ids), BATCH_QUERY_SIZE):
+                success, result = db.get_articles_batch(article_ids[start:start + BATCH_QUERY_SIZE], include_text, include_summary)
+                if not success:
+                    yield {'success': False, 'message': result}
+                    return
+                yield from result
+        return json_lines(rows())
+    success, result = db.get_articles_batch(article_ids, include_text, include_summary)
+    if not success:
+        return api_error(result, 500)
+    return jsonify({'success': True, 'articles': result})
+
+# {"article_ids": [...], "k": 3}, up to k unread similar articles for each id (the reader is the session's user)
+@app.route('/api/recommendations/batch', methods=['POST'])
+def recommendations_batch_api():
+    token, user_id = api_session()
+    if user_id == -1:
+        return api_error('Invalid Session', 401)
+    data = api_json_body()
+    article_ids = parse_ids(data.get('article_ids'), limit=API_MAX_BATCH) if data is not None else None
+    k = data.get('k', 1) if data is not None else None
+    if article_ids is None:
+        return api_error(f'Expected "article_ids", a list of at most {API_MAX_BATCH} article ids.', 400)
+    if not isinstance(k, int) or not 1 <= k <= 20:
+        return api_error('"k" must be an integer between 1 and 20.', 400)
+
+    def rows(batch: list[int]) -> tuple[bool, list[dict] | str]:
+        success, result = db.get_recommended_articles(batch, user_id, k)
+        if not success:
+            return (False, result)
+        return (True, [{'article_id': article_id, 'recommendations': [{'article_id': other_id, 'score': float(score)} for other_id, score in recommendations]} for article_id, recommendations in result.items()])
+
+    if wants_json_lines():
+        def stream():
+            for start in range(0, len(article_ids), BATCH_QUERY_SIZE):
+                success, result = rows(article_ids[start:start + BATCH_QUERY_SIZE])
+                if not success:
+                    yield {'success': False, 'message': result}
+                    return
+                yield from result
+        return json_lines(stream())
+    success, result = rows(article_ids)
+    if not success:
+        return api_error(result, 500)
+    return jsonify({'success': True, 'recommendations': result})
+
+# listings are paged newest first, pass next_cursor back as ?cursor= for the following page (null on the last one)
+@app.route('/api/articles/recent', methods=['GET'])
+def recent_articles_api():
+    token, user_id = api_session()
+    if user_id == -1:
+        return api_error('Invalid Session', 401)
+    args = page_args()
+    if args is None:
+        return api_error(f'"limit" must be an integer between 1 and {MAX_PAGE_SIZE}.', 400)
+    success, result = db.get_recent_articles_page(*args)
+    if not success:
+        return api_error(result, 400 if result == 'Invalid cursor.' else 500)
+    return page_response(result, ('article_id', 'title', 'submitter'))
+
+# ?title=..., articles whose title matches, newest first
+@app.route('/api/articles/search', methods=['GET'])
+def search_articles_api():
+    token, user_id = api_session()
+    if user_id == -1:
+        return api_error('Invalid Session', 401)
+    args = page_args()
+    if args is None:
+        return api_error(f'"limit" must be an integer between 1 and {MAX_PAGE_SIZE}.', 400)
+    success, result = db.search_articles_by_title_page(request.args.get('title', ''), *args)
+    if not success:
+        if result == 'No matching articles found.':
+            return jsonify({'success': True, 'articles': [], 'next_cursor': None})
+        return api_error(result, 400 if result == 'Invalid cursor.' else 500)
+    return page_response(result, ('article_id', 'title', 'submitter'))
+
+# the session user's own active articles, newest first
+@app.route('/api/profile/articles', methods=['GET'])
+def profile_articles_api():
+    token, user_id = api_session()
+    if user_id == -1:
+        return api_error('Invalid Session', 401)
+    args = page_args()
+    if args is None:
+        return api_error(f'"limit" must be an integer between 1 and {MAX_PAGE_SIZE}.', 400)
+    success, result = db.get_articles_by_submitter_page(user_id, *args)
+    if not success:
+        return api_error(result, 400 if result == 'Invalid cursor.' else 500)
+    return page_response(result, ('article_id', 'title'))
+
+# ?k=5, the session user's "for you" articles (as on /home) with their scores, best first
+@app.route('/api/feed', methods=['GET'])
+def feed_api():
+    token, user_id = api_session()
+    if user_id == -1:
+        return api_error('Invalid Session', 401)
+    try:
+        k = int(request.args.get('k', 5))
+    except ValueError:
+        k = 0
+    if not 1 <= k <= MAX_PAGE_SIZE:
+        return api_error(f'"k" must be an integer between 1 and {MAX_PAGE_SIZE}.', 400)
+    success, feed = db.get_user_feed(user_id, k)
+    if not success:
+        return api_error(feed, 500)
+    return jsonify({'success': True, 'articles': [{'article_id': article_id, 'score': score} for article_id, score in feed]})
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -58,7 +341,7 @@ def login():
             success, token_or_msg = db.log_in(username, password)
             if success:
                 response = make_response(redirect(url_for('home')))
-                response.set_cookie('session_token', token_or_msg, httponly=True, samesite='Lax')
+                response.set_cookie('session_token', token_or_msg, max_age=int(db.session_manager.ttl_seconds), httponly=True, samesite='Lax')
                 return response
             else:
                 login_error = token_or_msg
@@ -70,7 +353,7 @@ def login():
                 login_success, token = db.log_in(username, password)
                 if login_success:
                     response = make_response(redirect(url_for('home')))
-                    response.set_cookie('session_token', token, httponly=True, samesite='Lax')
+                    response.set_cookie('session_token', token, max_age=int(db.session_manager.ttl_seconds), httponly=True, samesite='Lax')
                     return response
                 else:
                     signup_error = token
@@ -104,20 +387,55 @@ def home():
         return redirect(url_for('login'))
     results = []
     error = None
+    mode = 'title'
+    title = ''
+    limit = 5
+    next_cursor = None
     if request.method == 'POST':
         title = request.form.get('title', '')
+        mode = request.form.get('mode', 'title')
         try:
             limit = int(request.form.get('limit', 5))
             limit = max(1, min(limit, 20))
         except ValueError:
             limit = 5
-        success, result = db.search_articles_by_title(title, limit)
-        if success:
-            results = result
+        if mode in ('fulltext', 'hybrid'):
+            if mode == 'hybrid':
+                success, result = db.hybrid_search(title, limit)
+            else:
+                success, result = db.search_articles(title, limit)
+            if success:
+                results = [(article_id, title, submitter, highlight_snippet(snippet) if snippet else None) for article_id, title, submitter, snippet in result]
         else:
+            # title matches are listed newest first, the "next" form posts the cursor back for the following page
+            success, result = db.search_articles_by_title_page(title, limit, request.form.get('cursor') or None)
+            if success:
+                rows, next_cursor = result
+                results = [(article_id, title, submitter, None) for article_id, title, submitter in rows]
+        if not success:
             error = result
     recent_articles = db.get_most_recent_articles(3)
-    return render_template('home.html', results=results, recent_articles=recent_articles, error=error)
+    # unread articles closest to what the user has been reading, empty until their first read
+    for_you = []
+    success, feed = db.get_user_feed(user_id, 5)
+    if success and feed:
+        found, articles = db.get_articles_batch([article_id for article_id, _ in feed])
+        if found:
+            for_you = [(article['article_id'], article['title'], article['submitter']) for article in articles]
+    return render_template('home.html', results=results, recent_articles=recent_articles, for_you=for_you, error=error, mode=mode, query=title, limit=limit, next_cursor=next_cursor)
+
+# every active article, newest first, ?cursor= pages through them
+@app.route('/recent', methods=['GET'])
+def recent_articles():
+    token = request.cookies.get('session_token')
+    if not token or db.session_manager.validate_session(token) == -1:
+        return redirect(url_for('login'))
+    cursor = request.args.get('cursor') or None
+    success, result = db.get_recent_articles_page(20, cursor)
+    if not success:
+        return redirect(url_for('recent_articles'))
+    articles, next_cursor = result
+    return render_template('recent.html', articles=articles, next_cursor=next_cursor, first_page=cursor is None)
 
 @app.route('/article/<int:article_id>', methods=['GET', 'POST'])
 def view_article(article_id):
@@ -128,6 +446,7 @@ def view_article(article_id):
     if user_id == -1:
         return redirect(url_for('login'))
     summary = None
+    summary_pending = False
     show_summary = False
     error = None
     if request.method == 'POST':
@@ -137,6 +456,7 @@ def view_article(article_id):
             success, result = db.get_article_summary(token, article_id)
             if success:
                 summary = result
+                summary_pending = result is None
             else:
                 error = result
         elif action == 'hide_summary':
@@ -144,15 +464,21 @@ def view_article(article_id):
         elif action == 'recommend':
             success, result = db.get_recommended_article(article_id, user_id)
             if success:
-                return redirect(url_for('view_article', article_id=result))
+                return redirect(url_for('view_article', article_id=result[0][0]))
             else:
                 error = result
 
+    validators = db.get_article_validators(article_id) if request.method == 'GET' else None
+    if validators is not None:
+        etag, last_modified = f'{validators[0]}-{TEMPLATE_VERSION}', validators[1]
+        if request.if_none_match.contains(etag) or (not request.if_none_match and request.if_modified_since is not None and request.if_modified_since >= last_modified):
+            db.log_article_read(user_id, article_id)
+            return set_article_cache_headers(make_response('', 304), etag, last_modified)
+
     success, article_text = db.get_article_text(article_id)
     if not success:
         return f'Error: {article_text}', 404
-    cursor = db.conn.execute('SELECT title, authors_str, publish_day, publish_month, publish_year FROM articles WHERE article_id = ?;', (article_id,))
-    result = cursor.fetchone()
+    result = db.get_article_metadata(article_id)
     if result:
         title, authors, day, month, year = result
         publish_date = f'{month:02}/{day:02}/{year}'
@@ -163,8 +489,21 @@ def view_article(article_id):
     user_id = db.session_manager.validate_session(token)
     if not db.log_article_read(user_id, article_id):
         error = 'Failed to log article read.'
-    return render_template('article.html', article_id=article_id, article_text=article_text, title=title, authors=authors, publish_date=publish_date, summary=summary, show_summary=show_summary, error=error)
+    response = make_response(render_template('article.html', article_id=article_id, article_text=article_text, title=title, authors=authors, publish_date=publish_date, summary=summary, summary_pending=summary_pending, show_summary=show_summary, error=error))
+    if validators is not None and error is None:
+        set_article_cache_headers(response, etag, last_modified)
+    return response
 
+# polled by the article page while a summary is generated in the background
+@app.route('/article/<int:article_id>/summary', methods=['GET'])
+def summary_status(article_id):
+    token = request.cookies.get('session_token')
+    if not token:
+        return jsonify({'status': 'error', 'error': 'Invalid Session'}), 401
+    success, result = db.get_summary_status(token, article_id)
+    if not success:
+        return jsonify({'status': 'error', 'error': result}), 401
+    return jsonify(result)
 
 @app.route('/create', methods=['GET', 'POST'])
 def create_article():
@@ -201,27 +540,44 @@ def profile():
         if not success:
             flash(message or 'Failed to delete article.', 'error')
         return redirect(url_for('profile'))
-    cursor = db.conn.execute(
-        'SELECT article_id, title FROM articles WHERE submitter_user_id = ? AND active = 1 ORDER BY submitted_timestamp DESC;',
-        (user_id,)
-    )
-    articles = cursor.fetchall()
-    return render_template('profile.html', username=username, articles=articles)
+    cursor = request.args.get('cursor') or None
+    success, result = db.get_articles_by_submitter_page(user_id, 20, cursor)
+    if not success:
+        if cursor is not None:
+            return redirect(url_for('profile'))
+        flash(result, 'error')
+        result = ([], None)
+    articles, next_cursor = result
+    return render_template('profile.html', username=username, articles=articles, next_cursor=next_cursor, first_page=cursor is None)
+
+# clients allowed to scrape /metrics, comma-separated addresses or networks (METRICS_ALLOW=10.0.0.0/8,127.0.0.1),
+# loopback only by default since the route exposes per-route traffic, query timings and queue sizes, '*' allows anyone
+METRICS_ALLOW_ENTRIES = [entry.strip() for entry in os.environ.get('METRICS_ALLOW', '127.0.0.1,::1').split(',') if entry.strip()]
+METRICS_ALLOW_ALL = '*' in METRICS_ALLOW_ENTRIES
+METRICS_ALLOW = [ipaddress.ip_network(entry, strict=False) for entry in METRICS_ALLOW_ENTRIES if entry != '*']
+
+def metrics_allowed(remote_addr: str | None) -> bool:
+    if METRICS_ALLOW_ALL:
+        return True
+    try:
+        address = ipaddress.ip_address(remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in network for network in METRICS_ALLOW)
+
+# prometheus text format, metrics are per process, other clients get the same 404 as a disabled registry
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if db.metrics is None or not metrics_allowed(request.remote_addr):
+        return 'Metrics are disabled.\n', 404
+    return db.metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 @app.route('/')
 def catch_all():
     return redirect(url_for('home'))
 
+# development server, single process, production runs gunicorn -c gunicorn.conf.py api:app
 if __name__ == '__main__':
-    try:
-        # if not os.path.exists(DB_PATH):
-        if not db_init.db_init(DB_PATH, './WebApp/db_init.sql'):
-            raise Exception('Unable to initialize database\n')
-    except Exception as e:
-        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
-    except KeyboardInterrupt as k:
-        sys.stderr.write(f'KeyboardInterrupt: {str(k)}')
-        sys.stderr.write('User Interrupt\n')
-    else:
-        print('Starting Flask app...', flush=True)
-        app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    print(db.startup_report.format(), flush=True)
+    print('Starting Flask app...', flush=True)
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,5 +1,8 @@
 -- CREATE EXTENSION IF NOT EXISTS vector;
 
+-- baseline schema (version 1), applied once by helper_scripts/db_init.py
+-- later schema changes and indexes go in migrations/NNNN_<name>.sql, see helper_scripts/migrations.py
+
 -- main user table
 PRAGMA foreign_keys = ON;
 
@@ -16,6 +19,18 @@ CREATE UNIQUE INDEX IF NOT EXISTS unique_active_usernames
   	ON users(username)
   	WHERE active = 1;
 
+-- login sessions shared by every worker process, token_hash is the sha256 of the cookie token
+-- expired rows are removed by the session sweeper thread (helper_scripts/session_store.py)
+CREATE TABLE IF NOT EXISTS sessions (
+    token_hash TEXT NOT NULL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(user_id),
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS sessions_user_id ON sessions(user_id);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions(expires_at);
+
 -- main article table
 CREATE TABLE IF NOT EXISTS articles (
     article_id /* AUTOINCREMENT */ INTEGER PRIMARY KEY, -- https://www.sqlite.org/autoinc.html
@@ -30,6 +45,21 @@ CREATE TABLE IF NOT EXISTS articles (
     CHECK (active in (0, 1))
 );
 
+-- full-text index over article title, authors and body, rowid = articles.article_id
+-- kept in sync by DBManager.create_article / delete_article, backfilled by helper_scripts/full_text.py
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title,
+    authors,
+    body,
+    tokenize = 'porter unicode61'
+);
+
+-- external identity of imported articles, lets helper_scripts/bulk_import.py skip DOIs it already loaded
+CREATE TABLE IF NOT EXISTS article_sources (
+    doi TEXT NOT NULL PRIMARY KEY,
+    article_id INTEGER NOT NULL REFERENCES articles(article_id)
+);
+
 -- holds information about the articles like text summaries and vector encodings
 CREATE TABLE IF NOT EXISTS article_heuristics (
     article_id INTEGER PRIMARY KEY REFERENCES articles(article_id),
@@ -37,6 +67,17 @@ CREATE TABLE IF NOT EXISTS article_heuristics (
     vector BLOB NULL DEFAULT NULL
 );
 
+-- overlapping passages of each article and their vectors, article_heuristics.vector holds the pooled vector
+-- start_char / end_char index into articles/<article_id>.txt, written by DBManager.create_article and helper_scripts/passages.py
+CREATE TABLE IF NOT EXISTS article_passages (
+    article_id INTEGER NOT NULL REFERENCES articles(article_id),
+    passage_index INTEGER NOT NULL,
+    start_char INTEGER NOT NULL,
+    end_char INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (article_id, passage_index)
+);
+
 -- log user actions
 CREATE TABLE IF NOT EXISTS user_actions (
     action_id INTEGER NOT NULL PRIMARY KEY,
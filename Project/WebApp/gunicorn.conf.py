@@ -0,0 +1,50 @@
+import os
+
+# production server: gunicorn -c gunicorn.conf.py api:app (from this directory)
+# the master imports api once (preload_app), which initializes the database and builds the DBManager, then
+# loads both models and forks the workers, so the model weights, article and passage vectors and the ann
+# index are shared copy-on-write, every worker opens its own connections and background threads
+# kill -HUP <master> is a graceful reload: new workers are forked from the master (its vectors are brought
+# up to date first), the old ones finish their requests within graceful_timeout, code changes need a restart
+# /metrics is per process, each scrape is answered by whichever worker takes it, and only loopback clients are
+# answered unless METRICS_ALLOW lists the scraper (inside docker that is the bridge network, e.g. 172.16.0.0/12)
+# the DBManager must not use use_vector_mmap, before_fork refuses it and the master stops before forking
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_WORKERS', '2'))
+# requests handled concurrently by each worker
+threads = int(os.environ.get('WEB_THREADS', '8'))
+worker_class = 'gthread'
+preload_app = True
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', '30'))
+# a worker silent for this long is killed and replaced, model loading happens in the master so it stays short
+timeout = int(os.environ.get('WORKER_TIMEOUT', '120'))
+# seconds between checks for articles created or deleted by the other workers, 0 disables them
+vector_refresh_seconds = float(os.environ.get('VECTOR_REFRESH_SECONDS', '5'))
+# a warm-up runs the models, which must not happen before fork, so the workers warm up instead
+# (remembered under WORKER_WARM_UP because this file is executed again on every reload)
+os.environ.setdefault('WORKER_WARM_UP', os.environ.get('WARM_UP_MODELS', '0'))
+os.environ['WARM_UP_MODELS'] = '0'
+warm_up_workers = os.environ['WORKER_WARM_UP'] == '1'
+
+def _db():
+    import api
+    return api.db
+
+def when_ready(server):
+    db = _db()
+    db.load_models()
+    db.before_fork()
+    server.log.info('Models and vectors loaded in the master.\n' + db.startup_report.format())
+
+def on_reload(server):
+    _db().refresh_before_fork()
+
+def post_fork(server, worker):
+    db = _db()
+    db.after_fork(vector_refresh_seconds or None)
+    if warm_up_workers:
+        db.warm_up(background=True)
+
+def worker_exit(server, worker):
+    _db().close()
@@ -0,0 +1,304 @@
+import argparse
+import os
+import pathlib as pl
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from typing import Iterable
+from .vector_index import VectorMatrix
+from .vector_store import decode_vector_rows
+
+class _InvertedList:
+    # one IVF cell, ids and vectors stored contiguously with doubling capacity
+    def __init__(self, dim: int, capacity: int = 16) -> None:
+        self.size: int = 0
+        self.ids: np.ndarray = np.empty(capacity, dtype=np.int64)
+        self.vectors: np.ndarray = np.empty((capacity, dim), dtype=np.float32)
+
+    def append(self, article_ids: np.ndarray, vectors: np.ndarray) -> int:
+        needed = self.size + len(article_ids)
+        if needed > len(self.ids):
+            capacity = len(self.ids)
+            while capacity < needed:
+                capacity *= 2
+            ids = np.empty(capacity, dtype=np.int64)
+            ids[:self.size] = self.ids[:self.size]
+            vecs = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            vecs[:self.size] = self.vectors[:self.size]
+            self.ids, self.vectors = ids, vecs
+        start = self.size
+        self.ids[start:needed] = article_ids
+        self.vectors[start:needed] = vectors
+        self.size = needed
+        return start
+
+    # swap-removes the row and returns the id moved into it (or None)
+    def remove_row(self, row: int) -> int | None:
+        last = self.size - 1
+        moved = None
+        if row != last:
+            self.ids[row] = self.ids[last]
+            self.vectors[row] = self.vectors[last]
+            moved = int(self.ids[row])
+        self.size = last
+        return moved
+
+class IVFIndex:
+    # inverted file index over normalized embeddings
+    # vectors are clustered with spherical k-means, each query only scans the n_probe closest cells
+    # raising n_probe trades latency for recall, n_probe == n_lists is an exact search
+    def __init__(self, centroids: np.ndarray, n_probe: int = 8) -> None:
+        self.centroids: np.ndarray = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.n_lists: int = self.centroids.shape[0]
+        self.dim: int = self.centroids.shape[1]
+        self.n_probe: int = n_probe
+        self.lists: list[_InvertedList] = [_InvertedList(self.dim) for _ in range(self.n_lists)]
+        self.locations: dict[int, tuple[int, int]] = dict()
+        self.lock: threading.RLock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def __contains__(self, article_id: int) -> bool:
+        return article_id in self.locations
+
+    # runs spherical k-means on (a sample of) vectors and returns an empty index with the learned centroids
+    # n_lists defaults to ~sqrt(n) which keeps both the centroid scan and the cell scans small
+    @classmethod
+    def train(cls, vectors: np.ndarray, n_lists: int | None = None, n_probe: int = 8, iterations: int = 20, sample_per_list: int = 256, seed: int = 0) -> 'IVFIndex':
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = vectors.shape[0]
+        if n == 0:
+            raise ValueError('Cannot train an index without vectors.')
+        if n_lists is None:
+            n_lists = int(np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if n > n_lists * sample_per_list:
+            sample = vectors[rng.choice(n, n_lists * sample_per_list, replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = IVFIndex._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():
+                # re-seed empty cells from random points so no centroid is wasted
+                sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+        return cls(centroids, n_probe=n_probe)
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        assignment = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignment[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignment
+
+    # inserts or replaces vectors, each goes to the cell of its nearest centroid
+    def add_many(self, article_ids: Iterable[int], vectors: np.ndarray) -> None:
+        article_ids = np.fromiter(article_ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(article_ids), self.dim)
+        if len(article_ids) == 0:
+            return
+        with self.lock:
+            for article_id in article_ids:
+                if int(article_id) in self.locations:
+                    self.remove(int(article_id))
+            assignment = IVFIndex._assign(vectors, self.centroids)
+            order = np.argsort(assignment, kind='stable')
+            cells, starts = np.unique(assignment[order], return_index=True)
+            bounds = list(starts[1:]) + [len(order)]
+            for cell, start, end in zip(cells, starts, bounds):
+                rows = order[start:end]
+                first = self.lists[cell].append(article_ids[rows], vectors[rows])
+                for offset, article_id in enumerate(article_ids[rows]):
+                    self.locations[int(article_id)] = (int(cell), first + offset)
+
+    def add(self, article_id: int, vector: np.ndarray) -> None:
+        self.add_many([article_id], np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    # returns True if the article was present
+    def remove(self, article_id: int) -> bool:
+        with self.lock:
+            location = self.locations.pop(article_id, None)
+            if location is None:
+                return False
+            cell, row = location
+            moved = self.lists[cell].remove_row(row)
+            if moved is not None:
+                self.locations[moved] = (cell, row)
+            return True
+
+    # returns up to k (article_id, score) pairs from the n_probe cells closest to query
+    def search(self, query: np.ndarray, k: int, exclude_ids: Iterable[int] | None = None, n_probe: int | None = None) -> list[tuple[int, float]]:
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        with self.lock:
+            if k <= 0 or not self.locations:
+                return []
+            centroid_scores = self.centroids @ query
+            if n_probe < self.n_lists:
+                probes = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+            else:
+                probes = np.arange(self.n_lists)
+            probes = [cell for cell in probes if self.lists[cell].size]
+            if not probes:
+                return []
+            ids = np.concatenate([self.lists[cell].ids[:self.lists[cell].size] for cell in probes])
+            scores = np.concatenate([self.lists[cell].vectors[:self.lists[cell].size] @ query for cell in probes])
+        if exclude_ids is not None:
+            exclude = np.fromiter(exclude_ids, dtype=np.int64)
+            if exclude.size:
+                scores[np.isin(ids, exclude)] = -np.inf
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    # writes centroids and cell contents to a single .npz file, written to a temp file then renamed
+    # writes a temporary file of its own next to path and renames it over path, so concurrent savers
+    # never interleave their writes and readers only ever see a complete index
+    def save(self, path: pl.Path | str) -> None:
+        path = pl.Path(path)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name + '.', suffix='.tmp')
+        try:
+            with self.lock:
+                ids = [self.lists[cell].ids[:self.lists[cell].size] for cell in range(self.n_lists)]
+                vectors = [self.lists[cell].vectors[:self.lists[cell].size] for cell in range(self.n_lists)]
+                with os.fdopen(fd, 'wb') as index_file:
+                    np.savez(
+                        index_file,
+                        centroids=self.centroids,
+                        n_probe=np.array(self.n_probe),
+                        list_sizes=np.array([len(i) for i in ids], dtype=np.int64),
+                        ids=np.concatenate(ids) if ids else np.empty(0, dtype=np.int64),
+                        vectors=np.concatenate(vectors) if vectors else np.empty((0, self.dim), dtype=np.float32),
+                    )
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.remove(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path: pl.Path | str) -> 'IVFIndex':
+        with np.load(path) as data:
+            index = cls(data['centroids'], n_probe=int(data['n_probe']))
+            ids, vectors, offset = data['ids'], data['vectors'], 0
+            for cell, size in enumerate(data['list_sizes']):
+                if size:
+                    index.lists[cell].append(ids[offset:offset + size], vectors[offset:offset + size])
+                    for row, article_id in enumerate(ids[offset:offset + size]):
+                        index.locations[int(article_id)] = (cell, row)
+                offset += size
+        return index
+
+    # makes the index hold exactly the vectors in matrix, used after loading a possibly stale index file
+    def sync_with(self, matrix: VectorMatrix) -> tuple[int, int]:
+        ids, vectors = matrix.snapshot()
+        with self.lock:
+            current = set(ids.tolist())
+            stale = [article_id for article_id in self.locations if article_id not in current]
+            for article_id in stale:
+                self.remove(article_id)
+            missing = np.array([article_id not in self.locations for article_id in ids.tolist()], dtype=bool)
+            if missing.any():
+                self.add_many(ids[missing], vectors[missing])
+        return (int(missing.sum()), len(stale))
+
+# compares the index against an exact scan of matrix for random stored vectors used as queries
+# returns one row per n_probe value with mean recall@k and mean query latencies in milliseconds
+def evaluate_recall(index: IVFIndex, matrix: VectorMatrix, k: int = 10, n_probes: Iterable[int] = (1, 2, 4, 8, 16, 32), num_queries: int = 200, seed: int = 0) -> list[dict[str, float]]:
+    if len(matrix) == 0:
+        return []
+    rng = np.random.default_rng(seed)
+    ids, vectors = matrix.snapshot()
+    rows = rng.choice(len(ids), min(num_queries, len(ids)), replace=False)
+    queries = [(int(ids[row]), vectors[row]) for row in rows]
+    exact_results = []
+    start = time.perf_counter()
+    for query_id, query in queries:
+        exact_results.append({i for i, _ in matrix.top_k(query, k, [query_id])})
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    report = []
+    for n_probe in n_probes:
+        if n_probe > index.n_lists:
+            continue
+        hits = 0
+        start = time.perf_counter()
+        approx_results = [{i for i, _ in index.search(query, k, [query_id], n_probe=n_probe)} for query_id, query in queries]
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        for exact, approx in zip(exact_results, approx_results):
+            hits += len(exact & approx) / max(1, len(exact))
+        report.append({
+            'n_probe': n_probe,
+            'recall': hits / len(queries),
+            'ann_ms': ann_ms,
+            'exact_ms': exact_ms,
+        })
+    return report
+
+# path of the persisted index, kept next to the sqlite file
+def index_path_for(db_path: str) -> pl.Path:
+    db_path = pl.Path(db_path)
+    return db_path.with_name(db_path.stem + '.ivf.npz')
+
+def load_matrix_from_db(db_path: str) -> VectorMatrix:
+    import sqlite3 as sq3
+    conn = sq3.connect(db_path)
+    rows = conn.execute(
+        'SELECT article_heuristics.article_id, article_heuristics.vector '
+        'FROM article_heuristics '
+        'JOIN articles ON articles.article_id = article_heuristics.article_id '
+        'WHERE article_heuristics.vector IS NOT NULL AND articles.active = 1;'
+    ).fetchall()
+    conn.close()
+    ids, vectors, _ = decode_vector_rows(rows)
+    matrix = VectorMatrix()
+    matrix.add_many(ids, vectors)
+    return matrix
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Build or evaluate the IVF index for article embeddings.')
+    parser.add_argument('db_path', help='path to the sqlite database')
+    parser.add_argument('--build', action='store_true', help='(re)train the index and write it next to the database')
+    parser.add_argument('--eval', action='store_true', help='report recall@k and latency against exact search')
+    parser.add_argument('--n-lists', type=int, default=None)
+    parser.add_argument('--n-probe', type=int, default=8)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args(argv)
+    matrix = load_matrix_from_db(args.db_path)
+    if len(matrix) == 0:
+        sys.stderr.write('No article vectors found.\n')
+        return 1
+    path = index_path_for(args.db_path)
+    if args.build or not path.exists():
+        start = time.perf_counter()
+        ids, vectors = matrix.snapshot()
+        index = IVFIndex.train(vectors, n_lists=args.n_lists, n_probe=args.n_probe)
+        index.add_many(ids, vectors)
+        index.save(path)
+        print(f'Built index with {index.n_lists} lists over {len(index)} vectors in {time.perf_counter() - start:.2f}s -> {path}')
+    else:
+        index = IVFIndex.load(path)
+        added, removed = index.sync_with(matrix)
+        print(f'Loaded index with {index.n_lists} lists over {len(index)} vectors ({added} added, {removed} removed)')
+    if args.eval:
+        print(f'{"n_probe":>8} {"recall@" + str(args.k):>10} {"ann_ms":>10} {"exact_ms":>10}')
+        for row in evaluate_recall(index, matrix, k=args.k, n_probes=sorted({1, 2, 4, 8, 16, 32, 64, args.n_probe}), num_queries=args.queries):
+            print(f'{row["n_probe"]:>8} {row["recall"]:>10.3f} {row["ann_ms"]:>10.3f} {row["exact_ms"]:>10.3f}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,394 @@
+import argparse
+import fcntl
+import mmap
+import os
+import pathlib as pl
+import re
+import sqlite3 as sq3
+import struct
+import sys
+import threading
+import time
+import zlib
+from .connection_pool import ConnectionPool
+from .file_cache import FileTextCache
+
+# what is stored per article, each kind used to be its own directory under the articles root
+KINDS: tuple[str, ...] = ('articles', 'summaries')
+
+# both stores implement read(kind, article_id) -> str (FileNotFoundError when missing),
+# read_many(kind, article_ids) -> {article_id: text} (missing ids left out),
+# write(kind, article_id, text, exclusive=True) (FileExistsError when exclusive and present),
+# exists(kind, article_id), delete(kind, article_id) -> bool, ids(kind), stats() and close()
+
+class DirectoryArticleStore:
+    # the original layout, <root>/<kind>/<article_id>.txt, reads go through a FileTextCache
+    def __init__(self, root: pl.Path, cache_bytes: int = 64 * 2**20) -> None:
+        self.root: pl.Path = pl.Path(root)
+        self.cache: FileTextCache = FileTextCache(max_bytes=cache_bytes)
+
+    def path(self, kind: str, article_id: int) -> pl.Path:
+        return self.root / kind / f'{article_id}.txt'
+
+    def read(self, kind: str, article_id: int) -> str:
+        return self.cache.read(self.path(kind, article_id))
+
+    def read_many(self, kind: str, article_ids: list[int]) -> dict[int, str]:
+        texts = dict()
+        for article_id in article_ids:
+            try:
+                texts[article_id] = self.read(kind, article_id)
+            except FileNotFoundError:
+                continue
+        return texts
+
+    def write(self, kind: str, article_id: int, text: str, exclusive: bool = True) -> None:
+        path = self.path(kind, article_id)
+        with open(path, 'x' if exclusive else 'w') as text_file:
+            text_file.write(text)
+        self.cache.invalidate(path)
+
+    def exists(self, kind: str, article_id: int) -> bool:
+        return os.path.exists(self.path(kind, article_id))
+
+    def delete(self, kind: str, article_id: int) -> bool:
+        path = self.path(kind, article_id)
+        self.cache.invalidate(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def ids(self, kind: str) -> list[int]:
+        try:
+            names = os.listdir(self.root / kind)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-4]) for name in names if name.endswith('.txt') and name[:-4].isdigit())
+
+    def stats(self) -> dict[str, int]:
+        return {'cache_' + key: value for key, value in self.cache.stats().items()}
+
+    def close(self) -> None:
+        pass
+
+# every record in a pack starts with magic, kind index, article_id and payload length so the index
+# can be rebuilt by scanning the packs, the payload is the zlib compressed utf-8 text
+RECORD_HEADER = struct.Struct('<4sBqI')
+RECORD_MAGIC = b'APK1'
+PACK_NAME = re.compile(r'^pack-(\d{6})\.pack$')
+
+class PackArticleStore:
+    # append-only pack files under <root>/packs with an sqlite index (kind, article_id) -> (pack, offset, length)
+    # appends from any thread or process are serialized with an flock on packs/append.lock, reads map the pack
+    # with mmap and decompress only the requested record, decompressed texts are kept in a byte-bounded lru
+    # keyed by location (records never change in place and pack ids come from a counter in the index that only
+    # grows, so a location is never reused by another record, the entries of a compacted pack are dropped)
+    # deleting only removes the index row, compact() rewrites packs to reclaim the space
+    def __init__(self, root: pl.Path, cache_bytes: int = 64 * 2**20, max_pack_bytes: int = 256 * 2**20, compression_level: int = 6) -> None:
+        self.root: pl.Path = pl.Path(root)
+        self.pack_dir: pl.Path = self.root / 'packs'
+        os.makedirs(self.pack_dir, exist_ok=True)
+        self.max_pack_bytes: int = max_pack_bytes
+        self.compression_level: int = compression_level
+        self.cache: FileTextCache = FileTextCache(max_bytes=cache_bytes)
+        self.pool: ConnectionPool = ConnectionPool(str(self.pack_dir / 'index.sqlite3'))
+        conn = self.pool.writer()
+        conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS pack_index (
+                kind TEXT NOT NULL,
+                article_id INTEGER NOT NULL,
+                pack_id INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                raw_length INTEGER NOT NULL,
+                PRIMARY KEY (kind, article_id)
+            );
+            '''
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS pack_index_pack_id ON pack_index(pack_id);')
+        # the highest pack id ever allocated, a pack removed by compact() leaves it in place
+        conn.execute('CREATE TABLE IF NOT EXISTS pack_counter (name TEXT PRIMARY KEY, value INTEGER NOT NULL);')
+        conn.commit()
+        self.maps: dict[int, mmap.mmap] = dict()
+        self.maps_lock: threading.Lock = threading.Lock()
+        self.append_lock: threading.Lock = threading.Lock()
+        self.lock_path: pl.Path = self.pack_dir / 'append.lock'
+
+    def pack_path(self, pack_id: int) -> pl.Path:
+        return self.pack_dir / f'pack-{pack_id:06d}.pack'
+
+    def pack_ids(self) -> list[int]:
+        return sorted(int(match.group(1)) for match in map(PACK_NAME.match, os.listdir(self.pack_dir)) if match)
+
+    # allocates a pack id no pack has ever had, call while holding the append lock
+    def _next_pack_id(self) -> int:
+        pack_ids = self.pack_ids()
+        conn = self.pool.writer()
+        conn.execute("INSERT OR IGNORE INTO pack_counter (name, value) VALUES ('last_pack_id', 0);")
+        # stores created before the counter existed start from their newest pack
+        conn.execute("UPDATE pack_counter SET value = MAX(value, ?) + 1 WHERE name = 'last_pack_id';", (pack_ids[-1] if pack_ids else 0,))
+        pack_id = conn.execute("SELECT value FROM pack_counter WHERE name = 'last_pack_id';").fetchone()[0]
+        conn.commit()
+        return pack_id
+
+    def _locate(self, kind: str, article_id: int) -> tuple[int, int, int] | None:
+        row = self.pool.reader().execute(
+            'SELECT pack_id, offset, length FROM pack_index WHERE kind = ? AND article_id = ?;',
+            (kind, article_id,),
+        ).fetchone()
+        return (row[0], row[1], row[2]) if row else None
+
+    def _map(self, pack_id: int, needed: int) -> mmap.mmap:
+        with self.maps_lock:
+            mapped = self.maps.get(pack_id)
+            if mapped is not None and len(mapped) >= needed:
+                return mapped
+            # the pack grew since it was mapped (or was never mapped), map it again at its current size
+            # the old map is not closed here, another thread may still be slicing it, it is unmapped once unreferenced
+            with open(self.pack_path(pack_id), 'rb') as pack_file:
+                mapped = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[pack_id] = mapped
+            return mapped
+
+    def read(self, kind: str, article_id: int) -> str:
+        for attempt in range(2):
+            location = self._locate(kind, article_id)
+            if location is None:
+                raise FileNotFoundError(f'No {kind} record for article {article_id}.')
+            pack_id, offset, length = location
+            try:
+                return self._read_record(pack_id, offset, length)
+            except FileNotFoundError:
+                # compaction moved the record between the lookup and the read, look it up again
+                if attempt == 0:
+                    continue
+                raise
+        raise FileNotFoundError(f'No {kind} record for article {article_id}.')
+
+    # raises FileNotFoundError when the pack is gone (compacted away)
+    def _read_record(self, pack_id: int, offset: int, length: int) -> str:
+        key = f'{pack_id}:{offset}'
+        text = self.cache.get(key)
+        if text is not None:
+            return text
+        mapped = self._map(pack_id, offset + length)
+        text = zlib.decompress(mapped[offset + RECORD_HEADER.size:offset + length]).decode('utf-8')
+        self.cache.put(key, text)
+        return text
+
+    # locates every record with one IN (...) query per 500 ids, records a compaction moved meanwhile are looked up again
+    def read_many(self, kind: str, article_ids: list[int]) -> dict[int, str]:
+        texts = dict()
+        for start in range(0, len(article_ids), 500):
+            chunk = article_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            rows = self.pool.reader().execute(
+                f'SELECT article_id, pack_id, offset, length FROM pack_index WHERE kind = ? AND article_id IN ({placeholders});',
+                (kind, *chunk,),
+            ).fetchall()
+            for article_id, pack_id, offset, length in rows:
+                try:
+                    texts[article_id] = self._read_record(pack_id, offset, length)
+                except FileNotFoundError:
+                    try:
+                        texts[article_id] = self.read(kind, article_id)
+                    except FileNotFoundError:
+                        continue
+        return texts
+
+    def exists(self, kind: str, article_id: int) -> bool:
+        return self._locate(kind, article_id) is not None
+
+    # appends one record to the newest pack (starting a new one past max_pack_bytes) while holding
+    # the cross-process append lock, returns (pack_id, offset, length)
+    def _append(self, kind: str, article_id: int, payload: bytes) -> tuple[int, int, int]:
+        record = RECORD_HEADER.pack(RECORD_MAGIC, KINDS.index(kind), article_id, len(payload)) + payload
+        pack_ids = self.pack_ids()
+        if pack_ids and os.path.getsize(self.pack_path(pack_ids[-1])) < self.max_pack_bytes:
+            pack_id = pack_ids[-1]
+        else:
+            pack_id = self._next_pack_id()
+        fd = os.open(self.pack_path(pack_id), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            offset = os.lseek(fd, 0, os.SEEK_END)
+            os.write(fd, record)
+        finally:
+            os.close(fd)
+        return (pack_id, offset, len(record))
+
+    def write(self, kind: str, article_id: int, text: str, exclusive: bool = True) -> None:
+        if kind not in KINDS:
+            raise ValueError(f'Unknown kind {kind!r}.')
+        raw = text.encode('utf-8')
+        payload = zlib.compress(raw, self.compression_level)
+        with self.append_lock, open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if exclusive and self.exists(kind, article_id):
+                raise FileExistsError(f'{kind} record for article {article_id} already exists.')
+            pack_id, offset, length = self._append(kind, article_id, payload)
+            conn = self.pool.writer()
+            conn.execute(
+                'INSERT OR REPLACE INTO pack_index (kind, article_id, pack_id, offset, length, raw_length) VALUES (?, ?, ?, ?, ?, ?);',
+                (kind, article_id, pack_id, offset, length, len(raw),),
+            )
+            conn.commit()
+
+    def delete(self, kind: str, article_id: int) -> bool:
+        conn = self.pool.writer()
+        cursor = conn.execute('DELETE FROM pack_index WHERE kind = ? AND article_id = ?;', (kind, article_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+    def ids(self, kind: str) -> list[int]:
+        return [row[0] for row in self.pool.reader().execute('SELECT article_id FROM pack_index WHERE kind = ? ORDER BY article_id;', (kind,))]
+
+    # live vs on-disk bytes, the difference is what compact() would reclaim
+    def stats(self) -> dict[str, int]:
+        live_bytes, raw_bytes, records = self.pool.reader().execute('SELECT COALESCE(SUM(length), 0), COALESCE(SUM(raw_length), 0), COUNT(*) FROM pack_index;').fetchone()
+        return {
+            'records': records,
+            'packs': len(self.pack_ids()),
+            'pack_bytes': sum(os.path.getsize(self.pack_path(pack_id)) for pack_id in self.pack_ids()),
+            'live_bytes': live_bytes,
+            'uncompressed_bytes': raw_bytes,
+            **{'cache_' + key: value for key, value in self.cache.stats().items()},
+        }
+
+    # rewrites every pack whose live records take up less than min_live_ratio of its size into a new pack,
+    # updates the index in one transaction and removes the old packs, returns bytes reclaimed
+    def compact(self, min_live_ratio: float = 0.75) -> int:
+        reclaimed = 0
+        with self.append_lock, open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            conn = self.pool.writer()
+            live_by_pack = dict(conn.execute('SELECT pack_id, SUM(length) FROM pack_index GROUP BY pack_id;').fetchall())
+            pack_ids = self.pack_ids()
+            if not pack_ids:
+                return 0
+            candidates = [
+                pack_id for pack_id in pack_ids
+                if live_by_pack.get(pack_id, 0) < min_live_ratio * os.path.getsize(self.pack_path(pack_id))
+            ]
+            if not candidates:
+                return 0
+            target_id = self._next_pack_id()
+            target_fd = os.open(self.pack_path(target_id), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            updates = []
+            try:
+                for pack_id in candidates:
+                    rows = conn.execute('SELECT kind, article_id, offset, length FROM pack_index WHERE pack_id = ? ORDER BY offset;', (pack_id,)).fetchall()
+                    with open(self.pack_path(pack_id), 'rb') as pack_file:
+                        for kind, article_id, offset, length in rows:
+                            pack_file.seek(offset)
+                            record = pack_file.read(length)
+                            updates.append((target_id, os.lseek(target_fd, 0, os.SEEK_END), kind, article_id))
+                            os.write(target_fd, record)
+                os.fsync(target_fd)
+            finally:
+                os.close(target_fd)
+            conn.executemany('UPDATE pack_index SET pack_id = ?, offset = ? WHERE kind = ? AND article_id = ?;', updates)
+            conn.commit()
+            for pack_id in candidates:
+                reclaimed += os.path.getsize(self.pack_path(pack_id))
+                with self.maps_lock:
+                    self.maps.pop(pack_id, None)
+                os.remove(self.pack_path(pack_id))
+                self.cache.invalidate_prefix(f'{pack_id}:')
+            reclaimed -= os.path.getsize(self.pack_path(target_id))
+            if not updates:
+                os.remove(self.pack_path(target_id))
+        return reclaimed
+
+    def close(self) -> None:
+        with self.maps_lock:
+            for mapped in self.maps.values():
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass
+            self.maps.clear()
+        self.pool.close_all()
+
+def open_article_store(backend: str, root: pl.Path, cache_bytes: int = 64 * 2**20) -> DirectoryArticleStore | PackArticleStore:
+    if backend == 'directory':
+        return DirectoryArticleStore(root, cache_bytes)
+    if backend == 'pack':
+        return PackArticleStore(root, cache_bytes)
+    raise ValueError(f'Unknown article store {backend!r}, expected directory or pack.')
+
+# copies every <root>/<kind>/<id>.txt that is not in the pack store yet, returns (copied, skipped)
+# with remove_files the text files are deleted once they are in a pack
+def migrate_directory_to_pack(root: pl.Path, remove_files: bool = False, report_every: int = 1000) -> tuple[int, int]:
+    source = DirectoryArticleStore(root, cache_bytes=0)
+    target = PackArticleStore(root, cache_bytes=0)
+    copied = skipped = 0
+    try:
+        for kind in KINDS:
+            existing = set(target.ids(kind))
+            for article_id in source.ids(kind):
+                if article_id in existing:
+                    skipped += 1
+                    continue
+                with open(source.path(kind, article_id), 'r') as text_file:
+                    target.write(kind, article_id, text_file.read(), exclusive=False)
+                copied += 1
+                if report_every and copied % report_every == 0:
+                    print(f'{copied} files copied', flush=True)
+        if remove_files:
+            for kind in KINDS:
+                for article_id in set(target.ids(kind)) & set(source.ids(kind)):
+                    source.delete(kind, article_id)
+    finally:
+        target.close()
+    return (copied, skipped)
+
+# removes the records of articles that are no longer active in the main database
+def drop_inactive(store: PackArticleStore, db_path: str) -> int:
+    conn = sq3.connect(db_path)
+    try:
+        inactive = {row[0] for row in conn.execute('SELECT article_id FROM articles WHERE active = 0;')}
+    finally:
+        conn.close()
+    dropped = 0
+    for kind in KINDS:
+        for article_id in set(store.ids(kind)) & inactive:
+            dropped += store.delete(kind, article_id)
+    return dropped
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Maintain the compressed pack-file article store.')
+    parser.add_argument('command', choices=['migrate', 'compact', 'stats'], help='migrate: copy articles/ and summaries/ into packs, compact: rewrite packs to reclaim deleted records, stats: print sizes')
+    parser.add_argument('articles_path', nargs='?', default='/evanr', help='directory holding articles/, summaries/ and packs/')
+    parser.add_argument('--remove-files', action='store_true', help='migrate: delete the text files once they are packed')
+    parser.add_argument('--drop-inactive', metavar='DB_PATH', default=None, help='compact: first drop records of deleted articles in this database')
+    parser.add_argument('--min-live-ratio', type=float, default=0.75, help='compact: rewrite packs whose live records use less than this share of the file')
+    args = parser.parse_args(argv)
+    root = pl.Path(args.articles_path)
+    start = time.perf_counter()
+    try:
+        if args.command == 'migrate':
+            copied, skipped = migrate_directory_to_pack(root, args.remove_files)
+            print(f'Packed {copied} files ({skipped} already packed) in {time.perf_counter() - start:.2f}s.')
+            return 0
+        store = PackArticleStore(root)
+        try:
+            if args.command == 'compact':
+                if args.drop_inactive:
+                    print(f'Dropped {drop_inactive(store, args.drop_inactive)} records of deleted articles.')
+                reclaimed = store.compact(args.min_live_ratio)
+                print(f'Reclaimed {reclaimed / 2**20:.1f} MB in {time.perf_counter() - start:.2f}s.')
+            for key, value in store.stats().items():
+                if not key.startswith('cache_'):
+                    print(f'{key}: {value}')
+        finally:
+            store.close()
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
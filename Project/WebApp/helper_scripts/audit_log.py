@@ -0,0 +1,140 @@
+import datetime
+import sys
+import threading
+import sqlite3 as sq3
+from typing import Callable
+from .connection_pool import ConnectionPool
+
+# timestamps are taken when the event happens, not when it is flushed, in the same format
+# sqlite's CURRENT_TIMESTAMP default uses
+INSERT_STATEMENTS: dict[str, str] = {
+    'user_logs': 'INSERT INTO user_logs (user_id, log_action_id, log_timestamp) VALUES (?, ?, ?);',
+    'article_logs': 'INSERT INTO article_logs (article_id, user_id, log_action_id, log_timestamp) VALUES (?, ?, ?, ?);',
+    'user_reads': 'INSERT INTO user_reads (user_id, article_id, read_timestamp) VALUES (?, ?, ?);',
+}
+
+def utc_timestamp() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class AuditLogBuffer:
+    # write-behind buffer for the log tables: events are appended to an in-memory list and a flusher
+    # thread writes them with one executemany per table inside a single transaction, either every
+    # flush_interval_seconds or as soon as max_batch events are waiting
+    # at most max_pending events are held, further events are dropped and counted
+    # on_flush(conn, rows_by_table) runs inside the flush transaction after the inserts, so it holds the write
+    # lock while it derives state from the rows, a failing on_flush is logged and the rows are still written
+    def __init__(self, pool: ConnectionPool, max_batch: int = 256, flush_interval_seconds: float = 1.0, max_pending: int = 10000, on_flush: Callable[[sq3.Connection, dict[str, list[tuple]]], None] | None = None) -> None:
+        self.pool: ConnectionPool = pool
+        self.on_flush: Callable[[sq3.Connection, dict[str, list[tuple]]], None] | None = on_flush
+        self.max_batch: int = max_batch
+        self.flush_interval_seconds: float = flush_interval_seconds
+        self.max_pending: int = max_pending
+        self.pending: list[tuple[str, tuple]] = []
+        # rows taken by a flush that has not committed yet, still visible to pending_reads
+        self.in_flight: list[tuple[str, tuple]] = []
+        self.lock: threading.Lock = threading.Lock()
+        self.flush_lock: threading.Lock = threading.Lock()
+        self.wake: threading.Event = threading.Event()
+        self.stopped: bool = False
+        self.flushed: int = 0
+        self.dropped: int = 0
+        self.failed: int = 0
+        self.batches: int = 0
+        self.flusher: threading.Thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+        self.flusher.start()
+
+    # queues a row for table (a key of INSERT_STATEMENTS), returns False if it was dropped
+    def append(self, table: str, row: tuple) -> bool:
+        if table not in INSERT_STATEMENTS:
+            raise ValueError(f'Unknown audit table {table!r}.')
+        with self.lock:
+            if self.stopped or len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self.pending.append((table, row))
+            if len(self.pending) >= self.max_batch:
+                self.wake.set()
+        return True
+
+    def log_user_action(self, user_id: int, user_action_id: int) -> bool:
+        return self.append('user_logs', (user_id, user_action_id, utc_timestamp()))
+
+    def log_article_action(self, article_id: int, user_id: int, article_action_id: int) -> bool:
+        return self.append('article_logs', (article_id, user_id, article_action_id, utc_timestamp()))
+
+    def log_article_read(self, user_id: int, article_id: int) -> bool:
+        return self.append('user_reads', (user_id, article_id, utc_timestamp()))
+
+    # article ids read by user_id that are not committed to user_reads yet
+    def pending_reads(self, user_id: int) -> set[int]:
+        with self.lock:
+            return {row[1] for table, row in self.in_flight + self.pending if table == 'user_reads' and row[0] == user_id}
+
+    def _run(self) -> None:
+        while True:
+            self.wake.wait(self.flush_interval_seconds)
+            self.wake.clear()
+            with self.lock:
+                if self.stopped:
+                    return
+            self.flush()
+
+    # writes everything queued so far in one transaction, returns the number of rows written
+    def flush(self) -> int:
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+                self.in_flight = batch
+            if not batch:
+                return 0
+            rows_by_table: dict[str, list[tuple]] = dict()
+            for table, row in batch:
+                rows_by_table.setdefault(table, []).append(row)
+            conn = self.pool.writer()
+            try:
+                for table, rows in rows_by_table.items():
+                    conn.executemany(INSERT_STATEMENTS[table], rows)
+                if self.on_flush is not None:
+                    conn.execute('SAVEPOINT on_flush;')
+                    try:
+                        self.on_flush(conn, rows_by_table)
+                        conn.execute('RELEASE on_flush;')
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO on_flush;')
+                        conn.execute('RELEASE on_flush;')
+                        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+                        sys.stderr.write('Flush hook failed, the log events are written without it.\n')
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+                sys.stderr.write(f'Unable to write {len(batch)} buffered log events.\n')
+                with self.lock:
+                    self.in_flight = []
+                    self.failed += len(batch)
+                return 0
+            with self.lock:
+                self.in_flight = []
+                self.flushed += len(batch)
+                self.batches += 1
+            return len(batch)
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                'queued': len(self.pending),
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'batches': self.batches,
+            }
+
+    # stops accepting events, writes whatever is still queued and stops the flusher thread
+    def close(self) -> None:
+        with self.lock:
+            if self.stopped:
+                return
+            self.stopped = True
+        self.wake.set()
+        self.flusher.join()
+        self.flush()
@@ -0,0 +1,288 @@
+import argparse
+import contextlib
+import datetime
+import itertools
+import json
+import os
+import pathlib as pl
+import platform
+import random
+import re
+import sqlite3 as sq3
+import subprocess
+import sys
+import time
+import numpy as np
+from typing import Any, Callable, Iterator
+from .bulk_import import BulkImporter, get_or_create_user, iter_json_array
+from .migrations import migrate
+from .article_store import open_article_store
+from .pagination import encode_cursor
+from .vector_index import VectorMatrix
+
+# corpus sizes selectable with --scale
+SCALES: dict[str, int] = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+WEB_APP_PATH = pl.Path(__file__).resolve().parent.parent
+DEFAULT_SEED_JSON = WEB_APP_PATH / 'plos_articles_scraped.json'
+DEFAULT_INIT_SQL = WEB_APP_PATH / 'db_init.sql'
+# every synthetic user logs in with this hex passkey
+PASSWORD = '0123456789abcdef'
+WORD_PATTERN = re.compile(r'[A-Za-z]{3,}')
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+# title words, body sentences, author strings and publish dates of the first limit seed articles
+def load_seed(seed_json: pl.Path | str, limit: int = 1000) -> dict[str, list[str]]:
+    seed: dict[str, list[str]] = {'title_words': [], 'sentences': [], 'authors': [], 'dates': []}
+    for article in itertools.islice(iter_json_array(seed_json), limit):
+        seed['title_words'].extend(WORD_PATTERN.findall(article.get('title') or ''))
+        seed['sentences'].extend(sentence for sentence in SENTENCE_PATTERN.split(article.get('content') or '') if len(sentence) > 20)
+        if article.get('authors'):
+            seed['authors'].append(article['authors'])
+        if article.get('publish_date'):
+            seed['dates'].append(article['publish_date'])
+    if not seed['title_words'] or not seed['sentences']:
+        raise ValueError(f'{seed_json} has no usable articles to seed the corpus.')
+    seed['authors'] = seed['authors'] or ['Synthetic Author']
+    seed['dates'] = seed['dates'] or ['2020-01-01']
+    return seed
+
+# articles in the scraped json layout whose titles and bodies are recombined from the seed
+def synthetic_articles(seed: dict[str, list[str]], count: int, rng: random.Random, body_sentences: int = 8, first_index: int = 0) -> Iterator[dict[str, str]]:
+    for index in range(first_index, first_index + count):
+        yield {
+            'doi': f'synthetic/{index}',
+            'title': ' '.join(rng.choices(seed['title_words'], k=rng.randint(4, 10))).capitalize(),
+            'authors': rng.choice(seed['authors']),
+            'publish_date': rng.choice(seed['dates']),
+            'url': f'synthetic/{index}',
+            'content': ' '.join(rng.choices(seed['sentences'], k=body_sentences)),
+        }
+
+def corpus_paths(workdir: pl.Path) -> tuple[pl.Path, pl.Path]:
+    return (workdir / 'bench.sqlite3', workdir / 'corpus.json')
+
+# builds (or reuses, when built with the same parameters) a corpus of n_articles synthetic articles,
+# n_users users and reads_per_user random reads per user under workdir, returns its description
+def build_corpus(workdir: pl.Path, n_articles: int, n_users: int, reads_per_user: int, seed_json: pl.Path | str, vectorizer, rng_seed: int = 464, body_sentences: int = 8, article_store: str = 'directory', rebuild: bool = False) -> dict[str, Any]:
+    db_path, description_path = corpus_paths(workdir)
+    params = {
+        'articles': n_articles, 'users': n_users, 'reads_per_user': reads_per_user, 'seed_json': str(seed_json),
+        'rng_seed': rng_seed, 'body_sentences': body_sentences, 'article_store': article_store,
+        'vectorizer': getattr(vectorizer, 'model_name', vectorizer.__class__.__name__),
+    }
+    if not rebuild and description_path.exists():
+        description = json.loads(description_path.read_text())
+        if description.get('params') == params and db_path.exists():
+            # corpora built before a schema change pick up its migrations
+            migrate(str(db_path), DEFAULT_INIT_SQL)
+            return description
+    for leftover in (db_path, db_path.with_name(db_path.name + '-wal'), db_path.with_name(db_path.name + '-shm')):
+        leftover.unlink(missing_ok=True)
+    workdir.mkdir(parents=True, exist_ok=True)
+    if article_store == 'directory':
+        os.makedirs(workdir / 'articles', exist_ok=True)
+        os.makedirs(workdir / 'summaries', exist_ok=True)
+    start = time.perf_counter()
+    rng = random.Random(rng_seed)
+    migrate(str(db_path), DEFAULT_INIT_SQL)
+    conn = sq3.connect(db_path)
+    submitter_id = get_or_create_user(conn, 'bench_submitter', PASSWORD)
+    conn.executemany('INSERT INTO users (username, encrypted_passkey) VALUES (?, ?);', [(f'user{index:06d}', PASSWORD) for index in range(n_users)])
+    conn.commit()
+    conn.close()
+    importer = BulkImporter(str(db_path), workdir, submitter_id, article_store=article_store)
+    imported, _, import_seconds = importer.import_articles(synthetic_articles(load_seed(seed_json), n_articles, rng, body_sentences), vectorizer)
+    conn = sq3.connect(db_path)
+    article_ids = [row[0] for row in conn.execute('SELECT article_id FROM articles;')]
+    user_ids = [row[0] for row in conn.execute('SELECT user_id FROM users WHERE user_id != ?;', (submitter_id,))]
+    conn.executemany(
+        'INSERT INTO user_reads (user_id, article_id) VALUES (?, ?);',
+        ((user_id, article_id) for user_id in user_ids for article_id in rng.sample(article_ids, min(reads_per_user, len(article_ids)))),
+    )
+    conn.commit()
+    conn.close()
+    description = {
+        'params': params,
+        'imported_articles': imported,
+        'import_seconds': import_seconds,
+        'build_seconds': time.perf_counter() - start,
+        'db_bytes': db_path.stat().st_size,
+    }
+    description_path.write_text(json.dumps(description, indent=2))
+    return description
+
+# count, error count and latency percentiles in milliseconds of a list of per-call seconds
+def summarize_latencies(samples: list[float], errors: int = 0) -> dict[str, float | int]:
+    latencies = np.asarray(samples, dtype=np.float64) * 1000.0
+    if not len(latencies):
+        return {'count': 0, 'errors': errors}
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'total_seconds': float(latencies.sum() / 1000.0),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+        'ops_per_second': float(len(latencies) / latencies.sum() * 1000.0) if latencies.sum() > 0 else 0.0,
+    }
+
+# calls fn once per argument tuple, a (False, ...) result counts as an error
+def time_calls(fn: Callable[..., Any], calls: list[tuple]) -> tuple[dict[str, float | int], list[Any]]:
+    samples, results, errors = [], [], 0
+    for args in calls:
+        start = time.perf_counter()
+        result = fn(*args)
+        samples.append(time.perf_counter() - start)
+        results.append(result)
+        if isinstance(result, tuple) and result and result[0] is False:
+            errors += 1
+    return (summarize_latencies(samples, errors), results)
+
+# times the DBManager operations against an open corpus, create_article runs last because it adds articles
+def run_operations(db, corpus: dict[str, Any], rng: random.Random, iterations: int, load_repeats: int, seed: dict[str, list[str]]) -> tuple[dict[str, dict[str, float | int]], list[int]]:
+    article_ids = list(db.article_vectors.id_to_row)
+    conn = db.read_conn
+    usernames = [row[0] for row in conn.execute("SELECT username FROM users WHERE username != 'bench_submitter' AND active = 1;")]
+    user_ids = [row[0] for row in conn.execute("SELECT user_id FROM users WHERE username != 'bench_submitter' AND active = 1;")]
+    results: dict[str, dict[str, float | int]] = dict()
+
+    loaded = db.article_vectors
+    load_samples = []
+    for _ in range(load_repeats):
+        db.article_vectors = VectorMatrix()
+        start = time.perf_counter()
+        db.load_article_vectors()
+        load_samples.append(time.perf_counter() - start)
+    db.article_vectors = loaded
+    results['load_article_vectors'] = summarize_latencies(load_samples)
+
+    # one or two consecutive words of an existing title, like a user looking for an article they saw
+    queries = []
+    for article_id in rng.choices(article_ids, k=iterations):
+        words = db.get_article_metadata(article_id)[0].split()
+        start = rng.randrange(len(words))
+        queries.append((' '.join(words[start:start + rng.randint(1, 2)]), 5))
+    results['search_articles_by_title'], _ = time_calls(db.search_articles_by_title, queries)
+    # a keyset page starting after a random article costs the same as the first page however deep it is
+    results['get_recent_articles_page'], _ = time_calls(db.get_recent_articles_page, [(20, encode_cursor(db._article_row(article_id)[5], article_id)) for article_id in rng.choices(article_ids, k=iterations)])
+    results['get_article_text'], _ = time_calls(db.get_article_text, [(rng.choice(article_ids),) for _ in range(iterations)])
+    # bulk imports store no neighbour lists, so the sampled articles get theirs first (untimed), the live
+    # search they replace is timed by passing by_passage explicitly
+    recommend_calls = [(rng.choice(article_ids), rng.choice(user_ids)) for _ in range(iterations)]
+    for article_id in {article_id for article_id, _ in recommend_calls}:
+        db.update_article_neighbors(article_id)
+    results['get_recommended_article'], _ = time_calls(db.get_recommended_article, recommend_calls)
+    results['get_recommended_article_live'], _ = time_calls(db.get_recommended_article, [(article_id, user_id, 1, db.use_passage_index) for article_id, user_id in recommend_calls])
+    # the corpus users' interests come from their imported reads, distinct users so every feed is built uncached
+    db.rebuild_user_interests()
+    results['get_user_feed'], _ = time_calls(db.get_user_feed, [(user_id,) for user_id in rng.sample(user_ids, min(iterations, len(user_ids)))])
+    results['log_in'], logins = time_calls(db.log_in, [(rng.choice(usernames), PASSWORD) for _ in range(iterations)])
+    tokens = [token for success, token in logins if success]
+    results['validate_session'], _ = time_calls(db.session_manager.validate_session, [(rng.choice(tokens),) for _ in range(iterations)])
+    articles = list(synthetic_articles(seed, iterations, rng, corpus['params']['body_sentences'], first_index=corpus['params']['articles']))
+    calls = [(rng.choice(tokens), article['content'], article['title'], datetime.date.fromisoformat(article['publish_date']), article['authors']) for article in articles]
+    results['create_article'], created = time_calls(db.create_article, calls)
+    return (results, [article_id for success, article_id in created if success])
+
+# removes what the benchmark itself added so a reused corpus stays identical across runs
+def clean_up(db_path: pl.Path, workdir: pl.Path, article_store: str, created_ids: list[int]) -> None:
+    conn = sq3.connect(db_path)
+    rows = [(article_id,) for article_id in created_ids]
+    for table in ('article_passages', 'article_heuristics', 'article_logs', 'user_reads', 'summary_jobs', 'articles'):
+        conn.executemany(f'DELETE FROM {table} WHERE article_id = ?;', rows)
+    conn.executemany('DELETE FROM articles_fts WHERE rowid = ?;', rows)
+    # bulk-imported corpora have no neighbour lists or interest vectors, every row was written by the run
+    conn.execute('DELETE FROM article_neighbors;')
+    conn.execute('DELETE FROM user_interests;')
+    conn.execute('DELETE FROM sessions;')
+    conn.commit()
+    conn.close()
+    store = open_article_store(article_store, workdir, cache_bytes=0)
+    try:
+        for article_id in created_ids:
+            store.delete('articles', article_id)
+    finally:
+        store.close()
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=WEB_APP_PATH, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_scale(scale: str, args: argparse.Namespace, vectorizer) -> dict[str, Any]:
+    from .db_utils import DBManager
+    n_articles = SCALES[scale]
+    workdir = pl.Path(args.workdir) / scale
+    n_users = args.users if args.users is not None else max(100, n_articles // 100)
+    # import progress goes to stderr so the json on stdout stays parseable
+    with contextlib.redirect_stdout(sys.stderr):
+        corpus = build_corpus(workdir, n_articles, n_users, args.reads_per_user, args.seed_json, vectorizer, args.rng_seed, args.body_sentences, args.article_store, args.rebuild)
+    db_path, _ = corpus_paths(workdir)
+    start = time.perf_counter()
+    db = DBManager(str(db_path), workdir, embedding_backend='hashing' if args.stub_embeddings else 'model', summarize_on_create=False, article_store=args.article_store)
+    startup_seconds = time.perf_counter() - start
+    created_ids: list[int] = []
+    try:
+        results, created_ids = run_operations(db, corpus, random.Random(args.rng_seed + 1), args.iterations, args.load_repeats, load_seed(args.seed_json))
+    finally:
+        db.close()
+        clean_up(db_path, workdir, args.article_store, created_ids)
+    return {
+        'scale': scale,
+        'corpus': corpus,
+        'startup': {'seconds': startup_seconds, 'components': db.startup_report.rows},
+        'results': results,
+    }
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Time DBManager operations on synthetic corpora and write the results as json.')
+    parser.add_argument('--scale', action='append', choices=list(SCALES), help='corpus size, repeatable (default 1k)')
+    parser.add_argument('--workdir', default='/tmp/ece464-bench', help='corpora are built under <workdir>/<scale> and reused between runs')
+    parser.add_argument('--seed-json', default=str(DEFAULT_SEED_JSON), help='scraped articles the synthetic titles and bodies are drawn from')
+    parser.add_argument('--stub-embeddings', action='store_true', help='use the offline HashingVectorizer instead of the sentence-transformers model')
+    parser.add_argument('--article-store', choices=['directory', 'pack'], default='directory')
+    parser.add_argument('--users', type=int, default=None, help='synthetic users (default articles / 100, at least 100)')
+    parser.add_argument('--reads-per-user', type=int, default=20)
+    parser.add_argument('--body-sentences', type=int, default=8, help='seed sentences per synthetic article')
+    parser.add_argument('--iterations', type=int, default=200, help='calls timed per operation')
+    parser.add_argument('--load-repeats', type=int, default=3, help='times load_article_vectors is timed')
+    parser.add_argument('--rng-seed', type=int, default=464)
+    parser.add_argument('--rebuild', action='store_true', help='rebuild corpora even if a matching one exists')
+    parser.add_argument('--output', default=None, help='json file to write, stdout when omitted')
+    args = parser.parse_args(argv)
+    try:
+        if args.stub_embeddings:
+            from .vectorizer import HashingVectorizer
+            vectorizer = HashingVectorizer()
+        else:
+            from .vectorizer import ArticleVectorizer
+            vectorizer = ArticleVectorizer()
+        report = {
+            'meta': {
+                'git_revision': git_revision(),
+                'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'sqlite': sq3.sqlite_version,
+                'platform': platform.platform(),
+                'stub_embeddings': args.stub_embeddings,
+                'iterations': args.iterations,
+            },
+            'runs': [run_scale(scale, args, vectorizer) for scale in args.scale or ['1k']],
+        }
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    output = json.dumps(report, indent=2)
+    if args.output:
+        pl.Path(args.output).write_text(output + '\n')
+        print(f'Wrote {args.output}', file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
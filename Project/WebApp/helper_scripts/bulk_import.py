@@ -0,0 +1,243 @@
+import argparse
+import datetime
+import json
+import os
+import pathlib as pl
+import sqlite3 as sq3
+import sys
+import time
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterable, Iterator
+from .vector_store import serialize_vector
+from .passages import MAX_CHUNKS, encode_articles, passage_rows
+from .article_store import DirectoryArticleStore, PackArticleStore, open_article_store
+
+CREATE_ACTION_ID = 1
+
+# yields the elements of a top-level json array one at a time without loading the whole file
+def iter_json_array(path: pl.Path | str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as json_file:
+        buffer = ''
+        position = 0
+        started = False
+        eof = False
+        while True:
+            # skip whitespace, the opening bracket and separators between elements
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] in ',['):
+                if buffer[position] == '[':
+                    if started:
+                        break
+                    started = True
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            if position < len(buffer):
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # an element that ends exactly at the buffer end may be a truncated number, read more first
+                    if end < len(buffer) or eof:
+                        yield element
+                        position = end
+                        continue
+            if eof:
+                return
+            chunk = json_file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+def iter_batches(items: Iterator[Any], batch_size: int) -> Iterator[list[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def article_body(article: dict[str, Any]) -> str:
+    # same layout populate_db.py used when posting through the api
+    return '(' + article.get('url', '') + ')\n\n' + article.get('content', '')
+
+def parse_publish_date(value: str | None) -> datetime.date | None:
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+def get_or_create_user(conn: sq3.Connection, username: str, encrypted_password: str) -> int:
+    row = conn.execute('SELECT user_id FROM users WHERE username = ? AND active = 1;', (username,)).fetchone()
+    if row:
+        return row[0]
+    cursor = conn.execute('INSERT INTO users (username, encrypted_passkey) VALUES (?, ?);', (username, encrypted_password,))
+    conn.execute('INSERT INTO user_logs (user_id, log_action_id) VALUES (?, ?);', (cursor.lastrowid, CREATE_ACTION_ID,))
+    conn.commit()
+    return cursor.lastrowid
+
+class BulkImporter:
+    # imports scraped articles straight into the database, bypassing the web api
+    # the main thread encodes batch n + 1 while a writer thread stores batch n:
+    # article files are written in parallel first, then every row of the batch goes in with
+    # executemany inside one transaction, so a batch is either fully visible or not at all
+    # DOIs are recorded in article_sources which makes re-running the import a no-op
+    def __init__(self, db_path: str, path_to_articles: pl.Path, user_id: int, file_workers: int = 8, article_store: str = 'directory') -> None:
+        self.path_to_articles: pl.Path = path_to_articles
+        self.article_store: DirectoryArticleStore | PackArticleStore = open_article_store(article_store, path_to_articles, cache_bytes=0)
+        self.user_id: int = user_id
+        self.conn: sq3.Connection = sq3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL;')
+        self.conn.execute('PRAGMA synchronous=NORMAL;')
+        # the doi lookups run on the main thread while the writer thread owns self.conn
+        self.lookup_conn: sq3.Connection = sq3.connect(db_path)
+        self.seen_dois: set[str] = set()
+        self.file_pool: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=file_workers, thread_name_prefix='import-files')
+        self.writer: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='import-writer')
+        self.imported: int = 0
+        self.skipped: int = 0
+
+    def close(self) -> None:
+        self.writer.shutdown(wait=True)
+        self.file_pool.shutdown(wait=True)
+        self.lookup_conn.close()
+        self.conn.close()
+        self.article_store.close()
+
+    # drops articles without a doi, title or body and DOIs that are already imported or were
+    # seen earlier in this run (the previous batch may still be uncommitted)
+    def new_articles(self, batch: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        dois = [article.get('doi') for article in batch if article.get('doi')]
+        known: set[str] = set()
+        for start in range(0, len(dois), 500):
+            chunk = dois[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            known.update(row[0] for row in self.lookup_conn.execute(f'SELECT doi FROM article_sources WHERE doi IN ({placeholders});', chunk))
+        fresh = []
+        for article in batch:
+            doi = article.get('doi')
+            if not doi or doi in known or doi in self.seen_dois or not article.get('content') or not article.get('title'):
+                self.skipped += 1
+                continue
+            self.seen_dois.add(doi)
+            fresh.append(article)
+        return fresh
+
+    # encoded holds (spans, passage_vectors, pooled_vector) per article from passages.encode_articles
+    def store(self, articles: list[dict[str, Any]], bodies: list[str], encoded: list[tuple[list[tuple[int, int]], np.ndarray, np.ndarray]]) -> None:
+        # BEGIN IMMEDIATE takes the write lock up front so the ids chosen below cannot be taken by the web app
+        self.conn.execute('BEGIN IMMEDIATE;')
+        try:
+            first_id = self.conn.execute('SELECT COALESCE(MAX(article_id), 0) + 1 FROM articles;').fetchone()[0]
+            article_ids = list(range(first_id, first_id + len(articles)))
+            list(self.file_pool.map(lambda article_id, body: self.article_store.write('articles', article_id, body, exclusive=False), article_ids, bodies))
+            article_rows = []
+            for article_id, article in zip(article_ids, articles):
+                date = parse_publish_date(article.get('publish_date'))
+                article_rows.append((
+                    article_id, article['title'], article.get('authors'),
+                    date.day if date else None, date.month if date else None, date.year if date else None,
+                    self.user_id,
+                ))
+            self.conn.executemany(
+                'INSERT INTO articles (article_id, title, authors_str, publish_day, publish_month, publish_year, submitter_user_id) VALUES (?, ?, ?, ?, ?, ?, ?);',
+                article_rows,
+            )
+            self.conn.executemany(
+                'INSERT INTO article_sources (doi, article_id) VALUES (?, ?);',
+                [(article['doi'], article_id) for article_id, article in zip(article_ids, articles)],
+            )
+            self.conn.executemany(
+                'INSERT INTO article_heuristics (article_id, vector) VALUES (?, ?) '
+                'ON CONFLICT(article_id) DO UPDATE SET vector=excluded.vector;',
+                [(article_id, serialize_vector(pooled)) for article_id, (_, _, pooled) in zip(article_ids, encoded)],
+            )
+            self.conn.executemany(
+                'INSERT INTO article_passages (article_id, passage_index, start_char, end_char, vector) VALUES (?, ?, ?, ?, ?);',
+                [row for article_id, (spans, passage_vectors, _) in zip(article_ids, encoded) for row in passage_rows(article_id, spans, passage_vectors)],
+            )
+            self.conn.executemany(
+                'INSERT INTO articles_fts (rowid, title, authors, body) VALUES (?, ?, ?, ?);',
+                [(article_id, article['title'], article.get('authors') or '', body) for article_id, article, body in zip(article_ids, articles, bodies)],
+            )
+            self.conn.executemany(
+                'INSERT INTO article_logs (article_id, user_id, log_action_id) VALUES (?, ?, ?);',
+                [(article_id, self.user_id, CREATE_ACTION_ID) for article_id in article_ids],
+            )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.imported += len(articles)
+
+    # returns (imported, skipped, seconds)
+    def run(self, json_path: pl.Path | str, vectorizer, batch_size: int = 512, encode_batch_size: int = 64, limit: int | None = None, max_chunks: int = MAX_CHUNKS) -> tuple[int, int, float]:
+        return self.import_articles(iter_json_array(json_path), vectorizer, batch_size, encode_batch_size, limit, max_chunks)
+
+    # imports any iterable of scraped-article dicts (the benchmarks feed a synthetic corpus), closes the importer
+    def import_articles(self, source: Iterable[dict[str, Any]], vectorizer, batch_size: int = 512, encode_batch_size: int = 64, limit: int | None = None, max_chunks: int = MAX_CHUNKS) -> tuple[int, int, float]:
+        start = time.perf_counter()
+        in_flight: Future | None = None
+        seen = 0
+        try:
+            for batch in iter_batches(iter(source), batch_size):
+                if limit is not None:
+                    batch = batch[:max(0, limit - seen)]
+                    if not batch:
+                        break
+                seen += len(batch)
+                articles = self.new_articles(batch)
+                if not articles:
+                    continue
+                bodies = [article_body(article) for article in articles]
+                encoded = encode_articles(vectorizer, bodies, max_chunks=max_chunks, batch_size=encode_batch_size)
+                if in_flight is not None:
+                    in_flight.result()
+                in_flight = self.writer.submit(self.store, articles, bodies, encoded)
+                elapsed = time.perf_counter() - start
+                print(f'{seen} read, {self.imported} imported, {self.skipped} skipped, {seen / elapsed:.1f} articles/s', flush=True)
+            if in_flight is not None:
+                in_flight.result()
+        finally:
+            self.close()
+        return (self.imported, self.skipped, time.perf_counter() - start)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Bulk import scraped articles (plos_articles_scraped.json) directly into the database.')
+    parser.add_argument('json_path', help='json array of {title, authors, publish_date, doi, url, content}')
+    parser.add_argument('db_path', help='path to the sqlite database')
+    parser.add_argument('articles_path', nargs='?', default='/evanr', help='directory holding articles/<article_id>.txt')
+    parser.add_argument('--username', default='PLOS', help='submitting account, created if missing')
+    parser.add_argument('--password', default='00000000', help='hex passkey used if the account is created')
+    parser.add_argument('--batch-size', type=int, default=512, help='articles per transaction')
+    parser.add_argument('--encode-batch-size', type=int, default=64, help='texts per SentenceTransformer forward pass')
+    parser.add_argument('--max-chunks', type=int, default=MAX_CHUNKS, help='passages encoded per article')
+    parser.add_argument('--file-workers', type=int, default=8, help='threads writing article files')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--article-store', choices=['directory', 'pack'], default='directory')
+    args = parser.parse_args(argv)
+    try:
+        from .vectorizer import ArticleVectorizer
+        vectorizer = ArticleVectorizer()
+        conn = sq3.connect(args.db_path)
+        user_id = get_or_create_user(conn, args.username, args.password)
+        conn.close()
+        if args.article_store == 'directory':
+            os.makedirs(pl.Path(args.articles_path) / 'articles', exist_ok=True)
+        importer = BulkImporter(args.db_path, pl.Path(args.articles_path), user_id, args.file_workers, args.article_store)
+        imported, skipped, seconds = importer.run(args.json_path, vectorizer, args.batch_size, args.encode_batch_size, args.limit, args.max_chunks)
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    print(f'Imported {imported} articles ({skipped} skipped) in {seconds:.2f}s.')
+    print('Restart the web app (or rebuild the vector indexes) so in-memory vectors pick up the new articles.')
+    print('Then run python -m helper_scripts.neighbors <db_path> so recommendations for them are stored lookups.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import argparse
+import os
+import pathlib as pl
+import sqlite3 as sq3
+import sys
+import time
+from typing import Iterator
+from .article_store import DirectoryArticleStore, PackArticleStore, open_article_store
+
+GENERATE_SUMMARY_ACTION_ID = 3
+
+# yields (article_text, article_id) for every active article that has a text file and no summary yet,
+# files are read lazily so only the batches nlp.pipe is working on are held in memory
+def pending_articles(conn: sq3.Connection, store: DirectoryArticleStore | PackArticleStore, limit: int | None = None) -> Iterator[tuple[str, int]]:
+    cursor = conn.execute('SELECT article_id FROM articles WHERE active = 1 ORDER BY article_id;')
+    yielded = 0
+    for (article_id,) in cursor.fetchall():
+        if limit is not None and yielded >= limit:
+            return
+        if store.exists('summaries', article_id):
+            continue
+        try:
+            text = store.read('articles', article_id)
+        except FileNotFoundError:
+            continue
+        yielded += 1
+        yield (text, article_id)
+
+def flush_summary_rows(conn: sq3.Connection, rows: list[tuple[int, str]]) -> None:
+    if not rows:
+        return
+    conn.executemany(
+        'INSERT INTO article_heuristics (article_id, summary_path) VALUES (?, ?) '
+        'ON CONFLICT(article_id) DO UPDATE SET summary_path=excluded.summary_path;',
+        rows,
+    )
+    conn.executemany(
+        'INSERT INTO article_logs (article_id, user_id, log_action_id) '
+        'SELECT article_id, submitter_user_id, ? FROM articles WHERE article_id = ? AND submitter_user_id IS NOT NULL;',
+        [(GENERATE_SUMMARY_ACTION_ID, article_id) for article_id, _ in rows],
+    )
+    conn.commit()
+    rows.clear()
+
+# summarizes every article missing a summary, safe to interrupt and re-run since finished
+# summaries are skipped, returns (written, failed, seconds)
+def bulk_summarize(db_path: str, path_to_articles: pl.Path, sentence_count: int = 12, batch_size: int = 16, n_process: int = 1, commit_every: int = 200, report_every: int = 100, limit: int | None = None, article_store: str = 'directory') -> tuple[int, int, float]:
+    from .text_summarizer import TextRanker
+    tr = TextRanker(sentence_count=sentence_count)
+    store = open_article_store(article_store, path_to_articles, cache_bytes=0)
+    conn = sq3.connect(db_path)
+    written = failed = 0
+    pending_rows: list[tuple[int, str]] = []
+    start = time.perf_counter()
+    try:
+        for article_id, (success, summary_text) in tr.generate_summaries(pending_articles(conn, store, limit), batch_size=batch_size, n_process=n_process):
+            if not success:
+                failed += 1
+                sys.stderr.write(f'Unable to summarize article {article_id}: {summary_text}\n')
+                continue
+            summary_path = path_to_articles / 'summaries' / f'{article_id}.txt'
+            try:
+                store.write('summaries', article_id, summary_text)
+            except FileExistsError:
+                # written by the web app's summary workers in the meantime
+                continue
+            written += 1
+            pending_rows.append((article_id, str(summary_path)))
+            if len(pending_rows) >= commit_every:
+                flush_summary_rows(conn, pending_rows)
+            if report_every and (written + failed) % report_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f'{written + failed} articles, {(written + failed) / elapsed:.1f} articles/s', flush=True)
+    finally:
+        flush_summary_rows(conn, pending_rows)
+        conn.close()
+        store.close()
+    return (written, failed, time.perf_counter() - start)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Generate missing article summaries in bulk with spaCy nlp.pipe.')
+    parser.add_argument('db_path', help='path to the sqlite database')
+    parser.add_argument('articles_path', nargs='?', default='/evanr', help='directory holding articles/ and summaries/')
+    parser.add_argument('--sentences', type=int, default=12, help='sentences per summary')
+    parser.add_argument('--batch-size', type=int, default=16, help='documents per nlp.pipe batch')
+    parser.add_argument('--n-process', type=int, default=max(1, (os.cpu_count() or 2) - 1), help='spaCy worker processes')
+    parser.add_argument('--commit-every', type=int, default=200)
+    parser.add_argument('--report-every', type=int, default=100)
+    parser.add_argument('--limit', type=int, default=None, help='stop after this many articles')
+    parser.add_argument('--article-store', choices=['directory', 'pack'], default='directory')
+    args = parser.parse_args(argv)
+    try:
+        written, failed, seconds = bulk_summarize(
+            args.db_path, pl.Path(args.articles_path), args.sentences, args.batch_size,
+            args.n_process, args.commit_every, args.report_every, args.limit, args.article_store,
+        )
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    total = written + failed
+    print(f'Summarized {written} articles ({failed} failed) in {seconds:.2f}s, {total / seconds if seconds else 0.0:.1f} articles/s.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
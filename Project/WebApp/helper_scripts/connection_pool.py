@@ -0,0 +1,117 @@
+import sqlite3 as sq3
+import sys
+import threading
+import weakref
+from .metrics import SQLTimer, TimedConnection
+
+class _ThreadConnections:
+    # lives in the pool's thread-local slot, when the owning thread exits this holder is
+    # collected and its connections go back to the pool's idle lists for the next thread
+    def __init__(self, pool: 'ConnectionPool') -> None:
+        self.pool: ConnectionPool = pool
+        self.writer: sq3.Connection | None = None
+        self.reader: sq3.Connection | None = None
+
+    def __del__(self) -> None:
+        try:
+            self.pool._release(self.writer, self.reader)
+        except Exception:
+            pass
+
+class ConnectionPool:
+    # gives every thread its own sqlite connection so transactions from different
+    # flask request threads never interleave on a shared connection
+    # the database runs in WAL mode so readers do not wait behind the writer
+    # reader() connections are opened read-only (mode=ro) and used for query paths
+    # with sql_timer every statement run on a pooled connection is timed (metrics.TimedConnection)
+    def __init__(self, db_path: str, busy_timeout_ms: int = 5000, synchronous: str = 'NORMAL', max_idle: int = 32, sql_timer: SQLTimer | None = None) -> None:
+        self.db_path: str = db_path
+        self.sql_timer: SQLTimer | None = sql_timer
+        self.busy_timeout_ms: int = busy_timeout_ms
+        self.synchronous: str = synchronous
+        self.max_idle: int = max_idle
+        self.local: threading.local = threading.local()
+        self.lock: threading.Lock = threading.Lock()
+        self.idle_writers: list[sq3.Connection] = []
+        self.idle_readers: list[sq3.Connection] = []
+        self.holders: weakref.WeakSet[_ThreadConnections] = weakref.WeakSet()
+        self.closed: bool = False
+        # journal_mode is persistent in the database file, setting it once is enough
+        conn = self._connect(read_only=False)
+        conn.execute('PRAGMA journal_mode=WAL;')
+        self.idle_writers.append(conn)
+
+    def _connect(self, read_only: bool) -> sq3.Connection:
+        factory = TimedConnection if self.sql_timer is not None else sq3.Connection
+        if read_only:
+            conn = sq3.connect(f'file:{self.db_path}?mode=ro', uri=True, check_same_thread=False, timeout=self.busy_timeout_ms / 1000, factory=factory)
+        else:
+            conn = sq3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000, factory=factory)
+        if self.sql_timer is not None:
+            conn.sql_timer = self.sql_timer
+        if not read_only:
+            conn.execute(f'PRAGMA synchronous={self.synchronous};')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)};')
+        conn.execute('PRAGMA foreign_keys=ON;')
+        return conn
+
+    def _holder(self) -> _ThreadConnections:
+        holder = getattr(self.local, 'holder', None)
+        if holder is None:
+            holder = _ThreadConnections(self)
+            self.local.holder = holder
+            with self.lock:
+                self.holders.add(holder)
+        return holder
+
+    # read-write connection owned by the calling thread
+    def writer(self) -> sq3.Connection:
+        holder = self._holder()
+        if holder.writer is None:
+            with self.lock:
+                holder.writer = self.idle_writers.pop() if self.idle_writers else None
+            if holder.writer is None:
+                holder.writer = self._connect(read_only=False)
+        return holder.writer
+
+    # read-only connection owned by the calling thread
+    def reader(self) -> sq3.Connection:
+        holder = self._holder()
+        if holder.reader is None:
+            with self.lock:
+                holder.reader = self.idle_readers.pop() if self.idle_readers else None
+            if holder.reader is None:
+                holder.reader = self._connect(read_only=True)
+        return holder.reader
+
+    def _release(self, writer: sq3.Connection | None, reader: sq3.Connection | None) -> None:
+        for conn, idle in ((writer, self.idle_writers), (reader, self.idle_readers)):
+            if conn is None:
+                continue
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                continue
+            with self.lock:
+                if not self.closed and len(idle) < self.max_idle:
+                    idle.append(conn)
+                    continue
+            conn.close()
+
+    # commits and closes every connection the pool has handed out
+    def close_all(self) -> None:
+        with self.lock:
+            self.closed = True
+            connections = self.idle_writers + self.idle_readers
+            self.idle_writers, self.idle_readers = [], []
+            for holder in list(self.holders):
+                connections.extend(conn for conn in (holder.writer, holder.reader) if conn is not None)
+                holder.writer = holder.reader = None
+        for conn in connections:
+            try:
+                if conn.in_transaction:
+                    conn.commit()
+                conn.close()
+            except Exception as e:
+                sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
@@ -1,16 +1,15 @@
 import sys
-import sqlite3 as sq3
+from .migrations import migrate
 
+# applies db_init.sql (once, as schema version 1) and then any newer migrations/NNNN_<name>.sql,
+# a database that is already up to date only costs one transaction
 def db_init(database_path: str, database_init_path: str) -> bool:
     try:
-        conn: sq3.Connection = sq3.connect(database_path, check_same_thread=False)
-        with open(database_init_path, 'r') as init_query:
-            query: str = init_query.read()
-        conn.executescript(query)
-        conn.commit()
-        conn.close()
+        applied = migrate(database_path, database_init_path)
     except Exception as e:
-        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}')
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
         sys.stderr.write('Unable to initialize database.\n')
         return False
-    return True
\ No newline at end of file
+    for version, name in applied:
+        print(f'Applied schema migration {version:04d}_{name}', flush=True)
+    return True
@@ -1,49 +1,162 @@
 import sqlite3 as sq3
 from .session_manager import SessionManager
 from .text_summarizer import TextRanker
-from .t5_summarizer import T5Summarizer
-from .vectorizer import ArticleVectorizer
+from .vectorizer import ArticleVectorizer, HashingVectorizer
+from .vector_index import VectorMatrix
+from .ann_index import IVFIndex, index_path_for
+from .vector_store import decode_vector_rows, write_vectors, mmap_path_for
+from .connection_pool import ConnectionPool
+from .full_text import fts_query, index_article, unindex_article, BM25_WEIGHTS, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE
+from .lru_cache import LRUCache, TTLCache
+from .summary_jobs import SummaryJobQueue
+from .embedding_batcher import EmbeddingBatcher
+from .hybrid_search import normalize_query, reciprocal_rank_fusion
+from .audit_log import AuditLogBuffer
+from .article_store import DirectoryArticleStore, PackArticleStore, open_article_store
+from .lazy_loader import LazyModel, StartupReport
+from .metrics import Histogram, MetricsRegistry, SQLTimer, instrument_methods
+from .interests import INTEREST_DECAY, apply_reads, read_interest
+from .neighbors import NEIGHBORS_K, write_neighbor_list, offer_neighbor, purge_neighbor, read_neighbor_lists, read_neighbor_referrers
+from .pagination import page_key, split_page
+from .passages import CHUNK_WORDS, OVERLAP_WORDS, MAX_CHUNKS, passage_key, split_passage_key, split_passages, pool_passage_vectors, write_passages
+from . import vector_store
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import atexit
+import gc
+import hashlib
 import sys
+import threading
 import time
 import datetime
 import string
-import pickle
 import numpy as np
 import os
 import pathlib as pl
 from typing import Any
 
+# ids per IN (...) query in the batch methods, well under sqlite's bound-variable limit
+BATCH_QUERY_SIZE = 500
+# article ids refresh_vectors looks at again, see there
+REFRESH_ID_WINDOW = 256
+
 class DBManager:
-    # initializes a connection with the database
+    # initializes a connection pool for the database (each thread gets its own connection)
     # on failure will retry every retry_delay_seconds seconds 
     # and up to connection_retries times until success or raised error 
-    def __init__(self, db_path: str, path_to_articles: pl.Path, connection_retries: int = 4, retry_delay_seconds: float | int = 5.0, remove_file_on_delete_article: bool = False, summary_num_senteces: int = 12) -> None:
+    def __init__(self, db_path: str, path_to_articles: pl.Path, connection_retries: int = 4, retry_delay_seconds: float | int = 5.0, remove_file_on_delete_article: bool = False, summary_num_senteces: int = 12, ann_min_vectors: int = 20000, ann_n_probe: int = 8, ann_save_every: int = 256, use_vector_mmap: bool = False, query_cache_size: int = 1024, summary_workers: int = 2, summary_queue_size: int = 1024, summary_stale_seconds: float = 900.0, embedding_batch_wait_ms: float = 5.0, embedding_max_batch_size: int = 32, warm_up_models: bool = False, allow_model_downloads: bool = False, use_passage_index: bool = False, passage_chunk_words: int = CHUNK_WORDS, passage_overlap_words: int = OVERLAP_WORDS, passage_max_chunks: int = MAX_CHUNKS, session_backend: str = 'sqlite', session_ttl_seconds: float = 7 * 24 * 3600, session_cache_size: int = 4096, audit_batch_size: int = 256, audit_flush_interval_seconds: float = 1.0, audit_max_pending: int = 10000, text_cache_bytes: int = 64 * 2**20, article_store: str = 'directory', recent_articles_ttl_seconds: float = 10.0, metadata_cache_size: int = 4096, embedding_backend: str = 'model', summarize_on_create: bool = True, enable_metrics: bool = True, slow_query_ms: float | None = None, neighbors_k: int = NEIGHBORS_K, interest_decay: float = INTEREST_DECAY, feed_cache_size: int = 4096) -> None:
+        self.closed: bool = False
+        # per-process metrics served by the /metrics route: every public method, every sql statement on the
+        # pool and every model call is timed, statements over slow_query_ms are also logged to stderr
+        self.metrics: MetricsRegistry | None = MetricsRegistry() if enable_metrics else None
+        self.sql_timer: SQLTimer | None = None
+        self.model_call_seconds: Histogram | None = None
+        if self.metrics is not None:
+            self.sql_timer = SQLTimer(self.metrics, slow_query_ms / 1000 if slow_query_ms is not None else None)
+            self.model_call_seconds = self.metrics.histogram('model_call_seconds', 'Duration of model calls, including the first call that loads the model.', ('model', 'method'))
+            instrument_methods(self, self.metrics.histogram('dbmanager_call_seconds', 'Duration of DBManager method calls.', ('method',)), DBManager.instrumented_methods())
+        # time and rss growth of each component, models are added when they are first loaded
+        self.startup_report: StartupReport = StartupReport()
         self.HEXCHARS = set(string.hexdigits)
         self.USERNAMECHARS = set(string.ascii_letters + string.digits + '_')
-        self.session_manager: SessionManager = SessionManager()
-        self.tr = TextRanker(sentence_count=summary_num_senteces)
-        self.t5 = T5Summarizer(model_name='T5-small')
+        # models load on first use so the app starts serving without paying for them
+        # (T5Summarizer is no longer constructed, summaries come from the TextRanker)
+        self.tr: LazyModel = LazyModel('TextRanker', lambda: self.timed_model(TextRanker(sentence_count=summary_num_senteces), 'TextRanker', ('generate_summary', 'generate_summaries')), self.startup_report)
         self.path_to_articles: pl.Path = path_to_articles
         self.remove_file_on_delete_article: bool = remove_file_on_delete_article
+        # article bodies and summaries, 'directory' keeps one file per article under path_to_articles and
+        # 'pack' keeps compressed records in pack files, either way recent reads are cached up to text_cache_bytes
+        self.article_store: DirectoryArticleStore | PackArticleStore = open_article_store(article_store, path_to_articles, text_cache_bytes)
         self.AUTHORCHARS = set(string.ascii_letters + string.digits + string.punctuation + string.whitespace) - {'<', '>'}
         self.TITLECHARS = set(string.ascii_letters + string.digits + string.punctuation + string.whitespace) - {'<', '>'}
         self.ARTICLETEXTCHARS = set(string.ascii_letters + string.digits + string.punctuation + string.whitespace) - {'<', '>'}
-        self.article_vectors: dict[int, np.ndarray] = dict()
-        for i in range(connection_retries):
-            if i != 0:
-                sys.stderr.write('Retrying connection...\n')
-            try:
-                self.conn: sq3.Connection = sq3.connect(db_path, check_same_thread=False)
-            except Exception as e:
-                sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
-                sys.stderr.write(f'Database connection failed (attempt {i+1}/{connection_retries}), will retry connection in {retry_delay_seconds} seconds.\n')
-            else:
-                break # no error means successful connection
-            time.sleep(retry_delay_seconds)
+        # with use_vector_mmap the matrix is backed by an append-only file next to the database so
+        # startup maps it instead of decoding every vector row
+        self.article_vectors: VectorMatrix = VectorMatrix(mmap_path=mmap_path_for(db_path) if use_vector_mmap else None)
+        # approximate index is only used once the corpus has at least ann_min_vectors articles
+        self.ann_index: IVFIndex | None = None
+        self.ann_index_path: pl.Path = index_path_for(db_path)
+        self.ann_min_vectors: int = ann_min_vectors
+        self.ann_n_probe: int = ann_n_probe
+        self.ann_save_every: int = ann_save_every
+        self.ann_unsaved_changes: int = 0
+        # only the owning process writes the index file, prefork workers give it up in after_fork and keep
+        # their changes in memory (the master saves before every fork, a worker reloading the file syncs it)
+        self.ann_index_owner: bool = True
+        # the first index is trained on the ann-trainer thread once the corpus reaches ann_min_vectors, exact
+        # search answers until it is installed, ann_lock orders the install against update_ann_index
+        self.ann_lock: threading.Lock = threading.Lock()
+        self.ann_trainer: threading.Thread | None = None
+        # articles are encoded as up to passage_max_chunks overlapping passages, article_vectors holds their
+        # pooled vector and passage_vectors (keyed by passages.passage_key) the passages themselves
+        # passage scoring is opt-in: a passage-level recommendation runs one exact scan over the ~passage_max_chunks
+        # times larger passage matrix per passage of the article, and the matrix must be held in memory,
+        # without it passage_vectors stays empty and recommendations use article_vectors and the ivf index
+        self.use_passage_index: bool = use_passage_index
+        self.passage_vectors: VectorMatrix = VectorMatrix(mmap_path=mmap_path_for(db_path, 'passages') if use_vector_mmap and use_passage_index else None)
+        self.passage_chunk_words: int = passage_chunk_words
+        self.passage_overlap_words: int = passage_overlap_words
+        self.passage_max_chunks: int = passage_max_chunks
+        # the neighbors_k most similar articles of each article are kept in article_neighbors so a recommendation
+        # is an indexed lookup, create_article and delete_article update the lists they affect (0 disables)
+        self.neighbors_k: int = neighbors_k
+        # each user's reads are folded into a decayed interest vector (user_interests) when the audit log flushes
+        # them, the home page's "for you" feed scores every article against it and is cached per user as
+        # user_id -> (read_count, k, [(article_id, score), ...]) until their next read
+        self.interest_decay: float = interest_decay
+        self.user_feed_cache: LRUCache = LRUCache(max_entries=feed_cache_size)
+        # the home page's recent-articles list, cleared by create_article and delete_article, the ttl bounds
+        # how stale it can be when another process made the change
+        self.recent_articles_cache: TTLCache = TTLCache(ttl_seconds=recent_articles_ttl_seconds, max_entries=16)
+        # article_id -> articles row used by get_article_metadata and get_article_validators (rows never change
+        # after creation apart from active)
+        self.article_metadata_cache: LRUCache = LRUCache(max_entries=metadata_cache_size)
+        # embeddings of recent search queries, a repeated query skips the model
+        self.query_embedding_cache: LRUCache = LRUCache(max_entries=query_cache_size)
+        # embedding_backend='hashing' swaps the model for the offline HashingVectorizer (benchmarks only)
+        if embedding_backend == 'model':
+            self.av: LazyModel = LazyModel('ArticleVectorizer', lambda: self.timed_model(ArticleVectorizer(local_files_only=not allow_model_downloads), 'ArticleVectorizer', ('encode', 'encode_batch')), self.startup_report)
+        elif embedding_backend == 'hashing':
+            self.av = LazyModel('HashingVectorizer', lambda: self.timed_model(HashingVectorizer(), 'HashingVectorizer', ('encode', 'encode_batch')), self.startup_report)
         else:
-            raise sq3.DatabaseError('Could not connect to database.\n')
-        self.av: ArticleVectorizer = ArticleVectorizer()
-        self.load_article_vectors()
+            raise ValueError(f'Unknown embedding backend {embedding_backend!r}, expected model or hashing.')
+        self.summarize_on_create: bool = summarize_on_create
+        # settings of the per-process services, see _start_services
+        self.db_path: str = db_path
+        self.connection_retries: int = connection_retries
+        self.retry_delay_seconds: float | int = retry_delay_seconds
+        self.summary_workers: int = summary_workers
+        self.summary_queue_size: int = summary_queue_size
+        # pending and running summary_jobs rows untouched for this long belong to a process that died with them
+        self.summary_stale_seconds: float = summary_stale_seconds
+        self.audit_batch_size: int = audit_batch_size
+        self.audit_flush_interval_seconds: float = audit_flush_interval_seconds
+        self.audit_max_pending: int = audit_max_pending
+        self.session_backend: str = session_backend
+        self.session_ttl_seconds: float = session_ttl_seconds
+        self.session_cache_size: int = session_cache_size
+        self.embedding_batch_wait_ms: float = embedding_batch_wait_ms
+        self.embedding_max_batch_size: int = embedding_max_batch_size
+        # set by after_fork in prefork workers, which poll for articles created or deleted by the other workers
+        self.vector_refresh_seconds: float | None = None
+        self.vector_refresh_stop: threading.Event = threading.Event()
+        self.vector_refresher: threading.Thread | None = None
+        self._start_services()
+        self._fail_stale_summary_jobs()
+        with self.startup_report.measure('article vectors'):
+            self.load_article_vectors()
+        if self.use_passage_index:
+            with self.startup_report.measure('passage vectors'):
+                self.load_passage_vectors()
+        with self.startup_report.measure('ann index'):
+            self.load_ann_index()
+        # newest article vector and article log row seen, refresh_vectors continues from there
+        self.synced_article_id: int = max(self.article_vectors.id_to_row, default=0)
+        self.synced_log_id: int = self.read_conn.execute('SELECT COALESCE(MAX(log_id), 0) FROM article_logs;').fetchone()[0]
+        if self.metrics is not None:
+            self.metrics.gauge('component_stat', 'Counters and sizes reported by caches, queues and stores.', ('component', 'stat'), self.component_stats)
+        atexit.register(self.close)
+        if warm_up_models:
+            self.warm_up(background=True)
         self.user_actions: dict[str, int] = {
             'CREATE' : 1,
             'DEACTIVATE' : 2,
@@ -56,47 +169,397 @@ class DBManager:
             'GENERATE_SUMMARY' : 3,
         }
     
-    def __del__(self):
+    # public methods wrapped by instrument_methods, lifecycle and helper methods are left out
+    @classmethod
+    def instrumented_methods(cls) -> list[str]:
+        excluded = {'close', 'warm_up', 'load_models', 'before_fork', 'after_fork', 'refresh_before_fork', 'timed_model', 'component_stats', 'serialize_vector', 'deserialize_vector', 'instrumented_methods'}
+        return [name for name, value in vars(cls).items() if callable(value) and not name.startswith('_') and name not in excluded]
+
+    def timed_model(self, model: Any, name: str, methods: tuple[str, ...]) -> Any:
+        if self.model_call_seconds is None:
+            return model
+        return instrument_methods(model, self.model_call_seconds, methods, (name,))
+
+    # (component, stat) -> value for the component_stat gauge
+    def component_stats(self) -> dict[tuple[str, str], float]:
+        sources: dict[str, dict[str, Any]] = {
+            'article_store': self.article_store.stats(),
+            'audit_log': self.audit_log.stats(),
+            'session_cache': self.session_manager.cache.stats(),
+            'query_embedding_cache': self.query_embedding_cache.stats(),
+            'recent_articles_cache': self.recent_articles_cache.stats(),
+            'article_metadata_cache': self.article_metadata_cache.stats(),
+            'user_feed_cache': self.user_feed_cache.stats(),
+            'embedder': self.embedder.metrics(),
+            'summary_jobs': {'pending': self.summary_jobs.pending_count()},
+            'vectors': {'articles': len(self.article_vectors), 'passages': len(self.passage_vectors)},
+        }
+        return {(component, stat): value for component, stats in sources.items() for stat, value in stats.items() if isinstance(value, (int, float))}
+
+    # loads the models and runs one encode + summary so the first real request does not pay for it
+    # with background=True this runs on a daemon thread and returns immediately
+    def warm_up(self, background: bool = False) -> threading.Thread | None:
+        if background:
+            thread = threading.Thread(target=self.warm_up, name='model-warm-up', daemon=True)
+            thread.start()
+            return thread
         try:
-            self.conn.commit()
-            self.conn.close()
+            with self.startup_report.measure('warm-up encode'):
+                self.embedder.encode('warm up')
+            with self.startup_report.measure('warm-up summary'):
+                self.tr.generate_summary('Warm up. The summarizer runs once before serving requests.')
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return None
+
+    # the per-process half of the manager: the connection pool, the write-behind log, sessions, summary jobs and
+    # the embedding threads, threads and sqlite connections do not survive fork so a prefork master stops them
+    # with before_fork and every worker starts its own with after_fork, the models, vectors and caches are shared
+    def _start_services(self) -> None:
+        self.query_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='query-embedding')
+        self.summary_jobs: SummaryJobQueue = SummaryJobQueue(self.generate_article_summary, num_workers=self.summary_workers, max_queue=self.summary_queue_size, on_status=self._record_summary_status)
+        for i in range(self.connection_retries):
+            if i != 0:
+                sys.stderr.write('Retrying connection...\n')
+            try:
+                with self.startup_report.measure('ConnectionPool'):
+                    self.pool: ConnectionPool = ConnectionPool(self.db_path, sql_timer=self.sql_timer)
+            except Exception as e:
+                sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+                sys.stderr.write(f'Database connection failed (attempt {i+1}/{self.connection_retries}), will retry connection in {self.retry_delay_seconds} seconds.\n')
+            else:
+                break # no error means successful connection
+            time.sleep(self.retry_delay_seconds)
+        else:
+            raise sq3.DatabaseError('Could not connect to database.\n')
+        # user_logs, article_logs and user_reads rows are written behind in batches
+        self.audit_log: AuditLogBuffer = AuditLogBuffer(self.pool, max_batch=self.audit_batch_size, flush_interval_seconds=self.audit_flush_interval_seconds, max_pending=self.audit_max_pending, on_flush=self._apply_read_interests)
+        # sessions are kept in the database by default so they survive restarts and work across processes
+        self.session_manager: SessionManager = SessionManager(backend=self.session_backend, pool=self.pool, ttl_seconds=self.session_ttl_seconds, cache_size=self.session_cache_size)
+        # concurrent encode calls (article creation, search queries) share forward passes through the batcher
+        self.embedder: EmbeddingBatcher = EmbeddingBatcher(self.av, max_wait_ms=self.embedding_batch_wait_ms, max_batch_size=self.embedding_max_batch_size)
+        self.services_running: bool = True
+
+    def _stop_services(self) -> None:
+        if not self.services_running:
+            return
+        self.services_running = False
+        self.vector_refresh_stop.set()
+        if self.vector_refresher is not None:
+            self.vector_refresher.join()
+        self.query_executor.shutdown(wait=True, cancel_futures=True)
+        self.summary_jobs.shutdown(wait=True)
+        self.embedder.shutdown(wait=True)
+        self.session_manager.close()
+        self.audit_log.close()
+        self.pool.close_all()
+
+    # loads both models without running them (a forward pass would start the model's thread pools, which
+    # do not survive fork), used by a prefork master so every worker shares the weights copy-on-write
+    def load_models(self) -> None:
+        self.av.get()
+        self.tr.get()
+
+    # called in the prefork master before it forks workers: saves the ann index, stops the per-process services,
+    # closes every connection and moves the loaded objects to the permanent gc generation so collections in
+    # the workers do not write to (and so copy) the shared pages
+    # a memory-mapped matrix would be shared by the workers, which append to it without coordination, so
+    # use_vector_mmap is refused here and stays a single-process option
+    def before_fork(self) -> None:
+        if self.article_vectors.mmap_file is not None or self.passage_vectors.mmap_file is not None:
+            raise RuntimeError('use_vector_mmap cannot be combined with a prefork server, the workers would write the same vector file.')
+        if self.ann_trainer is not None:
+            self.ann_trainer.join()
+        if self.ann_unsaved_changes:
+            self.save_ann_index()
+        self._stop_services()
+        # the pack store's index connections and maps are reopened on first use in each worker
+        self.article_store.close()
+        gc.collect()
+        gc.freeze()
+
+    # brings a prefork master's vectors up to date before a graceful reload forks the next generation of workers
+    def refresh_before_fork(self) -> None:
+        self._start_services()
+        try:
+            self.refresh_vectors()
+        finally:
+            self.before_fork()
+
+    # called in every worker right after fork, vector_refresh_seconds enables polling for the articles the
+    # other workers create and delete (their vectors are only in that worker's memory)
+    def after_fork(self, vector_refresh_seconds: float | None = 5.0) -> None:
+        self.vector_refresh_stop = threading.Event()
+        self.vector_refresher = None
+        self.ann_index_owner = False
+        self._start_services()
+        self.vector_refresh_seconds = vector_refresh_seconds
+        if vector_refresh_seconds:
+            self.vector_refresher = threading.Thread(target=self._refresh_vectors_loop, name='vector-refresher', daemon=True)
+            self.vector_refresher.start()
+
+    def _refresh_vectors_loop(self) -> None:
+        while not self.vector_refresh_stop.wait(self.vector_refresh_seconds):
+            try:
+                self.refresh_vectors()
+                # workers never train the index, they pick up the one the master or the ann_index cli wrote
+                if self.ann_index is None and os.path.exists(self.ann_index_path):
+                    self.load_ann_index()
+            except Exception as e:
+                sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+                sys.stderr.write('Unable to refresh article vectors.\n')
+
+    # persists in-memory state and closes every pooled connection, safe to call more than once
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.ann_unsaved_changes:
+                self.save_ann_index()
+            self.article_vectors.close()
+            self.passage_vectors.close()
+            if self.services_running:
+                self.services_running = False
+                self.vector_refresh_stop.set()
+                self.query_executor.shutdown(wait=False, cancel_futures=True)
+                self.summary_jobs.shutdown(wait=False)
+                self.embedder.shutdown(wait=False)
+                self.session_manager.close()
+                self.audit_log.close()
+                self.pool.close_all()
+            self.article_store.close()
         except Exception as e:
             sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
 
+    def __del__(self):
+        self.close()
+
+    # read-write connection for the calling thread
+    @property
+    def conn(self) -> sq3.Connection:
+        return self.pool.writer()
+
+    # read-only connection for the calling thread, used by query paths
+    @property
+    def read_conn(self) -> sq3.Connection:
+        return self.pool.reader()
+
+    # reads vector rows into article_vectors, pickled rows from older versions are converted in place
+    # when the matrix is memory-mapped only rows newer than the last mapped article are read, and mapped
+    # articles that are no longer active (deleted while the app was down) are tombstoned
     def load_article_vectors(self):
         try:
-            cursor = self.conn.execute('SELECT article_id, vector FROM article_heuristics WHERE vector IS NOT NULL;')
-            for article_id, vec_blob in cursor.fetchall():
-                try:
-                    self.article_vectors[article_id] = DBManager.deserialize_vector(vec_blob)
-                except Exception as e:
-                    sys.stderr.write(f'Failed to deserialize vector for article_id {article_id}: {e}\n')
-                    return False
+            newest_loaded_id = max(self.article_vectors.id_to_row, default=0) if self.article_vectors.mmap_file is not None else 0
+            if newest_loaded_id:
+                self.remove_inactive_vectors()
+            cursor = self.read_conn.execute(
+                'SELECT /* full scan */ article_heuristics.article_id, article_heuristics.vector '
+                'FROM article_heuristics '
+                'JOIN articles ON articles.article_id = article_heuristics.article_id '
+                'WHERE article_heuristics.article_id > ? AND article_heuristics.vector IS NOT NULL AND articles.active = 1;',
+                (newest_loaded_id,),
+            )
+            try:
+                article_ids, vectors, legacy_vectors = decode_vector_rows(cursor.fetchall())
+            except Exception as e:
+                sys.stderr.write(f'Failed to deserialize article vectors: {e}\n')
+                return False
+            if len(article_ids):
+                self.article_vectors.add_many(article_ids, vectors)
+            if legacy_vectors:
+                write_vectors(self.conn, legacy_vectors)
+                sys.stderr.write(f'Converted {len(legacy_vectors)} pickled article vectors to float32 blobs.\n')
             return True
         except Exception as e:
             sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
             sys.stderr.write('Failed to load article vectors into memory.\n')
             return False
 
+    # the ids of article_ids that are not active articles, one IN (...) query per BATCH_QUERY_SIZE ids
+    def _inactive_article_ids(self, article_ids: list[int]) -> set[int]:
+        active_ids = set()
+        for start in range(0, len(article_ids), BATCH_QUERY_SIZE):
+            chunk = article_ids[start:start + BATCH_QUERY_SIZE]
+            cursor = self.read_conn.execute(
+                f'SELECT article_id FROM articles WHERE article_id IN ({", ".join("?" for _ in chunk)}) AND active = 1;',
+                chunk,
+            )
+            active_ids.update(row[0] for row in cursor)
+        return set(article_ids) - active_ids
+
+    # tombstones the mapped vectors whose article was deleted, returns how many were removed
+    def remove_inactive_vectors(self) -> int:
+        removed = self._inactive_article_ids(list(self.article_vectors.id_to_row))
+        for article_id in removed:
+            self.article_vectors.remove(article_id)
+        if removed:
+            self.article_vectors.flush()
+        return len(removed)
+
+    # tombstones the mapped passages whose article was deleted, returns how many articles they belonged to
+    def remove_inactive_passages(self) -> int:
+        keys_by_article: dict[int, list[int]] = dict()
+        for key in self.passage_vectors.id_to_row:
+            keys_by_article.setdefault(split_passage_key(key)[0], []).append(key)
+        removed = self._inactive_article_ids(list(keys_by_article))
+        for article_id in removed:
+            for key in keys_by_article[article_id]:
+                self.passage_vectors.remove(key)
+        if removed:
+            self.passage_vectors.flush()
+        return len(removed)
+
+    # like load_article_vectors, a memory-mapped passage matrix only reads the passages of newer articles
+    def load_passage_vectors(self) -> bool:
+        try:
+            newest_loaded_id = 0
+            if self.passage_vectors.mmap_file is not None and len(self.passage_vectors):
+                newest_loaded_id = split_passage_key(max(self.passage_vectors.id_to_row))[0]
+                self.remove_inactive_passages()
+            cursor = self.read_conn.execute(
+                'SELECT /* full scan */ article_passages.article_id, article_passages.passage_index, article_passages.vector '
+                'FROM article_passages '
+                'JOIN articles ON articles.article_id = article_passages.article_id '
+                'WHERE article_passages.article_id > ? AND articles.active = 1;',
+                (newest_loaded_id,),
+            )
+            keys, vectors, _ = decode_vector_rows((passage_key(article_id, index), blob) for article_id, index, blob in cursor.fetchall())
+            if len(keys):
+                self.passage_vectors.add_many(keys, vectors)
+            return True
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write('Failed to load passage vectors into memory.\n')
+            return False
+
+    # picks up the articles other processes sharing the database created or deleted since the last call
+    # (prefork workers each hold their own vectors), returns (added, removed)
+    # vectors are written after the article row is committed, so a newer article's vector can land first,
+    # the last REFRESH_ID_WINDOW ids are therefore looked at again
+    def refresh_vectors(self) -> tuple[int, int]:
+        rows = self.read_conn.execute(
+            'SELECT article_heuristics.article_id, article_heuristics.vector '
+            'FROM article_heuristics '
+            'JOIN articles ON articles.article_id = article_heuristics.article_id '
+            'WHERE article_heuristics.article_id > ? AND article_heuristics.vector IS NOT NULL AND articles.active = 1;',
+            (max(0, self.synced_article_id - REFRESH_ID_WINDOW),),
+        ).fetchall()
+        self.synced_article_id = max([self.synced_article_id] + [article_id for article_id, _ in rows])
+        article_ids, vectors, _ = decode_vector_rows([(article_id, blob) for article_id, blob in rows if article_id not in self.article_vectors.id_to_row])
+        for article_id, vector in zip(article_ids, vectors):
+            self.article_vectors.add(int(article_id), vector)
+            self.update_ann_index(int(article_id), vector)
+        if self.use_passage_index and len(article_ids):
+            for start in range(0, len(article_ids), BATCH_QUERY_SIZE):
+                chunk = [int(article_id) for article_id in article_ids[start:start + BATCH_QUERY_SIZE]]
+                cursor = self.read_conn.execute(
+                    f'SELECT article_id, passage_index, vector FROM article_passages WHERE article_id IN ({", ".join("?" for _ in chunk)});',
+                    chunk,
+                )
+                keys, passage_vectors, _ = decode_vector_rows((passage_key(article_id, index), blob) for article_id, index, blob in cursor.fetchall())
+                if len(keys):
+                    self.passage_vectors.add_many(keys, passage_vectors)
+        newest_log_id = self.read_conn.execute('SELECT COALESCE(MAX(log_id), 0) FROM article_logs;').fetchone()[0]
+        deleted = self.read_conn.execute(
+            'SELECT article_id FROM article_logs WHERE log_id > ? AND log_id <= ? AND log_action_id = ?;',
+            (self.synced_log_id, newest_log_id, self.article_actions['DELETE'],),
+        ).fetchall()
+        self.synced_log_id = max(self.synced_log_id, newest_log_id)
+        removed = 0
+        for (article_id,) in deleted:
+            self.article_metadata_cache.pop(article_id)
+            if self.article_vectors.remove(article_id):
+                removed += 1
+                self.update_ann_index(article_id, None)
+                for passage_index in range(self.passage_max_chunks):
+                    self.passage_vectors.remove(passage_key(article_id, passage_index))
+        if len(article_ids) or removed:
+            self.recent_articles_cache.clear()
+        return (len(article_ids), removed)
+
+    # loads the persisted ivf index (reconciling it with the loaded vectors) or trains
+    # a new one once the corpus is large enough for approximate search to pay off
+    def load_ann_index(self) -> bool:
+        try:
+            if os.path.exists(self.ann_index_path):
+                index = IVFIndex.load(self.ann_index_path)
+                index.n_probe = self.ann_n_probe
+                with self.ann_lock:
+                    added, removed = index.sync_with(self.article_vectors)
+                    self.ann_index = index
+                if added or removed:
+                    self.save_ann_index()
+            elif self.ann_index_owner and len(self.article_vectors) >= self.ann_min_vectors:
+                self.rebuild_ann_index()
+            return True
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write('Failed to load approximate nearest-neighbour index, falling back to exact search.\n')
+            self.ann_index = None
+            return False
+
+    def rebuild_ann_index(self, n_lists: int | None = None) -> None:
+        ids, vectors = self.article_vectors.snapshot()
+        index = IVFIndex.train(vectors, n_lists=n_lists, n_probe=self.ann_n_probe)
+        index.add_many(ids, vectors)
+        with self.ann_lock:
+            # articles created or deleted while training are applied before the index takes over
+            index.sync_with(self.article_vectors)
+            self.ann_index = index
+        self.save_ann_index()
+
+    # trains the first index off the request path, only in the process that owns the index file
+    def start_ann_training(self) -> bool:
+        if not self.ann_index_owner or (self.ann_trainer is not None and self.ann_trainer.is_alive()):
+            return False
+        self.ann_trainer = threading.Thread(target=self._train_ann_index, name='ann-trainer', daemon=True)
+        self.ann_trainer.start()
+        return True
+
+    def _train_ann_index(self) -> None:
+        try:
+            self.rebuild_ann_index()
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write('Unable to train the approximate nearest-neighbour index, exact search stays in use.\n')
+
+    # writes the index file when this process owns it, returns False when there was nothing to write
+    def save_ann_index(self) -> bool:
+        if self.ann_index is None or not self.ann_index_owner:
+            return False
+        self.ann_index.save(self.ann_index_path)
+        self.ann_unsaved_changes = 0
+        return True
+
+    # keeps the ivf index in step with article_vectors, the file is rewritten every ann_save_every changes
+    def update_ann_index(self, article_id: int, vector: np.ndarray | None) -> None:
+        with self.ann_lock:
+            if self.ann_index is None:
+                if len(self.article_vectors) >= self.ann_min_vectors:
+                    self.start_ann_training()
+                return
+            if vector is None:
+                self.ann_index.remove(article_id)
+            else:
+                self.ann_index.add(article_id, vector)
+            self.ann_unsaved_changes += 1
+        if self.ann_unsaved_changes >= self.ann_save_every:
+            self.save_ann_index()
+
     def serialize_vector(vector: np.ndarray) -> bytes:
-        return pickle.dumps(vector)
+        return vector_store.serialize_vector(vector)
 
     def deserialize_vector(data: bytes) -> np.ndarray:
-        return pickle.loads(data)
+        return vector_store.deserialize_vector(data)
     
     # USER FUNCTIONS
 
+    # log events are queued on the write-behind audit_log buffer, False means the buffer was full
     def log_user_action(self, user_id: int, user_action_id: int) -> bool:
-        try:
-            self.conn.execute(
-                'INSERT INTO user_logs (user_id, log_action_id) VALUES (?, ?);',
-                (user_id, user_action_id,),
-            )
-            self.conn.commit()
+        if self.audit_log.log_user_action(user_id, user_action_id):
             return True
-        except Exception as e:
-            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
-            sys.stderr.write(f'Unable to log user action with {user_id=} and {user_action_id=} at {datetime.datetime.now()}.\n')
+        sys.stderr.write(f'Unable to log user action with {user_id=} and {user_action_id=} at {datetime.datetime.now()}.\n')
         return False
     
     def create_user(self, username: str, encrypted_password: str) -> tuple[bool, str | None]:
@@ -113,7 +576,7 @@ class DBManager:
         ]):
             return (False, 'Password Error')
         try:
-            cursor: sq3.Cursor = self.conn.execute(
+            cursor: sq3.Cursor = self.read_conn.execute(
                 'SELECT COUNT(*) AS cnt FROM users WHERE username = ? AND active = 1;',
                 (username,),
             )
@@ -152,10 +615,10 @@ class DBManager:
         user_id: int = self.session_manager.validate_session(token)
         if user_id == -1:
             return (False, 'Invalid Session')
-        cursor: sq3.Cursor = self.conn.cursor()
+        cursor: sq3.Cursor = self.read_conn.cursor()
         try:
             cursor.execute(
-                'SELECT COUNT(*) AS cnt FROM users WHERE user_id = ? AND encrypted_password = ? AND active = 1;',
+                'SELECT COUNT(*) AS cnt FROM users WHERE user_id = ? AND encrypted_passkey = ? AND active = 1;',
                 (user_id, encrypted_password,),
             )
         except Exception as e:
@@ -186,7 +649,7 @@ class DBManager:
         return (True, None)
             
     def log_in(self, username: str, encrypted_password: str) -> tuple[bool, str | None]:
-        cursor: sq3.Cursor = self.conn.cursor()
+        cursor: sq3.Cursor = self.read_conn.cursor()
         try:
             cursor.execute(
                 'SELECT user_id FROM users WHERE username = ? AND encrypted_passkey = ? AND active = 1;',
@@ -222,16 +685,9 @@ class DBManager:
     # ARTICLE FUNCTIONS
 
     def log_article_action(self, article_id: int, user_id: int, article_action_id: int) -> bool:
-        try:
-            self.conn.execute(
-                'INSERT INTO article_logs (article_id, user_id, log_action_id) VALUES (?, ?, ?);',
-                (article_id, user_id, article_action_id,),
-            )
-            self.conn.commit()
+        if self.audit_log.log_article_action(article_id, user_id, article_action_id):
             return True
-        except Exception as e:
-            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
-            sys.stderr.write(f'Unable to log article action with {article_id=}, {user_id=} and {article_action_id=} at {datetime.datetime.now()}.\n')
+        sys.stderr.write(f'Unable to log article action with {article_id=}, {user_id=} and {article_action_id=} at {datetime.datetime.now()}.\n')
         return False
 
     def delete_article(self, token: str, article_id: int) -> tuple[bool, str | None]:
@@ -259,11 +715,19 @@ class DBManager:
                 'UPDATE articles SET active = 0 WHERE article_id = ?;',
                 (article_id,),
             )
+            unindex_article(self.conn, article_id)
             self.conn.commit()
+            self.article_metadata_cache.pop(article_id)
+            self.recent_articles_cache.clear()
+            self.article_vectors.remove(article_id)
+            self.update_ann_index(article_id, None)
+            for passage_index in range(self.passage_max_chunks):
+                self.passage_vectors.remove(passage_key(article_id, passage_index))
+            if self.neighbors_k:
+                self.remove_article_neighbors(article_id)
             if self.remove_file_on_delete_article:
-                article_path: pl.Path = self.path_to_articles / 'articles' / f'{article_id}.txt'
-                if os.path.exists(article_path):
-                    os.remove('')
+                self.article_store.delete('articles', article_id)
+                self.article_store.delete('summaries', article_id)
         except Exception as e:
             sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
             sys.stderr.write(f'Unable to delete article.\n')
@@ -272,18 +736,16 @@ class DBManager:
             return (False, 'Article Deletion Logging Error')
         return (True, None)
     
+    # served from the article store's cache, shared by the article page, summaries, recommendations and passage snippets
     def get_article_text(self, article_id: int) -> tuple[bool, str | None]:
-        article_path: pl.Path = self.path_to_articles / 'articles' / f'{article_id}.txt'
-        if os.path.exists(article_path):
-            try:
-                with open(article_path, 'r') as article_file:
-                    return (True, article_file.read())
-            except Exception as e:
-                sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
-                sys.stderr.write(f'Unable to fetch articlewith id: {article_id}.\n')
-                return (False, 'Unable to get article.')
-        else:
+        try:
+            return (True, self.article_store.read('articles', article_id))
+        except FileNotFoundError:
             return (False, 'Article does not exist.')
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write(f'Unable to fetch articlewith id: {article_id}.\n')
+            return (False, 'Unable to get article.')
     
     def read_article_text(self, token: str, article_id: int) -> tuple[bool, str | None]:
         user_id: int = self.session_manager.validate_session(token)
@@ -294,20 +756,86 @@ class DBManager:
             return (False, article_text)
         return (True, article_text)
     
+    def read_article_summary(self, article_id: int) -> tuple[bool, str | None]:
+        try:
+            return (True, self.article_store.read('summaries', article_id))
+        except FileNotFoundError:
+            return (False, None)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write(f'Unable to fetch article summary for article with id: {article_id}.\n')
+            return (False, 'Unable to get article summary.')
+
+    # returns (True, summary) when the summary already exists
+    # returns (True, None) when it is not ready yet, generation has been queued and
+    # get_summary_status can be polled until it reports done
     def get_article_summary(self, token: str, article_id: int) -> tuple[bool, str | None]:
         user_id: int = self.session_manager.validate_session(token)
         if user_id == -1:
             return (False, 'Invalid Session')
-        
+        read_success, summary_text = self.read_article_summary(article_id)
+        if read_success:
+            return (True, summary_text)
+        if summary_text is not None:
+            return (False, summary_text)
+        status = self.summary_jobs.enqueue(article_id, user_id)
+        if status == 'rejected':
+            return (False, 'Summary queue is full, try again later.')
+        return (True, None)
+
+    # returns {'status': pending | running | done | failed | unknown, 'summary': str | None, 'error': str | None}
+    def get_summary_status(self, token: str, article_id: int) -> tuple[bool, dict[str, str | None] | str]:
+        user_id: int = self.session_manager.validate_session(token)
+        if user_id == -1:
+            return (False, 'Invalid Session')
+        read_success, summary_text = self.read_article_summary(article_id)
+        if read_success:
+            return (True, {'status': 'done', 'summary': summary_text, 'error': None})
+        job = self.summary_job_status(article_id)
+        return (True, {'status': job['status'], 'summary': None, 'error': job['error']})
+
+    # this process's job, else the status another process recorded in summary_jobs, else unknown
+    def summary_job_status(self, article_id: int) -> dict[str, str | None]:
+        job = self.summary_jobs.status(article_id)
+        if job['status'] != 'unknown':
+            return {'status': job['status'], 'error': job['error']}
+        row = self.read_conn.execute('SELECT status, error FROM summary_jobs WHERE article_id = ?;', (article_id,)).fetchone()
+        return {'status': row[0], 'error': row[1]} if row else {'status': 'unknown', 'error': None}
+
+    # SummaryJobQueue on_status hook, a stored summary answers done by itself so its row is dropped
+    def _record_summary_status(self, article_id: int, status: str, error: str | None) -> None:
+        if status == 'done':
+            self.conn.execute('DELETE FROM summary_jobs WHERE article_id = ?;', (article_id,))
+        else:
+            self.conn.execute(
+                'INSERT INTO summary_jobs (article_id, status, error, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP) '
+                'ON CONFLICT(article_id) DO UPDATE SET status=excluded.status, error=excluded.error, updated_at=excluded.updated_at;',
+                (article_id, status, error,),
+            )
+        self.conn.commit()
+
+    # marks the pending and running jobs of crashed processes failed so pollers stop waiting and can queue them
+    # again, rows of live processes are rewritten on their next change so only stale ones are touched
+    def _fail_stale_summary_jobs(self) -> int:
+        try:
+            cursor = self.conn.execute(
+                "UPDATE /* full scan */ summary_jobs SET status = 'failed', error = 'Summary was interrupted, request it again.', updated_at = CURRENT_TIMESTAMP "
+                "WHERE status IN ('pending', 'running') AND updated_at < datetime('now', ?);",
+                (f'-{self.summary_stale_seconds} seconds',),
+            )
+            self.conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            self.conn.rollback()
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write('Unable to clear stale summary jobs.\n')
+            return 0
+
+    # runs on a SummaryJobQueue worker thread
+    def generate_article_summary(self, article_id: int, user_id: int) -> tuple[bool, str]:
         summary_path: pl.Path = self.path_to_articles / 'summaries' / f'{article_id}.txt'
-        if os.path.exists(summary_path):
-            try:
-                with open(summary_path, 'r') as summary_file:
-                    return (True, summary_file.read())
-            except Exception as e:
-                sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
-                sys.stderr.write(f'Unable to fetch article summary for article with id: {article_id}.\n')
-                return (False, 'Unable to get article summary.')
+        if self.article_store.exists('summaries', article_id):
+            return (True, 'Summary already exists.')
         get_article_text_succes, article_text = self.get_article_text(article_id)
         if not get_article_text_succes:
             return (False, article_text)
@@ -323,11 +851,16 @@ class DBManager:
         if not generate_summary_success:
             return (False, summary_text)
         try:
-            with open(summary_path, 'x') as summary_file:
-                summary_file.write(summary_text)
+            self.article_store.write('summaries', article_id, summary_text)
+            self.conn.execute(
+                'INSERT INTO article_heuristics (article_id, summary_path) VALUES (?, ?) '
+                'ON CONFLICT(article_id) DO UPDATE SET summary_path=excluded.summary_path;',
+                (article_id, str(summary_path),),
+            )
+            self.conn.commit()
         except Exception as e:
                 sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
-                sys.stderr.write(f'Unable to fetch article summary for article with id: {article_id}.\n')
+                sys.stderr.write(f'Unable to save article summary for article with id: {article_id}.\n')
                 return (False, 'Unable to save new article summary.')
         if not self.log_article_action(article_id, user_id, self.article_actions['GENERATE_SUMMARY']):
             return (False, 'Summary Generation Logging Error')
@@ -338,7 +871,8 @@ class DBManager:
         if user_id == -1:
             return (False, 'Invalid Session')
         try:
-            self.conn.execute(
+            # lastrowid comes from this thread's own connection so concurrent submissions cannot see each other's id
+            cursor: sq3.Cursor = self.conn.execute(
                 'INSERT INTO articles (title, authors_str, publish_day, publish_month, publish_year, submitter_user_id) VALUES (?, ?, ?, ?, ?, ?);',
                 (title, authors, publish_date.day, publish_date.month, publish_date.year, user_id,),
             )
@@ -347,33 +881,35 @@ class DBManager:
             sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
             sys.stderr.write(f'Unable to insert new article into database.\n')
             return (False, 'Unable to create article.')
-        cursor: sq3.Cursor = self.conn.cursor()
-        try:
-            cursor.execute(
-                'SELECT article_id AS cnt FROM articles WHERE submitter_user_id = ? ORDER BY submitted_timestamp DESC LIMIT 1;',
-                (user_id,),
-            )
-        except Exception as e:
-            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
-            sys.stderr.write(f'Unable to get new article_id.\n')
+        if cursor.lastrowid is None:
             return (False, 'Unable to find article_id.')
-        article_id_series: tuple[int] | None = cursor.fetchone()
+        article_id: int = int(cursor.lastrowid)
         cursor.close()
-        if not article_id_series:
-            return (False, 'Unable to find article_id.')
-        article_id: int = int(article_id_series[0])
+        self.recent_articles_cache.clear()
         try:
-            article_path: pl.Path = self.path_to_articles / 'articles' / f'{article_id}.txt'
-            with open(article_path, 'x') as article_file:
-                article_file.write(article_text)
+            self.article_store.write('articles', article_id, article_text)
         except Exception as e:
             sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
             sys.stderr.write(f'Unable to write to file.\n')
             return (False, 'Unable to create article.')
         try:
-            vector = self.av.encode(article_text, normalize_embeddings=True)
-            self.article_vectors[article_id] = vector
+            index_article(self.conn, article_id, title, authors, article_text)
+            self.conn.commit()
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write(f'Unable to add article to the full-text index.\n')
+            return (False, 'Unable to index article.')
+        try:
+            # the model truncates long inputs, so the article vector is pooled from overlapping passages
+            spans = split_passages(article_text, self.passage_chunk_words, self.passage_overlap_words, self.passage_max_chunks)
+            passage_vectors = self.embedder.encode_many([article_text[start:end] for start, end in spans], normalize_embeddings=True)
+            vector = pool_passage_vectors(passage_vectors)
+            self.article_vectors.add(article_id, vector)
+            self.update_ann_index(article_id, vector)
+            if self.use_passage_index:
+                self.passage_vectors.add_many([passage_key(article_id, index) for index in range(len(spans))], passage_vectors)
             vector_blob = DBManager.serialize_vector(vector)
+            write_passages(self.conn, article_id, spans, passage_vectors)
             self.conn.execute(
                 'INSERT INTO article_heuristics (article_id, vector) VALUES (?, ?) '
                 'ON CONFLICT(article_id) DO UPDATE SET vector=excluded.vector;',
@@ -383,23 +919,73 @@ class DBManager:
         except Exception as e:
             sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
             return (False, 'Unable to vectorize and store article.')
+        # a failed update only costs speed, recommendations fall back to a live search without a stored list
+        if self.neighbors_k:
+            self.update_article_neighbors(article_id)
         if not self.log_article_action(article_id, user_id, self.article_actions['CREATE']):
             return (False, 'Article Creation Logging Error')
+        # summarize ahead of time so the summary is usually ready before anyone asks for it
+        if self.summarize_on_create:
+            self.summary_jobs.enqueue(article_id, user_id)
         return (True, article_id)
     
     def search_articles_by_title(self, title_substring: str, limit: int = 5) -> tuple[bool, list[tuple[int, str, str]] | str]:
+        success, results = self.search_articles(title_substring, limit, title_only=True)
+        if not success:
+            return (False, results)
+        return (True, [(article_id, title, username) for article_id, title, username, _ in results])
+
+    # one page of the active articles whose title matches, newest first: ([(article_id, title, username), ...], next_cursor)
+    # unlike search_articles_by_title the order is by submission, not relevance, so pages stay stable as articles
+    # are added, the fts match drives the query (CROSS JOIN keeps it the outer loop) and only the matches are sorted
+    def search_articles_by_title_page(self, title_substring: str, limit: int = 20, cursor: str | None = None) -> tuple[bool, tuple[list[tuple[int, str, str]], str | None] | str]:
+        query = fts_query(title_substring, column='title')
+        if query is None:
+            return (False, 'No matching articles found.')
+        key = page_key(cursor)
+        if key is None:
+            return (False, 'Invalid cursor.')
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
+            db_cursor = self.read_conn.execute(
                 '''
-                SELECT articles.article_id, articles.title, users.username
-                FROM articles
+                SELECT articles.article_id, articles.title, users.username, articles.submitted_timestamp
+                FROM articles_fts
+                CROSS JOIN articles ON articles.article_id = articles_fts.rowid
+                JOIN users ON users.user_id = articles.submitter_user_id
+                WHERE articles_fts MATCH ? AND articles.active = 1 AND (articles.submitted_timestamp, articles.article_id) < (?, ?)
+                ORDER BY articles.submitted_timestamp DESC, articles.article_id DESC
+                LIMIT ?;
+                ''',
+                (query, *key, limit + 1,),
+            )
+            rows, next_cursor = split_page(db_cursor.fetchall(), limit, 3)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return (False, 'Query failed.')
+        if not rows:
+            return (False, 'No matching articles found.')
+        return (True, ([row[:3] for row in rows], next_cursor))
+
+    # full-text search over title, authors and body ranked by bm25 (title matches weigh the most)
+    # returns [(article_id, title, username, snippet), ...] where matched terms in snippet are
+    # wrapped in HIGHLIGHT_OPEN / HIGHLIGHT_CLOSE
+    def search_articles(self, query_text: str, limit: int = 5, title_only: bool = False) -> tuple[bool, list[tuple[int, str, str, str]] | str]:
+        query = fts_query(query_text, column='title' if title_only else None)
+        if query is None:
+            return (False, 'No matching articles found.')
+        try:
+            cursor = self.read_conn.execute(
+                f'''
+                SELECT articles.article_id, articles.title, users.username,
+                       snippet(articles_fts, -1, ?, ?, '…', 24)
+                FROM articles_fts
+                JOIN articles ON articles.article_id = articles_fts.rowid
                 JOIN users ON users.user_id = articles.submitter_user_id
-                WHERE articles.title LIKE ? AND articles.active = 1
-                ORDER BY articles.submitted_timestamp DESC
+                WHERE articles_fts MATCH ? AND articles.active = 1
+                ORDER BY bm25(articles_fts, {', '.join(str(w) for w in BM25_WEIGHTS)})
                 LIMIT ?;
                 ''',
-                (f'%{title_substring}%', limit,),
+                (HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, query, limit,),
             )
             results = cursor.fetchall()
             cursor.close()
@@ -410,64 +996,402 @@ class DBManager:
             sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
             return (False, 'Query failed.')
 
-    
-    def log_article_read(self, user_id: int, article_id: int) -> bool:
+    # embeds the query on the model thread pool, served from the lru cache when the query was seen before
+    def embed_query(self, query_text: str, timeout_seconds: float | None = None) -> np.ndarray | None:
+        key = normalize_query(query_text)
+        vector = self.query_embedding_cache.get(key)
+        if vector is not None:
+            return vector
+        future = self.query_executor.submit(self._embed_and_cache, key)
         try:
-            self.conn.execute(
-                'INSERT INTO user_reads (user_id, article_id) VALUES (?, ?);',
-                (user_id, article_id,),
-            )
-            self.conn.commit()
-            return True
+            return future.result(timeout=timeout_seconds)
+        except FutureTimeoutError:
+            # the embedding keeps running and lands in the cache for the next identical query
+            return None
+
+    def _embed_and_cache(self, key: str) -> np.ndarray:
+        vector = np.asarray(self.embedder.encode(key, normalize_embeddings=True), dtype=np.float32)
+        self.query_embedding_cache.put(key, vector)
+        return vector
+
+    # semantic + keyword search: bm25 results and embedding nearest neighbours are merged with
+    # reciprocal rank fusion, if the query cannot be embedded within budget_ms the keyword results
+    # are returned on their own
+    # returns [(article_id, title, username, snippet or None), ...]
+    def hybrid_search(self, query_text: str, limit: int = 5, budget_ms: float = 250.0, candidates: int = 50) -> tuple[bool, list[tuple[int, str, str, str | None]] | str]:
+        deadline = time.perf_counter() + budget_ms / 1000
+        key = normalize_query(query_text)
+        vector = self.query_embedding_cache.get(key) if key else None
+        # the model runs in the background while the keyword query executes
+        embedding = self.query_executor.submit(self._embed_and_cache, key) if key and vector is None else None
+        keyword_success, keyword_results = self.search_articles(query_text, candidates)
+        keyword_results = keyword_results if keyword_success else []
+        if embedding is not None:
+            try:
+                vector = embedding.result(timeout=max(0.0, deadline - time.perf_counter()))
+            except FutureTimeoutError:
+                sys.stderr.write(f'Hybrid search embedding missed the {budget_ms}ms budget, returning keyword results only.\n')
+        semantic_ids: list[int] = []
+        matched_passages: dict[int, int] = dict()
+        if vector is not None and self.use_passage_index and len(self.passage_vectors):
+            matched_passages = {article_id: passage_index for article_id, passage_index, _ in self.nearest_passages(vector, candidates)}
+            semantic_ids = list(matched_passages)
+        elif vector is not None:
+            semantic_ids = [article_id for article_id, _ in self.nearest_articles(vector, candidates)]
+        fused = reciprocal_rank_fusion([[row[0] for row in keyword_results], semantic_ids])[:limit]
+        if not fused:
+            return (False, 'No matching articles found.')
+        rows = {row[0]: row for row in keyword_results}
+        missing = [article_id for article_id, _ in fused if article_id not in rows]
+        try:
+            if missing:
+                placeholders = ', '.join('?' for _ in missing)
+                cursor = self.read_conn.execute(
+                    f'''
+                    SELECT articles.article_id, articles.title, users.username, NULL
+                    FROM articles
+                    JOIN users ON users.user_id = articles.submitter_user_id
+                    WHERE articles.article_id IN ({placeholders}) AND articles.active = 1;
+                    ''',
+                    missing,
+                )
+                rows.update({row[0]: row for row in cursor.fetchall()})
         except Exception as e:
             sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
-            sys.stderr.write(f'Failed to log read for user {user_id} on article {article_id}\n')
-            return False
+            return (False, 'Query failed.')
+        results = [rows[article_id] for article_id, _ in fused if article_id in rows]
+        # semantic-only hits show the passage that matched in place of a keyword snippet
+        results = [
+            row if row[3] is not None or row[0] not in matched_passages else (*row[:3], self.get_passage_text(row[0], matched_passages[row[0]]))
+            for row in results
+        ]
+        if not results:
+            return (False, 'No matching articles found.')
+        return (True, results)
+
+    # text of one stored passage, shortened to max_chars, None when it cannot be read
+    def get_passage_text(self, article_id: int, passage_index: int, max_chars: int = 300) -> str | None:
+        try:
+            row = self.read_conn.execute(
+                'SELECT start_char, end_char FROM article_passages WHERE article_id = ? AND passage_index = ?;',
+                (article_id, passage_index,),
+            ).fetchone()
+            if row is None:
+                return None
+            success, text = self.get_article_text(article_id)
+            if not success or text is None:
+                return None
+            passage = ' '.join(text[row[0]:row[1]].split())
+            return passage if len(passage) <= max_chars else passage[:max_chars].rsplit(' ', 1)[0] + ' …'
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return None
+
+    # queued rather than committed so viewing an article does not wait on a write
+    def log_article_read(self, user_id: int, article_id: int) -> bool:
+        if self.audit_log.log_article_read(user_id, article_id):
+            self.user_feed_cache.pop(user_id)
+            return True
+        sys.stderr.write(f'Failed to log read for user {user_id} on article {article_id}\n')
+        return False
         
-    def get_recommended_article(self, article_id: int, user_id: int) -> tuple[bool, int | str]:
+    # approximate search once the corpus is large enough, exact otherwise (or when the probed cells run dry)
+    def nearest_articles(self, vector: np.ndarray, k: int, exclude_ids: set[int] | None = None) -> list[tuple[int, float]]:
+        results = []
+        if self.ann_index is not None and len(self.article_vectors) >= self.ann_min_vectors:
+            results = self.ann_index.search(vector, k, exclude_ids)
+        if len(results) < k:
+            results = self.article_vectors.top_k(vector, k, exclude_ids)
+        return results
+
+    # best matching passage of up to k articles as (article_id, passage_index, score), best first
+    # passages are fetched in growing batches until k distinct articles are found
+    def nearest_passages(self, vector: np.ndarray, k: int, exclude_ids: set[int] | None = None) -> list[tuple[int, int, float]]:
+        exclude_keys = [passage_key(article_id, index) for article_id in exclude_ids or () for index in range(self.passage_max_chunks)]
+        fetch = k * 4
+        while True:
+            best: dict[int, tuple[int, int, float]] = dict()
+            passages = self.passage_vectors.top_k(vector, fetch, exclude_keys)
+            for key, score in passages:
+                article_id, passage_index = split_passage_key(key)
+                if article_id not in best:
+                    best[article_id] = (article_id, passage_index, score)
+            if len(best) >= k or len(passages) < fetch:
+                return list(best.values())[:k]
+            fetch *= 4
+
+    # every passage of article_id queries the passage index and an article scores by its best match,
+    # so long articles can be matched on any section rather than only on their pooled vector
+    def nearest_articles_by_passage(self, article_id: int, k: int, exclude_ids: set[int]) -> list[tuple[int, float]]:
+        scores: dict[int, float] = dict()
+        for passage_index in range(self.passage_max_chunks):
+            vector = self.passage_vectors.get(passage_key(article_id, passage_index))
+            if vector is None:
+                break
+            for other_id, _, score in self.nearest_passages(vector, k, exclude_ids):
+                scores[other_id] = max(score, scores.get(other_id, -np.inf))
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    # article ids user_id has read, including reads still waiting in the audit log buffer
+    def read_article_ids(self, user_id: int) -> set[int]:
+        cursor = self.read_conn.execute(
+            'SELECT article_id FROM user_reads WHERE user_id = ?;',
+            (user_id,),
+        )
+        return {row[0] for row in cursor.fetchall()} | self.audit_log.pending_reads(user_id)
+
+    def _recommend(self, article_id: int, current_vector: np.ndarray, read_ids: set[int], k: int, by_passage: bool | None) -> list[tuple[int, float]]:
+        exclude_ids = read_ids | {article_id}
+        recommendations = []
+        if self.use_passage_index if by_passage is None else by_passage:
+            recommendations = self.nearest_articles_by_passage(article_id, k, exclude_ids)
+        if not recommendations:
+            recommendations = self.nearest_articles(current_vector, k, exclude_ids)
+        return recommendations
+
+    # up to k unread entries of a stored neighbour list, None when the list cannot answer: there is no list,
+    # or the reader has read so much of a full list that fewer than k entries are left (a shorter list holds
+    # every other article, so whatever it leaves is the complete answer)
+    def _stored_recommendations(self, neighbors: list[tuple[int, float]] | None, read_ids: set[int], k: int) -> list[tuple[int, float]] | None:
+        if neighbors is None:
+            return None
+        unread = [(neighbor_id, score) for neighbor_id, score in neighbors if neighbor_id not in read_ids][:k]
+        if len(unread) < k and len(neighbors) >= self.neighbors_k:
+            return None
+        return unread
+
+    # returns up to k unread (article_id, score) pairs most similar to article_id, best first
+    # by_passage compares passages instead of pooled article vectors (defaults to use_passage_index), the
+    # default scoring is answered from the stored neighbour list when it can be
+    def get_recommended_article(self, article_id: int, user_id: int, k: int = 1, by_passage: bool | None = None) -> tuple[bool, list[tuple[int, float]] | str]:
         try:
-            if article_id not in self.article_vectors:
+            current_vector = self.article_vectors.get(article_id)
+            if current_vector is None:
                 return (False, 'No vector for current article')
-            current_vector = self.article_vectors[article_id]
-            cursor = self.conn.execute(
-                'SELECT article_id FROM user_reads WHERE user_id = ?;',
-                (user_id,),
-            )
-            read_ids = {row[0] for row in cursor.fetchall()}
-            read_ids.add(article_id)
-            best_score = -1
-            best_id = None
-            for other_id, other_vector in self.article_vectors.items():
-                if other_id in read_ids:
-                    continue
-                score = float(np.dot(current_vector, other_vector))
-                if score > best_score:
-                    best_score = score
-                    best_id = other_id
-            if best_id is None:
+            read_ids = self.read_article_ids(user_id)
+            recommendations = None
+            if self.neighbors_k and by_passage is None:
+                recommendations = self._stored_recommendations(read_neighbor_lists(self.read_conn, [article_id]).get(article_id), read_ids, k)
+            if recommendations is None:
+                recommendations = self._recommend(article_id, current_vector, read_ids, k, by_passage)
+            if not recommendations:
                 return (False, 'No unread similar article found')
-            return (True, best_id)
+            return (True, recommendations)
         except Exception as e:
             sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
             return (False, 'Recommendation failed')
+
+    # recommendations for many articles at once, the user's reads and the stored neighbour lists are looked up
+    # once for the whole batch, returns {article_id: [(article_id, score), ...]}, an article without a vector maps to []
+    def get_recommended_articles(self, article_ids: list[int], user_id: int, k: int = 1, by_passage: bool | None = None) -> tuple[bool, dict[int, list[tuple[int, float]]] | str]:
+        try:
+            read_ids = self.read_article_ids(user_id)
+            stored = read_neighbor_lists(self.read_conn, article_ids) if self.neighbors_k and by_passage is None else dict()
+            recommendations = dict()
+            for article_id in article_ids:
+                current_vector = self.article_vectors.get(article_id)
+                if current_vector is None:
+                    recommendations[article_id] = []
+                    continue
+                found = self._stored_recommendations(stored.get(article_id), read_ids, k) if stored else None
+                recommendations[article_id] = found if found is not None else self._recommend(article_id, current_vector, read_ids, k, by_passage)
+            return (True, recommendations)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return (False, 'Recommendation failed')
+
+    # stores the neighbour list of a new article and offers the article to the lists of its own candidates
+    # (scores are symmetric), twice as many candidates as kept are offered, so only an outlier whose list
+    # should take it without it being among the new article's nearest misses out until the next rebuild
+    # the search runs before the first write, so the write transaction only covers the list updates
+    def update_article_neighbors(self, article_id: int) -> bool:
+        try:
+            vector = self.article_vectors.get(article_id)
+            if vector is None:
+                return False
+            candidates = self._recommend(article_id, vector, set(), 2 * self.neighbors_k, None)
+            write_neighbor_list(self.conn, article_id, candidates[:self.neighbors_k])
+            for other_id, score in candidates:
+                offer_neighbor(self.conn, other_id, article_id, score, self.neighbors_k)
+            self.conn.commit()
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write(f'Unable to update the neighbour lists of article {article_id}.\n')
+            return False
+
+    # drops a deleted article from every list and recomputes the lists that lost it, the article must
+    # already be gone from article_vectors (and passage_vectors) so it cannot come back
+    # the searches run before the write transaction opens so the write lock is only held for the rewrites,
+    # a list that picked the article up in between is refilled inside the transaction
+    def remove_article_neighbors(self, article_id: int) -> bool:
+        try:
+            replacements: dict[int, list[tuple[int, float]]] = dict()
+            for other_id in read_neighbor_referrers(self.read_conn, article_id):
+                vector = self.article_vectors.get(other_id)
+                if vector is not None:
+                    replacements[other_id] = self._recommend(other_id, vector, set(), self.neighbors_k, None)
+            affected = purge_neighbor(self.conn, article_id)
+            for other_id in affected:
+                if other_id not in replacements:
+                    vector = self.article_vectors.get(other_id)
+                    if vector is None:
+                        continue
+                    replacements[other_id] = self._recommend(other_id, vector, set(), self.neighbors_k, None)
+                write_neighbor_list(self.conn, other_id, replacements[other_id])
+            self.conn.commit()
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write(f'Unable to remove article {article_id} from the neighbour lists.\n')
+            return False
+
+    # recomputes the list of every loaded article from scratch, committing every batch_size articles,
+    # returns the number of lists written
+    def rebuild_article_neighbors(self, batch_size: int = 256) -> int:
+        article_ids = sorted(self.article_vectors.id_to_row)
+        # lists left over from articles that are no longer active
+        self.conn.execute('DELETE /* full scan */ FROM article_neighbors WHERE article_id NOT IN (SELECT article_id FROM articles WHERE active = 1);')
+        for start in range(0, len(article_ids), batch_size):
+            for article_id in article_ids[start:start + batch_size]:
+                write_neighbor_list(self.conn, article_id, self._recommend(article_id, self.article_vectors.get(article_id), set(), self.neighbors_k, None))
+            self.conn.commit()
+        return len(article_ids)
+
+    # audit log flush hook, folds the flushed reads into the readers' interest vectors
+    def _apply_read_interests(self, conn: sq3.Connection, rows_by_table: dict[str, list[tuple]]) -> None:
+        reads = [(user_id, article_id) for user_id, article_id, _ in rows_by_table.get('user_reads', [])]
+        if reads:
+            apply_reads(conn, reads, self.article_vectors.get, self.interest_decay)
+
+    # up to k unread articles closest to the user's interest vector, best first, as (article_id, score)
+    # one matrix-vector product over every article vector, [] before the user's first read
+    # served from user_feed_cache while the stored read_count is unchanged
+    def get_user_feed(self, user_id: int, k: int = 5) -> tuple[bool, list[tuple[int, float]] | str]:
+        try:
+            interest = read_interest(self.read_conn, user_id)
+            if interest is None:
+                return (True, [])
+            vector, _, read_count = interest
+            cached = self.user_feed_cache.get(user_id)
+            if cached is not None and cached[:2] == (read_count, k):
+                return (True, cached[2])
+            norm = np.linalg.norm(vector)
+            feed = self.article_vectors.top_k(vector / norm if norm > 0 else vector, k, self.read_article_ids(user_id))
+            self.user_feed_cache.put(user_id, (read_count, k, feed))
+            return (True, feed)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return (False, 'Unable to build feed.')
+
+    # recomputes every interest vector from the whole user_reads history, oldest read first, committing
+    # every batch_size users, returns the number of users with an interest vector
+    def rebuild_user_interests(self, batch_size: int = 1000) -> int:
+        self.audit_log.flush()
+        self.conn.execute('DELETE /* full scan */ FROM user_interests;')
+        cursor = self.read_conn.execute('SELECT /* full scan */ user_id, article_id FROM user_reads ORDER BY user_id, read_id;')
+        rebuilt = 0
+        batch: list[tuple[int, int]] = []
+        users = 0
+        for user_id, article_id in cursor:
+            if batch and batch[-1][0] != user_id:
+                users += 1
+                if users >= batch_size:
+                    rebuilt += len(apply_reads(self.conn, batch, self.article_vectors.get, self.interest_decay))
+                    self.conn.commit()
+                    batch, users = [], 0
+            batch.append((user_id, article_id))
+        rebuilt += len(apply_reads(self.conn, batch, self.article_vectors.get, self.interest_decay))
+        self.conn.commit()
+        self.user_feed_cache.clear()
+        return rebuilt
+
+    # metadata of many articles, optionally with their text and summary, as dicts in the order of article_ids
+    # active articles are fetched with one IN (...) query per BATCH_QUERY_SIZE ids, texts and summaries with
+    # one article_store.read_many call each, unknown and deleted ids are left out
+    def get_articles_batch(self, article_ids: list[int], include_text: bool = False, include_summary: bool = False) -> tuple[bool, list[dict[str, Any]] | str]:
+        articles: dict[int, dict[str, Any]] = dict()
+        try:
+            for start in range(0, len(article_ids), BATCH_QUERY_SIZE):
+                chunk = article_ids[start:start + BATCH_QUERY_SIZE]
+                placeholders = ', '.join('?' for _ in chunk)
+                cursor = self.read_conn.execute(
+                    f'''
+                    SELECT articles.article_id, articles.title, articles.authors_str, articles.publish_day, articles.publish_month,
+                           articles.publish_year, articles.submitted_timestamp, users.username, article_heuristics.summary_path IS NOT NULL
+                    FROM articles
+                    LEFT JOIN users ON users.user_id = articles.submitter_user_id
+                    LEFT JOIN article_heuristics ON article_heuristics.article_id = articles.article_id
+                    WHERE articles.article_id IN ({placeholders}) AND articles.active = 1;
+                    ''',
+                    chunk,
+                )
+                for article_id, title, authors, day, month, year, submitted, username, has_summary in cursor.fetchall():
+                    articles[article_id] = {
+                        'article_id': article_id,
+                        'title': title,
+                        'authors': authors,
+                        'publish_date': f'{year:04}-{month:02}-{day:02}' if None not in (day, month, year) else None,
+                        'submitter': username,
+                        'submitted_timestamp': submitted,
+                        'has_summary': bool(has_summary),
+                    }
+            found_ids = list(articles)
+            if include_text:
+                texts = self.article_store.read_many('articles', found_ids)
+                for article_id in found_ids:
+                    articles[article_id]['text'] = texts.get(article_id)
+            if include_summary:
+                summaries = self.article_store.read_many('summaries', [article_id for article_id in found_ids if articles[article_id]['has_summary']])
+                for article_id in found_ids:
+                    articles[article_id]['summary'] = summaries.get(article_id)
+                    articles[article_id]['summary_status'] = 'done' if article_id in summaries else self.summary_job_status(article_id)['status']
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            sys.stderr.write('Unable to fetch articles.\n')
+            return (False, 'Unable to fetch articles.')
+        return (True, [articles[article_id] for article_id in dict.fromkeys(article_ids) if article_id in articles])
     
     def get_most_recent_articles(self, limit=3):
-        cursor = self.conn.execute(
-            '''
-                SELECT articles.article_id, articles.title, users.username
-                FROM articles
-                JOIN users ON users.user_id = articles.submitter_user_id
-                WHERE articles.active = 1
-                ORDER BY articles.submitted_timestamp DESC
-                LIMIT ?;
-            ''',
-            (limit,),
-        )
-        return cursor.fetchall()
+        success, result = self.get_recent_articles_page(limit)
+        return result[0] if success else []
+
+    # one page of the active articles, newest first: ([(article_id, title, username), ...], next_cursor)
+    # next_cursor is None on the last page, first pages are cached for a few seconds
+    def get_recent_articles_page(self, limit: int = 20, cursor: str | None = None) -> tuple[bool, tuple[list[tuple[int, str, str]], str | None] | str]:
+        key = page_key(cursor)
+        if key is None:
+            return (False, 'Invalid cursor.')
+        if cursor is None:
+            cached = self.recent_articles_cache.get(limit)
+            if cached is not None:
+                return (True, cached)
+        try:
+            db_cursor = self.read_conn.execute(
+                '''
+                    SELECT articles.article_id, articles.title, users.username, articles.submitted_timestamp
+                    FROM articles
+                    JOIN users ON users.user_id = articles.submitter_user_id
+                    WHERE articles.active = 1 AND (articles.submitted_timestamp, articles.article_id) < (?, ?)
+                    ORDER BY articles.submitted_timestamp DESC, articles.article_id DESC
+                    LIMIT ?;
+                ''',
+                (*key, limit + 1,),
+            )
+            rows, next_cursor = split_page(db_cursor.fetchall(), limit, 3)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return (False, 'Unable to fetch articles.')
+        page = ([row[:3] for row in rows], next_cursor)
+        if cursor is None:
+            self.recent_articles_cache.put(limit, page)
+        return (True, page)
     
     def get_username_by_id(self, user_id: int) -> str:
         try:
-            cursor = self.conn.execute(
+            cursor = self.read_conn.execute(
                 'SELECT username FROM users WHERE user_id = ?;',
                 (user_id,)
             )
@@ -476,3 +1400,74 @@ class DBManager:
         except Exception as e:
             sys.stderr.write(f'get_username_by_id error: {e}\n')
             return 'Unknown'
+
+    # (title, authors_str, publish_day, publish_month, publish_year, submitted_timestamp, active), cached
+    def _article_row(self, article_id: int) -> tuple[str, str, int, int, int, str, int] | None:
+        row = self.article_metadata_cache.get(article_id)
+        if row is not None:
+            return row
+        cursor = self.read_conn.execute(
+            'SELECT title, authors_str, publish_day, publish_month, publish_year, submitted_timestamp, active FROM articles WHERE article_id = ?;',
+            (article_id,),
+        )
+        row = cursor.fetchone()
+        if row is not None:
+            self.article_metadata_cache.put(article_id, row)
+        return row
+
+    # returns (title, authors_str, publish_day, publish_month, publish_year) or None
+    def get_article_metadata(self, article_id: int) -> tuple[str, str, int, int, int] | None:
+        try:
+            row = self._article_row(article_id)
+            return row[:5] if row else None
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return None
+
+    # (etag, last_modified) for conditional requests on the article page, the body never changes after
+    # creation so the validators only depend on the row, None when the article does not exist
+    def get_article_validators(self, article_id: int) -> tuple[str, datetime.datetime] | None:
+        try:
+            row = self._article_row(article_id)
+            if row is None:
+                return None
+            submitted = datetime.datetime.strptime(row[5], '%Y-%m-%d %H:%M:%S').replace(tzinfo=datetime.timezone.utc)
+            etag = hashlib.sha1(f'{article_id}:{row[5]}:{row[6]}'.encode('utf-8')).hexdigest()[:16]
+            return (etag, submitted)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return None
+
+    # returns [(article_id, title), ...] of the user's active articles, newest first
+    def get_articles_by_submitter(self, user_id: int) -> list[tuple[int, str]]:
+        try:
+            cursor = self.read_conn.execute(
+                'SELECT article_id, title FROM articles WHERE submitter_user_id = ? AND active = 1 ORDER BY submitted_timestamp DESC, article_id DESC;',
+                (user_id,),
+            )
+            return cursor.fetchall()
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return []
+
+    # one page of the user's active articles, newest first: ([(article_id, title), ...], next_cursor)
+    def get_articles_by_submitter_page(self, user_id: int, limit: int = 20, cursor: str | None = None) -> tuple[bool, tuple[list[tuple[int, str]], str | None] | str]:
+        key = page_key(cursor)
+        if key is None:
+            return (False, 'Invalid cursor.')
+        try:
+            db_cursor = self.read_conn.execute(
+                '''
+                    SELECT article_id, title, submitted_timestamp
+                    FROM articles
+                    WHERE submitter_user_id = ? AND active = 1 AND (submitted_timestamp, article_id) < (?, ?)
+                    ORDER BY submitted_timestamp DESC, article_id DESC
+                    LIMIT ?;
+                ''',
+                (user_id, *key, limit + 1,),
+            )
+            rows, next_cursor = split_page(db_cursor.fetchall(), limit, 2)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return (False, 'Unable to fetch articles.')
+        return (True, ([row[:2] for row in rows], next_cursor))
@@ -0,0 +1,149 @@
+import queue
+import sys
+import threading
+import time
+import numpy as np
+from bisect import bisect_left
+from concurrent.futures import Future
+
+# upper bounds of the histogram buckets, the last bucket is open ended
+BATCH_SIZE_BUCKETS: tuple[int, ...] = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_BUCKETS_MS: tuple[float, ...] = (0.5, 1.0, 2.0, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+class _EncodeRequest:
+    def __init__(self, text: str, normalize_embeddings: bool) -> None:
+        self.text: str = text
+        self.normalize_embeddings: bool = normalize_embeddings
+        self.enqueued_at: float = time.perf_counter()
+        self.future: Future = Future()
+
+class EmbeddingBatcher:
+    # sits in front of ArticleVectorizer and merges encode calls from many threads into one forward pass
+    # a dispatcher thread takes the first waiting request, keeps collecting for up to max_wait_ms or
+    # until max_batch_size requests are waiting, runs a single batched encode and hands each caller its row
+    def __init__(self, vectorizer, max_wait_ms: float = 5.0, max_batch_size: int = 32) -> None:
+        self.vectorizer = vectorizer
+        self.max_wait_ms: float = max_wait_ms
+        self.max_batch_size: int = max_batch_size
+        self.requests: queue.Queue[_EncodeRequest | None] = queue.Queue()
+        # guards stopped, requests are only queued while it is held so none can land behind the shutdown marker
+        self.state_lock: threading.Lock = threading.Lock()
+        self.stopped: bool = False
+        self.metrics_lock: threading.Lock = threading.Lock()
+        self.batch_size_counts: list[int] = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_wait_counts: list[int] = [0] * (len(QUEUE_WAIT_BUCKETS_MS) + 1)
+        self.batches: int = 0
+        self.encoded: int = 0
+        self.queue_wait_total_ms: float = 0.0
+        self.queue_wait_max_ms: float = 0.0
+        self.encode_total_ms: float = 0.0
+        self.dispatcher: threading.Thread = threading.Thread(target=self._dispatch, name='embedding-batcher', daemon=True)
+        self.dispatcher.start()
+
+    # queues the requests, False once shutdown has started and the caller has to encode by itself
+    def _submit(self, requests: list[_EncodeRequest]) -> bool:
+        with self.state_lock:
+            if self.stopped:
+                return False
+            for request in requests:
+                self.requests.put(request)
+            return True
+
+    # same contract as ArticleVectorizer.encode, blocks until the batch holding this text is encoded
+    # after shutdown the text is encoded directly on the calling thread
+    def encode(self, text: str, normalize_embeddings=True) -> np.ndarray:
+        request = _EncodeRequest(text, normalize_embeddings)
+        if not self._submit([request]):
+            return self.vectorizer.encode(text, normalize_embeddings=normalize_embeddings)
+        return request.future.result()
+
+    # queues every text at once so they can share batches, returns an (n, dim) array in input order
+    def encode_many(self, texts: list[str], normalize_embeddings=True) -> np.ndarray:
+        requests = [_EncodeRequest(text, normalize_embeddings) for text in texts]
+        if not self._submit(requests):
+            return np.asarray(self.vectorizer.encode_batch(texts, batch_size=max(len(texts), 1), normalize_embeddings=normalize_embeddings), dtype=np.float32)
+        return np.stack([np.asarray(request.future.result(), dtype=np.float32) for request in requests])
+
+    def _collect(self) -> list[_EncodeRequest] | None:
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # put the shutdown marker back so the loop exits after this batch
+                self.requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            for normalize_embeddings in (True, False):
+                group = [request for request in batch if request.normalize_embeddings == normalize_embeddings]
+                if not group:
+                    continue
+                try:
+                    vectors = self.vectorizer.encode_batch([request.text for request in group], batch_size=len(group), normalize_embeddings=normalize_embeddings)
+                except Exception as e:
+                    sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+                    for request in group:
+                        request.future.set_exception(e)
+                    continue
+                for request, vector in zip(group, vectors):
+                    request.future.set_result(vector)
+            self._record(batch, started, time.perf_counter())
+
+    def _record(self, batch: list[_EncodeRequest], started: float, finished: float) -> None:
+        with self.metrics_lock:
+            self.batches += 1
+            self.encoded += len(batch)
+            self.batch_size_counts[bisect_left(BATCH_SIZE_BUCKETS, len(batch))] += 1
+            self.encode_total_ms += (finished - started) * 1000
+            for request in batch:
+                wait_ms = (started - request.enqueued_at) * 1000
+                self.queue_wait_total_ms += wait_ms
+                self.queue_wait_max_ms = max(self.queue_wait_max_ms, wait_ms)
+                self.queue_wait_counts[bisect_left(QUEUE_WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    # batch-size distribution and queue wait statistics, histogram keys are bucket upper bounds
+    def metrics(self) -> dict[str, float | int | dict[str, int]]:
+        with self.metrics_lock:
+            return {
+                'batches': self.batches,
+                'encoded': self.encoded,
+                'mean_batch_size': self.encoded / self.batches if self.batches else 0.0,
+                'batch_size_histogram': {str(bound): count for bound, count in zip(list(BATCH_SIZE_BUCKETS) + ['+Inf'], self.batch_size_counts)},
+                'queue_wait_mean_ms': self.queue_wait_total_ms / self.encoded if self.encoded else 0.0,
+                'queue_wait_max_ms': self.queue_wait_max_ms,
+                'queue_wait_histogram_ms': {str(bound): count for bound, count in zip(list(QUEUE_WAIT_BUCKETS_MS) + ['+Inf'], self.queue_wait_counts)},
+                'encode_mean_ms': self.encode_total_ms / self.batches if self.batches else 0.0,
+                'queued': self.requests.qsize(),
+            }
+
+    # stops the dispatcher after the batch it is encoding, requests still queued fail with RuntimeError and
+    # later encode calls run on the caller's thread, safe to call more than once
+    def shutdown(self, wait: bool = True) -> None:
+        with self.state_lock:
+            if not self.stopped:
+                self.stopped = True
+                while True:
+                    try:
+                        request = self.requests.get_nowait()
+                    except queue.Empty:
+                        break
+                    if request is not None:
+                        request.future.set_exception(RuntimeError('Embedding batcher is shut down.'))
+                self.requests.put(None)
+        if wait:
+            self.dispatcher.join()
@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+class FileTextCache:
+    # least-recently-used cache of small text files (article bodies and summaries) bounded by total bytes
+    # an entry remembers the file's mtime and size, after revalidate_seconds the next read stats the file
+    # again and rereads it if either changed, so edits on disk are picked up without a stat on every hit
+    # files larger than max_bytes / 8 are read but not cached so one huge article cannot flush the cache
+    def __init__(self, max_bytes: int = 64 * 2**20, revalidate_seconds: float = 2.0) -> None:
+        self.max_bytes: int = max_bytes
+        self.revalidate_seconds: float = revalidate_seconds
+        # path -> (text, mtime_ns, file_size, cost_bytes, checked_at)
+        self.entries: OrderedDict[str, tuple[str, int, int, int, float]] = OrderedDict()
+        self.total_bytes: int = 0
+        self.lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    # returns the file's text, raises FileNotFoundError (or any other OSError) like open() would
+    def read(self, path: os.PathLike | str) -> str:
+        key = os.fspath(path)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[4] < self.revalidate_seconds:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        try:
+            stat = os.stat(key)
+        except OSError:
+            self.invalidate(key)
+            raise
+        if entry is not None and entry[1] == stat.st_mtime_ns and entry[2] == stat.st_size:
+            with self.lock:
+                if key in self.entries:
+                    self.entries[key] = (entry[0], entry[1], entry[2], entry[3], now)
+                    self.entries.move_to_end(key)
+                self.hits += 1
+            return entry[0]
+        with open(key, 'r') as text_file:
+            text = text_file.read()
+        with self.lock:
+            self.misses += 1
+            self._insert(key, text, stat.st_mtime_ns, stat.st_size, now)
+        return text
+
+    # get / put are for keys whose content never changes (e.g. a pack file offset), no stat is involved
+    def get(self, key: str) -> str | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, text: str) -> None:
+        with self.lock:
+            self._insert(key, text, -1, -1, float('inf'))
+
+    def _insert(self, key: str, text: str, mtime_ns: int, file_size: int, checked_at: float) -> None:
+        self._remove(key)
+        cost = sys.getsizeof(text)
+        if cost > self.max_bytes // 8:
+            return
+        self.entries[key] = (text, mtime_ns, file_size, cost, checked_at)
+        self.total_bytes += cost
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted[3]
+            self.evictions += 1
+
+    def _remove(self, key: str) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        self.total_bytes -= entry[3]
+        return True
+
+    # drops path from the cache, returns True if it was cached
+    def invalidate(self, path: os.PathLike | str) -> bool:
+        with self.lock:
+            removed = self._remove(os.fspath(path))
+            self.invalidations += removed
+            return removed
+
+    # drops every key starting with prefix (e.g. all the records of a pack), returns how many were cached
+    def invalidate_prefix(self, prefix: str) -> int:
+        with self.lock:
+            removed = sum(self._remove(key) for key in [key for key in self.entries if key.startswith(prefix)])
+            self.invalidations += removed
+            return removed
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,99 @@
+import argparse
+import pathlib as pl
+import re
+import sqlite3 as sq3
+import sys
+import time
+from .article_store import open_article_store
+
+# snippet() wraps matched terms in these control characters, the web layer escapes
+# the snippet and then swaps them for <mark> tags
+HIGHLIGHT_OPEN = '\x02'
+HIGHLIGHT_CLOSE = '\x03'
+
+# bm25 column weights for (title, authors, body)
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# turns free text from the search box into an fts5 query: every word becomes a quoted
+# term (so user input can never be parsed as fts5 syntax), terms are ANDed together
+# and the last one is a prefix match so partially typed words still hit
+# returns None when the text has no searchable words
+def fts_query(text: str, column: str | None = None, prefix_last: bool = True) -> str | None:
+    words = WORD_PATTERN.findall(text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if prefix_last:
+        terms[-1] += '*'
+    query = ' '.join(terms)
+    if column is not None:
+        query = f'{column} : ({query})'
+    return query
+
+def index_article(conn: sq3.Connection, article_id: int, title: str, authors: str | None, body: str) -> None:
+    conn.execute('DELETE FROM articles_fts WHERE rowid = ?;', (article_id,))
+    conn.execute(
+        'INSERT INTO articles_fts (rowid, title, authors, body) VALUES (?, ?, ?, ?);',
+        (article_id, title, authors or '', body,),
+    )
+
+def unindex_article(conn: sq3.Connection, article_id: int) -> None:
+    conn.execute('DELETE FROM articles_fts WHERE rowid = ?;', (article_id,))
+
+# indexes every active article whose text file exists under path_to_articles/articles and
+# that is not yet in articles_fts (or all of them with reindex), committing every batch_size rows
+def backfill(db_path: str, path_to_articles: pl.Path, batch_size: int = 500, reindex: bool = False, article_store: str = 'directory') -> tuple[int, int]:
+    store = open_article_store(article_store, path_to_articles, cache_bytes=0)
+    conn = sq3.connect(db_path)
+    indexed = missing = 0
+    try:
+        if reindex:
+            conn.execute('DELETE FROM articles_fts;')
+        rows = conn.execute(
+            '''
+            SELECT articles.article_id, articles.title, articles.authors_str
+            FROM articles
+            LEFT JOIN articles_fts ON articles_fts.rowid = articles.article_id
+            WHERE articles.active = 1 AND articles_fts.rowid IS NULL
+            ORDER BY articles.article_id;
+            '''
+        ).fetchall()
+        for article_id, title, authors in rows:
+            try:
+                body = store.read('articles', article_id)
+            except FileNotFoundError:
+                missing += 1
+                continue
+            index_article(conn, article_id, title, authors, body)
+            indexed += 1
+            if indexed % batch_size == 0:
+                conn.commit()
+        conn.commit()
+        conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('optimize');")
+        conn.commit()
+    finally:
+        conn.close()
+        store.close()
+    return (indexed, missing)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Index existing article files into the articles_fts full-text table.')
+    parser.add_argument('db_path', help='path to the sqlite database')
+    parser.add_argument('articles_path', nargs='?', default='/evanr', help='directory holding articles/<article_id>.txt')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--reindex', action='store_true', help='drop the existing index contents first')
+    parser.add_argument('--article-store', choices=['directory', 'pack'], default='directory')
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        indexed, missing = backfill(args.db_path, pl.Path(args.articles_path), args.batch_size, args.reindex, args.article_store)
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    print(f'Indexed {indexed} articles in {time.perf_counter() - start:.2f}s ({missing} without a text file).')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
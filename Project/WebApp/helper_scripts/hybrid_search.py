@@ -0,0 +1,20 @@
+import re
+from typing import Hashable, Iterable
+
+# constant from the original reciprocal rank fusion paper, damps the weight of the very top ranks
+RRF_K = 60
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# cache key for a search query so trivially different spellings share one embedding
+def normalize_query(text: str) -> str:
+    return WHITESPACE_PATTERN.sub(' ', (text or '').strip().lower())
+
+# merges several ranked id lists into one, each list contributes 1 / (rrf_k + rank) per id
+# returns [(id, fused_score), ...] best first, ties keep the order the ids were first seen in
+def reciprocal_rank_fusion(ranked_lists: Iterable[Iterable[Hashable]], rrf_k: int = RRF_K) -> list[tuple[Hashable, float]]:
+    scores: dict[Hashable, float] = dict()
+    for ranked in ranked_lists:
+        for rank, item in enumerate(ranked, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
@@ -0,0 +1,78 @@
+import argparse
+import pathlib as pl
+import sqlite3 as sq3
+import sys
+import time
+import numpy as np
+from typing import Callable
+from .vector_store import serialize_vector, deserialize_vector
+
+# weight of the interest vector before each new read, 0.9 halves a read's influence after ~6.6 further reads
+INTEREST_DECAY = 0.9
+
+# folds one article vector into a decayed running mean in O(d):
+# (decay * weight * vector + article_vector) / (decay * weight + 1), returns (vector, weight)
+def update_interest(vector: np.ndarray | None, weight: float, article_vector: np.ndarray, decay: float = INTEREST_DECAY) -> tuple[np.ndarray, float]:
+    if vector is None:
+        return (np.array(article_vector, dtype=np.float32), 1.0)
+    weight = decay * weight + 1.0
+    return (vector + (article_vector - vector) / weight, weight)
+
+# (vector, weight, read_count) of user_id or None before their first read
+def read_interest(conn: sq3.Connection, user_id: int) -> tuple[np.ndarray, float, int] | None:
+    row = conn.execute('SELECT vector, weight, read_count FROM user_interests WHERE user_id = ?;', (user_id,)).fetchone()
+    if row is None:
+        return None
+    return (deserialize_vector(row[0]), row[1], row[2])
+
+# does not commit
+def write_interest(conn: sq3.Connection, user_id: int, vector: np.ndarray, weight: float, read_count: int) -> None:
+    conn.execute(
+        'INSERT INTO user_interests (user_id, vector, weight, read_count, updated_at) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP) '
+        'ON CONFLICT(user_id) DO UPDATE SET vector=excluded.vector, weight=excluded.weight, read_count=excluded.read_count, updated_at=excluded.updated_at;',
+        (user_id, serialize_vector(vector), weight, read_count,),
+    )
+
+# applies (user_id, article_id) reads in order, one read and one write per user, does not commit
+# vector_of returns None for articles without a vector (deleted ones), those reads are skipped
+# run inside the transaction that inserts the reads so processes sharing the database cannot interleave updates
+def apply_reads(conn: sq3.Connection, reads: list[tuple[int, int]], vector_of: Callable[[int], np.ndarray | None], decay: float = INTEREST_DECAY) -> list[int]:
+    reads_by_user: dict[int, list[int]] = dict()
+    for user_id, article_id in reads:
+        reads_by_user.setdefault(user_id, []).append(article_id)
+    updated = []
+    for user_id, article_ids in reads_by_user.items():
+        vectors = [vector for vector in map(vector_of, article_ids) if vector is not None]
+        if not vectors:
+            continue
+        current = read_interest(conn, user_id)
+        vector, weight, read_count = current if current is not None else (None, 0.0, 0)
+        for article_vector in vectors:
+            vector, weight = update_interest(vector, weight, article_vector, decay)
+        write_interest(conn, user_id, vector, weight, read_count + len(vectors))
+        updated.append(user_id)
+    return updated
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Recompute every user\'s interest vector from their full user_reads history (recovery, or for reads logged before interests were kept).')
+    parser.add_argument('db_path', help='path to the sqlite database')
+    parser.add_argument('articles_path', nargs='?', default='/evanr', help='directory holding the article store')
+    parser.add_argument('--decay', type=float, default=INTEREST_DECAY, help='the web app must use the same value')
+    parser.add_argument('--article-store', choices=['directory', 'pack'], default='directory')
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        from .db_utils import DBManager
+        db = DBManager(args.db_path, pl.Path(args.articles_path), connection_retries=1, article_store=args.article_store, interest_decay=args.decay, use_passage_index=False, summary_workers=1, enable_metrics=False)
+        try:
+            rebuilt = db.rebuild_user_interests()
+        finally:
+            db.close()
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    print(f'Rebuilt the interest vectors of {rebuilt} users in {time.perf_counter() - start:.2f}s.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
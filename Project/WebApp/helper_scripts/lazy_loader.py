@@ -0,0 +1,80 @@
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+# resident set size of this process in bytes
+def current_rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # no procfs (macOS): fall back to the peak rss, reported in bytes there
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+class StartupReport:
+    # wall time and rss growth of each component as it is initialized (or lazily loaded)
+    def __init__(self) -> None:
+        self.rows: list[dict[str, str | float | int]] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, component: str) -> Iterator[None]:
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            row = {
+                'component': component,
+                'seconds': time.perf_counter() - start,
+                'rss_delta_bytes': current_rss_bytes() - rss_before,
+                'thread': threading.current_thread().name,
+            }
+            with self.lock:
+                self.rows.append(row)
+
+    def format(self) -> str:
+        with self.lock:
+            rows = list(self.rows)
+        lines = [f'{"component":<28} {"seconds":>9} {"rss delta":>11}']
+        for row in rows:
+            lines.append(f'{row["component"]:<28} {row["seconds"]:>9.3f} {row["rss_delta_bytes"] / 2**20:>8.1f} MB')
+        # rows can nest (a warm-up encode includes loading the model) so no total is summed
+        lines.append(f'{"current rss":<28} {"":>9} {current_rss_bytes() / 2**20:>8.1f} MB')
+        return '\n'.join(lines)
+
+class LazyModel:
+    # builds the wrapped object with factory() the first time it is used, attribute access is
+    # forwarded so a LazyModel can stand in wherever the model itself was used
+    # loading is guarded by a lock so concurrent first uses only load once
+    def __init__(self, name: str, factory: Callable[[], Any], report: StartupReport | None = None) -> None:
+        self._name: str = name
+        self._factory: Callable[[], Any] = factory
+        self._report: StartupReport | None = report
+        self._instance: Any = None
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> Any:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                if self._report is not None:
+                    with self._report.measure(self._name):
+                        self._instance = self._factory()
+                else:
+                    self._instance = self._factory()
+            return self._instance
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self.get(), attribute)
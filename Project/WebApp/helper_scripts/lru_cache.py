@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+_MISSING = object()
+
+class LRUCache:
+    # thread-safe least-recently-used cache bounded by entry count
+    # get() moves the entry to the most recently used end, put() evicts from the other end
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries: int = max_entries
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    # returns default when key is not cached
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    # returns True if key was cached
+    def pop(self, key: Hashable) -> bool:
+        with self.lock:
+            return self.entries.pop(key, _MISSING) is not _MISSING
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+class TTLCache(LRUCache):
+    # LRUCache whose entries also expire ttl_seconds after they were put
+    def __init__(self, ttl_seconds: float, max_entries: int = 128) -> None:
+        super().__init__(max_entries=max_entries)
+        self.ttl_seconds: float = ttl_seconds
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = super().get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            with self.lock:
+                self.hits -= 1
+                self.misses += 1
+            self.pop(key)
+            return default
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        super().put(key, (value, time.monotonic() + self.ttl_seconds))
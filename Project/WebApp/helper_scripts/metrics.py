@@ -0,0 +1,202 @@
+import functools
+import re
+import sqlite3 as sq3
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterable
+
+# upper bounds in seconds, the last bucket (+Inf) is open ended
+DEFAULT_BUCKETS: tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Histogram:
+    # one bucket array per label combination, observe() is a bisect and two additions under a lock
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.label_names: tuple[str, ...] = label_names
+        self.buckets: tuple[float, ...] = buckets
+        # labels -> [per-bucket counts (not cumulative), sum]
+        self.series: dict[tuple[str, ...], list] = dict()
+        self.lock: threading.Lock = threading.Lock()
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        with self.lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self.series.items()]
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ['+Inf'], counts):
+                cumulative += count
+                le = 'le="' + (bound if bound == '+Inf' else _format_value(bound)) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {repr(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...]) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.label_names: tuple[str, ...] = label_names
+        self.values: dict[tuple[str, ...], float] = dict()
+        self.lock: threading.Lock = threading.Lock()
+
+    def inc(self, labels: tuple[str, ...], amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self.lock:
+            values = sorted(self.values.items())
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        lines.extend(f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}' for labels, value in values)
+        return lines
+
+class Gauge:
+    # read when the endpoint is scraped, callback returns {label values: value}
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], callback: Callable[[], dict[tuple[str, ...], float]]) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.label_names: tuple[str, ...] = label_names
+        self.callback: Callable[[], dict[tuple[str, ...], float]] = callback
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        try:
+            values = sorted(self.callback().items())
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return lines
+        lines.extend(f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}' for labels, value in values)
+        return lines
+
+class MetricsRegistry:
+    # metrics of one process rendered in the prometheus text exposition format (version 0.0.4)
+    def __init__(self) -> None:
+        self.metrics: dict[str, Histogram | Counter | Gauge] = dict()
+        self.lock: threading.Lock = threading.Lock()
+
+    def _register(self, metric: Histogram | Counter | Gauge) -> Any:
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name: str, help_text: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def counter(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: tuple[str, ...], callback: Callable[[], dict[tuple[str, ...], float]]) -> Gauge:
+        return self._register(Gauge(name, help_text, label_names, callback))
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+def timed(function: Callable, histogram: Histogram, labels: tuple[str, ...]) -> Callable:
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            histogram.observe(labels, time.perf_counter() - start)
+    return wrapper
+
+# replaces each named method of obj with a timed wrapper on the instance itself, labelled
+# (prefix..., method name), so calls made through self are timed as well
+def instrument_methods(obj: Any, histogram: Histogram, names: Iterable[str], label_prefix: tuple[str, ...] = ()) -> Any:
+    for name in names:
+        setattr(obj, name, timed(getattr(obj, name), histogram, label_prefix + (name,)))
+    return obj
+
+# generated IN (?, ?, ...) lists
+PLACEHOLDER_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+
+class SQLTimer:
+    # times statements run on TimedConnection / TimedCursor, labelled by the statement text with whitespace
+    # collapsed and IN (...) placeholder lists shortened, so the series are bounded by the statements in the code
+    # statements slower than slow_query_seconds are counted and written to stderr
+    def __init__(self, registry: MetricsRegistry, slow_query_seconds: float | None = None, max_label_chars: int = 160) -> None:
+        self.histogram: Histogram = registry.histogram('sqlite_statement_seconds', 'Time to execute a statement (up to its first row).', ('statement',))
+        self.slow_query_seconds: float | None = slow_query_seconds
+        self.slow_queries: Counter = registry.counter('sqlite_slow_queries_total', 'Statements slower than the slow-query threshold.', ('statement',))
+        self.max_label_chars: int = max_label_chars
+        self.labels: dict[str, tuple[str]] = dict()
+
+    def label(self, sql: str) -> tuple[str]:
+        labels = self.labels.get(sql)
+        if labels is None:
+            labels = (PLACEHOLDER_LIST.sub('IN (?, ...)', ' '.join(sql.split()))[:self.max_label_chars],)
+            # the cache key is the raw text, which differs per IN list length, so it is bounded separately
+            if len(self.labels) >= 4096:
+                self.labels.clear()
+            self.labels[sql] = labels
+        return labels
+
+    def observe(self, sql: str, seconds: float) -> None:
+        labels = self.label(sql)
+        self.histogram.observe(labels, seconds)
+        if self.slow_query_seconds is not None and seconds >= self.slow_query_seconds:
+            self.slow_queries.inc(labels)
+            sys.stderr.write(f'Slow query ({seconds * 1000:.1f} ms): {" ".join(sql.split())[:500]}\n')
+
+class TimedCursor(sq3.Cursor):
+    def execute(self, sql: str, parameters: Any = (), /) -> sq3.Cursor:
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.sql_timer.observe(sql, time.perf_counter() - start)
+
+    def executemany(self, sql: str, parameters: Iterable, /) -> sq3.Cursor:
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self.connection.sql_timer.observe(sql, time.perf_counter() - start)
+
+class TimedConnection(sq3.Connection):
+    # sqlite3 connection factory, Connection.execute does not go through Cursor.execute so both are wrapped
+    sql_timer: SQLTimer
+
+    def cursor(self, factory: type[sq3.Cursor] = TimedCursor) -> sq3.Cursor:
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters: Any = (), /) -> sq3.Cursor:
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.sql_timer.observe(sql, time.perf_counter() - start)
+
+    def executemany(self, sql: str, parameters: Iterable, /) -> sq3.Cursor:
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self.sql_timer.observe(sql, time.perf_counter() - start)
@@ -0,0 +1,190 @@
+import argparse
+import ast
+import pathlib as pl
+import re
+import sqlite3 as sq3
+import sys
+
+# db_init.sql is the baseline schema (version 1), later changes are migrations/NNNN_<name>.sql next to it
+# applied versions are recorded in schema_migrations so each file runs exactly once per database
+BASELINE_VERSION = 1
+MIGRATION_PATTERN = re.compile(r'^(\d{4})_(\w+)\.sql$')
+# check_query_plans covers db_utils.py and every helper_scripts module it imports, directly or not, so the
+# sql of a new helper is checked as soon as DBManager uses it
+PLAN_CHECK_ROOT = 'db_utils.py'
+# modules whose sql runs against a database of their own (the pack store's index), not the app's schema
+PLAN_CHECK_EXCLUDED = ('article_store.py',)
+# queries that load a whole table on purpose (e.g. every vector at startup) carry this comment
+FULL_SCAN_MARKER = '/* full scan */'
+QUERY_START = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\s+\S', re.IGNORECASE)
+
+def default_migrations_path(database_init_path: str | pl.Path) -> pl.Path:
+    return pl.Path(database_init_path).parent / 'migrations'
+
+# (version, name, path) sorted by version, starting with the baseline
+def list_migrations(database_init_path: str | pl.Path, migrations_path: str | pl.Path | None = None) -> list[tuple[int, str, pl.Path]]:
+    migrations_path = pl.Path(migrations_path) if migrations_path is not None else default_migrations_path(database_init_path)
+    migrations = [(BASELINE_VERSION, 'baseline', pl.Path(database_init_path))]
+    if migrations_path.is_dir():
+        for path in sorted(migrations_path.iterdir()):
+            match = MIGRATION_PATTERN.match(path.name)
+            if match:
+                migrations.append((int(match.group(1)), match.group(2), path))
+    versions = [version for version, _, _ in migrations]
+    if len(set(versions)) != len(versions) or min(versions[1:], default=BASELINE_VERSION + 1) <= BASELINE_VERSION:
+        raise ValueError(f'Migration versions must be unique and above {BASELINE_VERSION}: {versions}')
+    return sorted(migrations)
+
+def schema_version(conn: sq3.Connection) -> int:
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations';").fetchone()
+    if not exists:
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations;').fetchone()[0]
+
+# splits a script into complete statements so they can run inside one transaction
+# (executescript would commit before running)
+def split_statements(script: str) -> list[str]:
+    statements, buffer = [], ''
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sq3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ''
+    return statements
+
+# applies every migration newer than the database's version in a single immediate transaction, so two
+# processes starting together cannot both apply the same file, returns the applied (version, name) pairs
+# conn must be in autocommit mode (isolation_level=None)
+def apply_migrations(conn: sq3.Connection, database_init_path: str | pl.Path, migrations_path: str | pl.Path | None = None) -> list[tuple[int, str]]:
+    migrations = list_migrations(database_init_path, migrations_path)
+    conn.execute('BEGIN IMMEDIATE;')
+    applied = []
+    running = 'schema_migrations'
+    try:
+        conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER NOT NULL PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            '''
+        )
+        current = schema_version(conn)
+        for version, name, path in migrations:
+            if version <= current:
+                continue
+            running = f'{version:04d}_{name}'
+            for statement in split_statements(path.read_text()):
+                conn.execute(statement)
+            conn.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?);', (version, name,))
+            applied.append((version, name))
+        conn.execute('COMMIT;')
+    except Exception as e:
+        conn.execute('ROLLBACK;')
+        raise RuntimeError(f'Migration {running} failed, nothing was applied: {str(e)}') from e
+    return applied
+
+def migrate(database_path: str, database_init_path: str | pl.Path, migrations_path: str | pl.Path | None = None) -> list[tuple[int, str]]:
+    conn = sq3.connect(database_path, isolation_level=None)
+    try:
+        conn.execute('PRAGMA foreign_keys = ON;')
+        return apply_migrations(conn, database_init_path, migrations_path)
+    finally:
+        conn.close()
+
+# every sql string literal in path that starts with SELECT / INSERT / UPDATE / DELETE / WITH, as
+# (line number, sql), f-string fields are replaced by a single ? placeholder
+def collect_queries(path: str | pl.Path) -> list[tuple[int, str]]:
+    tree = ast.parse(pl.Path(path).read_text())
+    # the literal parts of an f-string are Constant nodes of their own, only the whole string counts
+    fragments = {id(part) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for part in node.values}
+    queries = []
+    for node in ast.walk(tree):
+        if id(node) in fragments:
+            continue
+        if isinstance(node, ast.JoinedStr):
+            sql = ''.join(part.value if isinstance(part, ast.Constant) else '?' for part in node.values)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            sql = node.value
+        else:
+            continue
+        if QUERY_START.match(sql):
+            queries.append((node.lineno, ' '.join(sql.split())))
+    return sorted(queries)
+
+# the modules of package_path reachable from root through relative imports (from .x import ...), sorted by name
+def plan_check_modules(package_path: str | pl.Path, root: str = PLAN_CHECK_ROOT, excluded: tuple[str, ...] = PLAN_CHECK_EXCLUDED) -> list[pl.Path]:
+    package_path = pl.Path(package_path)
+    seen, pending = set(), [root]
+    while pending:
+        name = pending.pop()
+        if name in seen or not (package_path / name).is_file():
+            continue
+        seen.add(name)
+        for node in ast.walk(ast.parse((package_path / name).read_text())):
+            if isinstance(node, ast.ImportFrom) and node.level == 1:
+                if node.module is not None:
+                    pending.append(node.module.split('.')[0] + '.py')
+                else:
+                    pending.extend(alias.name + '.py' for alias in node.names)
+    return [package_path / name for name in sorted(seen) if name not in excluded]
+
+# runs EXPLAIN QUERY PLAN on every query of modules against conn's schema and returns the problems
+# as (location, sql, detail): full table scans and statements sqlite cannot prepare
+def check_query_plans(conn: sq3.Connection, modules: list[pl.Path]) -> list[tuple[str, str, str]]:
+    problems = []
+    for module in modules:
+        for lineno, sql in collect_queries(module):
+            location = f'{module.name}:{lineno}'
+            if FULL_SCAN_MARKER in sql:
+                continue
+            try:
+                plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', [None] * sql.count('?')).fetchall()
+            except sq3.Error as e:
+                problems.append((location, sql, f'{e.__class__.__name__}: {str(e)}'))
+                continue
+            for row in plan:
+                detail = row[3]
+                if detail.startswith('SCAN ') and 'VIRTUAL TABLE' not in detail and detail != 'SCAN CONSTANT ROW':
+                    problems.append((location, sql, detail))
+    return problems
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Apply versioned schema migrations or check that DBManager queries avoid full table scans.')
+    parser.add_argument('command', choices=['migrate', 'status', 'check-plans'])
+    parser.add_argument('db_path', nargs='?', default=None, help='path to the sqlite database, check-plans uses a fresh in-memory database when omitted')
+    parser.add_argument('--init-sql', default=str(pl.Path(__file__).resolve().parent.parent / 'db_init.sql'), help='baseline schema, migrations/ next to it holds the later versions')
+    args = parser.parse_args(argv)
+    if args.command != 'check-plans' and args.db_path is None:
+        parser.error(f'{args.command} needs db_path')
+    try:
+        if args.command == 'migrate':
+            applied = migrate(args.db_path, args.init_sql)
+            for version, name in applied:
+                print(f'applied {version:04d}_{name}')
+            print(f'{len(applied)} migrations applied.')
+        elif args.command == 'status':
+            conn = sq3.connect(args.db_path)
+            current = schema_version(conn)
+            conn.close()
+            for version, name, _ in list_migrations(args.init_sql):
+                print(f'{version:04d}_{name}: {"applied" if version <= current else "pending"}')
+        else:
+            conn = sq3.connect(args.db_path or ':memory:', isolation_level=None)
+            if args.db_path is None:
+                apply_migrations(conn, args.init_sql)
+            modules = plan_check_modules(pl.Path(__file__).resolve().parent)
+            problems = check_query_plans(conn, modules)
+            conn.close()
+            for location, sql, detail in problems:
+                print(f'{location}: {detail}\n    {sql}')
+            print(f'{len(problems)} problems in {sum(len(collect_queries(module)) for module in modules)} queries.')
+            return 1 if problems else 0
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import argparse
+import pathlib as pl
+import sqlite3 as sq3
+import sys
+import time
+
+# neighbours kept per article in article_neighbors, recommendations for a reader who has read most of them
+# fall back to a live search
+NEIGHBORS_K = 20
+# ids per IN (...) query in read_neighbor_lists
+READ_BATCH_SIZE = 500
+
+# replaces the stored list of article_id, does not commit
+def write_neighbor_list(conn: sq3.Connection, article_id: int, neighbors: list[tuple[int, float]]) -> None:
+    conn.execute('DELETE FROM article_neighbors WHERE article_id = ?;', (article_id,))
+    conn.executemany(
+        'INSERT INTO article_neighbors (article_id, neighbor_id, score) VALUES (?, ?, ?);',
+        [(article_id, neighbor_id, float(score)) for neighbor_id, score in neighbors],
+    )
+
+# adds neighbor_id to the list of article_id and drops whatever falls below the best k, does not commit
+def offer_neighbor(conn: sq3.Connection, article_id: int, neighbor_id: int, score: float, k: int) -> None:
+    conn.execute(
+        'INSERT INTO article_neighbors (article_id, neighbor_id, score) VALUES (?, ?, ?) '
+        'ON CONFLICT(article_id, neighbor_id) DO UPDATE SET score=excluded.score;',
+        (article_id, neighbor_id, float(score),),
+    )
+    conn.execute(
+        '''
+        DELETE FROM article_neighbors
+        WHERE article_id = ? AND neighbor_id NOT IN (
+            SELECT neighbor_id FROM article_neighbors WHERE article_id = ? ORDER BY score DESC, neighbor_id LIMIT ?
+        );
+        ''',
+        (article_id, article_id, k,),
+    )
+
+# removes the list of article_id and article_id from every other list, returns the articles whose list
+# lost an entry (so they can be refilled), does not commit
+def purge_neighbor(conn: sq3.Connection, article_id: int) -> list[int]:
+    affected = [row[0] for row in conn.execute('SELECT article_id FROM article_neighbors WHERE neighbor_id = ?;', (article_id,))]
+    conn.execute('DELETE FROM article_neighbors WHERE neighbor_id = ?;', (article_id,))
+    conn.execute('DELETE FROM article_neighbors WHERE article_id = ?;', (article_id,))
+    return affected
+
+# the articles whose list holds neighbor_id, read only
+def read_neighbor_referrers(conn: sq3.Connection, neighbor_id: int) -> list[int]:
+    return [row[0] for row in conn.execute('SELECT article_id FROM article_neighbors WHERE neighbor_id = ?;', (neighbor_id,))]
+
+# {article_id: [(neighbor_id, score), ...] best first}, articles without a stored list are left out
+def read_neighbor_lists(conn: sq3.Connection, article_ids: list[int]) -> dict[int, list[tuple[int, float]]]:
+    lists: dict[int, list[tuple[int, float]]] = dict()
+    for start in range(0, len(article_ids), READ_BATCH_SIZE):
+        chunk = article_ids[start:start + READ_BATCH_SIZE]
+        placeholders = ', '.join('?' for _ in chunk)
+        cursor = conn.execute(
+            f'SELECT article_id, neighbor_id, score FROM article_neighbors WHERE article_id IN ({placeholders}) ORDER BY article_id, score DESC, neighbor_id;',
+            chunk,
+        )
+        for article_id, neighbor_id, score in cursor.fetchall():
+            lists.setdefault(article_id, []).append((neighbor_id, score))
+    return lists
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Recompute the article_neighbors lists of every active article from the stored vectors (recovery, or after a bulk import).')
+    parser.add_argument('db_path', help='path to the sqlite database')
+    parser.add_argument('articles_path', nargs='?', default='/evanr', help='directory holding the article store')
+    parser.add_argument('--k', type=int, default=NEIGHBORS_K, help='neighbours kept per article, the web app must use the same value')
+    parser.add_argument('--article-store', choices=['directory', 'pack'], default='directory')
+    parser.add_argument('--passage-index', action='store_true', help='score by passages instead of pooled article vectors, like a web app started with USE_PASSAGE_INDEX=1')
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        from .db_utils import DBManager
+        db = DBManager(args.db_path, pl.Path(args.articles_path), connection_retries=1, article_store=args.article_store, neighbors_k=args.k, use_passage_index=args.passage_index, summary_workers=1, enable_metrics=False)
+        try:
+            rebuilt = db.rebuild_article_neighbors()
+        finally:
+            db.close()
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    print(f'Rebuilt the neighbour lists of {rebuilt} articles in {time.perf_counter() - start:.2f}s.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import base64
+import binascii
+import datetime
+
+# article listings are paged by keyset on (submitted_timestamp, article_id), newest first: the next page
+# continues strictly after the last row of the previous one, so the database seeks straight to it through
+# the (..., submitted_timestamp) indexes (which end in the rowid) instead of stepping over OFFSET rows
+# the cursor handed to clients is that last (submitted_timestamp, article_id) pair, url-safe base64 encoded
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(submitted_timestamp: str, article_id: int) -> str:
+    return base64.urlsafe_b64encode(f'{submitted_timestamp}|{article_id}'.encode('utf-8')).decode('ascii').rstrip('=')
+
+# (submitted_timestamp, article_id) or None when the cursor was not made by encode_cursor
+def decode_cursor(cursor: str) -> tuple[str, int] | None:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        submitted_timestamp, article_id = raw.split('|')
+        datetime.datetime.strptime(submitted_timestamp, TIMESTAMP_FORMAT)
+        return (submitted_timestamp, int(article_id))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+# the key of the first page, sorts after every stored row so every listing runs the same keyset statement
+FIRST_PAGE_KEY = ('9999-12-31 23:59:59', 2**63 - 1)
+
+# the key to continue from, None when the cursor is invalid
+def page_key(cursor: str | None) -> tuple[str, int] | None:
+    return FIRST_PAGE_KEY if cursor is None else decode_cursor(cursor)
+
+# splits the limit + 1 rows fetched for a page into (page, next_cursor), the extra row only tells whether
+# another page exists, timestamp_index and id_index locate the key inside a row
+def split_page(rows: list[tuple], limit: int, timestamp_index: int, id_index: int = 0) -> tuple[list[tuple], str | None]:
+    page = rows[:limit]
+    if len(rows) <= limit or not page:
+        return (page, None)
+    return (page, encode_cursor(page[-1][timestamp_index], page[-1][id_index]))
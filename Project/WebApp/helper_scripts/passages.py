@@ -0,0 +1,141 @@
+import argparse
+import math
+import pathlib as pl
+import re
+import sqlite3 as sq3
+import sys
+import time
+import numpy as np
+from typing import Iterable
+from .vector_store import serialize_vector
+from .article_store import open_article_store
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces, ~180 words stays under that for english prose
+CHUNK_WORDS = 180
+OVERLAP_WORDS = 40
+MAX_CHUNKS = 16
+# passages share VectorMatrix with articles, so each one gets the integer key article_id * PASSAGE_KEY_STRIDE + index
+PASSAGE_KEY_STRIDE = 1024
+
+WORD_PATTERN = re.compile(r'\S+')
+
+def passage_key(article_id: int, passage_index: int) -> int:
+    return article_id * PASSAGE_KEY_STRIDE + passage_index
+
+def split_passage_key(key: int) -> tuple[int, int]:
+    return divmod(int(key), PASSAGE_KEY_STRIDE)
+
+# splits text into overlapping windows of chunk_words words and returns their (start, end) character spans
+# when more than max_chunks windows would be needed the stride is widened instead, so the cap bounds the
+# work and memory per article while the passages still reach the end of the text
+def split_passages(text: str, chunk_words: int = CHUNK_WORDS, overlap_words: int = OVERLAP_WORDS, max_chunks: int = MAX_CHUNKS) -> list[tuple[int, int]]:
+    if not 0 <= overlap_words < chunk_words:
+        raise ValueError('overlap_words must be at least 0 and smaller than chunk_words.')
+    if not 1 <= max_chunks <= PASSAGE_KEY_STRIDE:
+        raise ValueError(f'max_chunks must be between 1 and {PASSAGE_KEY_STRIDE}.')
+    words = [match.span() for match in WORD_PATTERN.finditer(text)]
+    if len(words) <= chunk_words:
+        return [(0, len(text))]
+    stride = chunk_words - overlap_words
+    if math.ceil((len(words) - chunk_words) / stride) + 1 > max_chunks:
+        stride = math.ceil((len(words) - chunk_words) / (max_chunks - 1)) if max_chunks > 1 else len(words)
+    starts = list(range(0, len(words) - chunk_words, stride))[:max_chunks - 1] + [len(words) - chunk_words]
+    if max_chunks == 1:
+        starts = [0]
+    return [(words[start][0], words[min(start + chunk_words, len(words)) - 1][1]) for start in starts]
+
+# mean of the unit passage vectors, renormalized, used as the article's own vector
+def pool_passage_vectors(vectors: np.ndarray) -> np.ndarray:
+    pooled = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+    norm = np.linalg.norm(pooled)
+    return pooled / norm if norm > 0 else pooled
+
+# encodes the passages of many articles with one encode_batch call
+# returns one (spans, passage_vectors, pooled_vector) triple per text
+def encode_articles(vectorizer, texts: list[str], chunk_words: int = CHUNK_WORDS, overlap_words: int = OVERLAP_WORDS, max_chunks: int = MAX_CHUNKS, batch_size: int = 64) -> list[tuple[list[tuple[int, int]], np.ndarray, np.ndarray]]:
+    all_spans = [split_passages(text, chunk_words, overlap_words, max_chunks) for text in texts]
+    passage_texts = [text[start:end] for text, spans in zip(texts, all_spans) for start, end in spans]
+    vectors = vectorizer.encode_batch(passage_texts, batch_size=batch_size) if passage_texts else np.empty((0, 0), dtype=np.float32)
+    results = []
+    offset = 0
+    for spans in all_spans:
+        passage_vectors = vectors[offset:offset + len(spans)]
+        offset += len(spans)
+        results.append((spans, passage_vectors, pool_passage_vectors(passage_vectors)))
+    return results
+
+# replaces the stored passages of article_id, does not commit
+def write_passages(conn: sq3.Connection, article_id: int, spans: list[tuple[int, int]], vectors: np.ndarray) -> None:
+    conn.execute('DELETE FROM article_passages WHERE article_id = ?;', (article_id,))
+    conn.executemany(
+        'INSERT INTO article_passages (article_id, passage_index, start_char, end_char, vector) VALUES (?, ?, ?, ?, ?);',
+        passage_rows(article_id, spans, vectors),
+    )
+
+def passage_rows(article_id: int, spans: list[tuple[int, int]], vectors: Iterable[np.ndarray]) -> list[tuple[int, int, int, int, bytes]]:
+    return [(article_id, index, start, end, serialize_vector(vector)) for index, ((start, end), vector) in enumerate(zip(spans, vectors))]
+
+# re-encodes every active article that has no passages yet (or all of them with reencode) and
+# rewrites its pooled vector, returns (encoded, missing_files)
+def backfill(db_path: str, path_to_articles: pl.Path, vectorizer, batch_size: int = 32, max_chunks: int = MAX_CHUNKS, reencode: bool = False, article_store: str = 'directory') -> tuple[int, int]:
+    store = open_article_store(article_store, path_to_articles, cache_bytes=0)
+    conn = sq3.connect(db_path)
+    encoded = missing = 0
+    try:
+        rows = conn.execute(
+            '''
+            SELECT articles.article_id
+            FROM articles
+            WHERE articles.active = 1 AND (? OR NOT EXISTS (
+                SELECT 1 FROM article_passages WHERE article_passages.article_id = articles.article_id
+            ))
+            ORDER BY articles.article_id;
+            ''',
+            (int(reencode),),
+        ).fetchall()
+        for start in range(0, len(rows), batch_size):
+            article_ids, texts = [], []
+            for (article_id,) in rows[start:start + batch_size]:
+                try:
+                    texts.append(store.read('articles', article_id))
+                except FileNotFoundError:
+                    missing += 1
+                    continue
+                article_ids.append(article_id)
+            for article_id, (spans, vectors, pooled) in zip(article_ids, encode_articles(vectorizer, texts, max_chunks=max_chunks)):
+                write_passages(conn, article_id, spans, vectors)
+                conn.execute(
+                    'INSERT INTO article_heuristics (article_id, vector) VALUES (?, ?) '
+                    'ON CONFLICT(article_id) DO UPDATE SET vector=excluded.vector;',
+                    (article_id, serialize_vector(pooled),),
+                )
+            conn.commit()
+            encoded += len(article_ids)
+            print(f'{encoded} articles encoded', flush=True)
+    finally:
+        conn.close()
+        store.close()
+    return (encoded, missing)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Split existing articles into passages, encode them and store pooled article vectors.')
+    parser.add_argument('db_path', help='path to the sqlite database')
+    parser.add_argument('articles_path', nargs='?', default='/evanr', help='directory holding articles/<article_id>.txt')
+    parser.add_argument('--batch-size', type=int, default=32, help='articles per encode call and transaction')
+    parser.add_argument('--max-chunks', type=int, default=MAX_CHUNKS, help='passages kept per article')
+    parser.add_argument('--reencode', action='store_true', help='also re-encode articles that already have passages')
+    parser.add_argument('--article-store', choices=['directory', 'pack'], default='directory')
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        from .vectorizer import ArticleVectorizer
+        encoded, missing = backfill(args.db_path, pl.Path(args.articles_path), ArticleVectorizer(), args.batch_size, args.max_chunks, args.reencode, args.article_store)
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    print(f'Encoded {encoded} articles in {time.perf_counter() - start:.2f}s ({missing} without a text file).')
+    print('Restart the web app (and rebuild the mmap vector file if one is used) so the new vectors are loaded.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
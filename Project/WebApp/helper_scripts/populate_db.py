@@ -1,13 +1,13 @@
 import requests
 import json
-import datetime
-import time
 
 API_BASE = 'http://localhost:5000/api'
 
 USERNAME = 'PLOS'
 PASSWORD = '00000000'
 JSON_PATH = './WebApp/plos_articles_scraped.json'
+# articles per /api/articles/create_batch request
+BATCH_SIZE = 50
 
 def create_account():
     response = requests.post(f'{API_BASE}/create_user', json={
@@ -30,17 +30,25 @@ def load_articles():
     with open(JSON_PATH, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def create_article(token, article):
-    headers = {'Authorization': f'Bearer {token}'}
-    payload = {
-        'token': token,
+def article_payload(article):
+    return {
         'title': article['title'],
         'authors': article['authors'],
         'content': '(' + article['url'] + ')\n\n' + article['content'],
         'publish_date': article['publish_date']
     }
-    response = requests.post(f'{API_BASE}/create_article', json=payload, headers=headers)
-    return response.status_code, response.text
+
+# posts a batch and yields one result per article as the server streams them back
+def create_articles(token, batch):
+    headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/x-ndjson'}
+    response = requests.post(f'{API_BASE}/articles/create_batch', json={'articles': [article_payload(article) for article in batch]}, headers=headers, stream=True)
+    if response.status_code != 200:
+        for index in range(len(batch)):
+            yield {'index': index, 'success': False, 'message': f'{response.status_code} - {response.text}'}
+        return
+    for line in response.iter_lines():
+        if line:
+            yield json.loads(line)
 
 create_account()
 
@@ -52,14 +60,15 @@ articles = load_articles()
 print(f'Loaded {len(articles)} articles.')
 
 success = 0
-for i, article in enumerate(articles):
-    status, text = create_article(token, article)
-    title = article['title']
-    if status == 200:
-        print(f'[{i+1}] Created: {title[:60]}')
-        success += 1
-    else:
-        print(f'[{i+1}] Failed: {status} - {text}')
-    time.sleep(1)
+for start in range(0, len(articles), BATCH_SIZE):
+    batch = articles[start:start + BATCH_SIZE]
+    for result in create_articles(token, batch):
+        i = start + result['index']
+        title = articles[i]['title']
+        if result['success']:
+            print(f'[{i+1}] Created: {title[:60]}')
+            success += 1
+        else:
+            print(f'[{i+1}] Failed: {result["message"]}')
 
 print(f'\n🎉 {success}/{len(articles)} articles created.')
@@ -1,29 +1,91 @@
-from .token_dict import TokenDict
+from .connection_pool import ConnectionPool
+from .lru_cache import LRUCache
+from .session_store import MemorySessionStore, SQLiteSessionStore, SessionSweeper
 import secrets
+import sys
+import time
 
 class SessionManager:
-    def __init__(self) -> None:
-        self.sessions: TokenDict = TokenDict()
-        
+    # backend='sqlite' keeps sessions in the database (needs pool) so they survive restarts and are shared
+    # by every worker process, backend='memory' keeps the old in-process behaviour
+    # sessions expire ttl_seconds after login, with sliding_expiry an active session is extended once
+    # less than half of its ttl is left
+    # validate_session is served from an lru cache, entries are rechecked against the store after
+    # cache_ttl_seconds so a log out in another process takes effect within that time
+    def __init__(self, backend: str = 'memory', pool: ConnectionPool | None = None, ttl_seconds: float = 7 * 24 * 3600, sliding_expiry: bool = True, cache_size: int = 4096, cache_ttl_seconds: float = 30.0, sweep_interval_seconds: float = 300.0) -> None:
+        if backend == 'sqlite':
+            if pool is None:
+                raise ValueError('The sqlite session backend needs a connection pool.')
+            self.store: MemorySessionStore | SQLiteSessionStore = SQLiteSessionStore(pool)
+        elif backend == 'memory':
+            self.store = MemorySessionStore()
+        else:
+            raise ValueError(f'Unknown session backend {backend!r}, expected sqlite or memory.')
+        self.backend: str = backend
+        self.ttl_seconds: float = ttl_seconds
+        self.sliding_expiry: bool = sliding_expiry
+        self.cache_ttl_seconds: float = cache_ttl_seconds
+        # token -> (user_id, expires_at, checked_at)
+        self.cache: LRUCache = LRUCache(max_entries=cache_size)
+        self.sweeper: SessionSweeper = SessionSweeper(self.store, sweep_interval_seconds)
+
     def generate_token(self, n: int = 32) -> str:
         return secrets.token_urlsafe(n)
-    
+
     # returns True on success False on failure
-    def register_session(self, user_id: str) -> tuple[bool, str]:
+    def register_session(self, user_id: int) -> tuple[bool, str]:
         token = self.generate_token()
-        return (self.sessions.insert(user_id=user_id, token=token), token)
-    
+        now = time.time()
+        try:
+            success = self.store.add(token, user_id, now + self.ttl_seconds)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return (False, token)
+        if success:
+            self.cache.put(token, (user_id, now + self.ttl_seconds, now))
+        return (success, token)
+
     # returns True on success False on failure
+    # terminating by user_id ends every session of that user
     def terminate_session(self, *, user_id: int | None = None, token: str | None = None) -> bool:
         if (user_id is None) and (token is None):
             return False
         if (token is not None) and (user_id is not None):
             return False
-        if user_id is not None:
-            return self.sessions.delete(user_id=user_id)
-        if token is not None:
-            return self.sessions.delete(token=token)
-    
+        try:
+            if user_id is not None:
+                self.store.delete_user(user_id)
+                # cached tokens are not indexed by user, dropping everything is fine for a rare operation
+                self.cache.clear()
+                return True
+            self.cache.pop(token)
+            return self.store.delete_token(token)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return False
+
     # returns -1 if session is invalid otherwise returns user_id
     def validate_session(self, token: str) -> int:
-        return self.sessions.get_user_id(token)
\ No newline at end of file
+        if not token:
+            return -1
+        now = time.time()
+        cached = self.cache.get(token)
+        if cached is not None and cached[1] > now and now - cached[2] < self.cache_ttl_seconds:
+            return cached[0]
+        try:
+            session = self.store.lookup(token)
+            if session is None or session[1] <= now:
+                self.cache.pop(token)
+                return -1
+            user_id, expires_at = session
+            if self.sliding_expiry and expires_at - now < self.ttl_seconds / 2:
+                expires_at = now + self.ttl_seconds
+                self.store.extend(token, expires_at)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+            return -1
+        self.cache.put(token, (user_id, expires_at, now))
+        return user_id
+
+    def close(self) -> None:
+        self.sweeper.stop()
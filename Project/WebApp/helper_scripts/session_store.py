@@ -0,0 +1,130 @@
+import hashlib
+import sys
+import threading
+import time
+from .connection_pool import ConnectionPool
+from .lru_cache import LRUCache
+from .token_dict import TokenDict
+
+# both stores implement add(token, user_id, expires_at), lookup(token) -> (user_id, expires_at) | None,
+# delete_token(token), delete_user(user_id) and sweep(now) -> number of expired sessions removed
+
+class MemorySessionStore:
+    # the original in-process backend, sessions are lost on restart and not shared between processes
+    def __init__(self) -> None:
+        self.tokens: TokenDict = TokenDict()
+        self.expires_at: dict[str, float] = dict()
+        self.lock: threading.Lock = threading.Lock()
+
+    def add(self, token: str, user_id: int, expires_at: float) -> bool:
+        with self.lock:
+            if not self.tokens.insert(user_id=user_id, token=token):
+                return False
+            self.expires_at[token] = expires_at
+            return True
+
+    def lookup(self, token: str) -> tuple[int, float] | None:
+        with self.lock:
+            user_id = self.tokens.get_user_id(token)
+            if user_id == -1:
+                return None
+            return (user_id, self.expires_at[token])
+
+    def extend(self, token: str, expires_at: float) -> None:
+        with self.lock:
+            if token in self.expires_at:
+                self.expires_at[token] = expires_at
+
+    def delete_token(self, token: str) -> bool:
+        with self.lock:
+            self.expires_at.pop(token, None)
+            return self.tokens.delete(token=token)
+
+    # returns the tokens that were removed so cached copies can be dropped
+    def delete_user(self, user_id: int) -> list[str]:
+        with self.lock:
+            tokens = self.tokens.tokens_for(user_id)
+            self.tokens.delete(user_id=user_id)
+            for token in tokens:
+                self.expires_at.pop(token, None)
+            return list(tokens)
+
+    def sweep(self, now: float) -> int:
+        with self.lock:
+            expired = [token for token, expires_at in self.expires_at.items() if expires_at <= now]
+            for token in expired:
+                del self.expires_at[token]
+                self.tokens.delete(token=token)
+            return len(expired)
+
+# tokens are stored as sha256 digests so the sessions table cannot be replayed if the database leaks
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+class SQLiteSessionStore:
+    # sessions live in the sessions table (db_init.sql) so every worker process sees the same logins
+    # and they survive restarts
+    def __init__(self, pool: ConnectionPool) -> None:
+        self.pool: ConnectionPool = pool
+
+    def add(self, token: str, user_id: int, expires_at: float) -> bool:
+        if user_id < 0:
+            return False
+        conn = self.pool.writer()
+        conn.execute(
+            'INSERT INTO sessions (token_hash, user_id, created_at, expires_at) VALUES (?, ?, ?, ?);',
+            (hash_token(token), user_id, time.time(), expires_at,),
+        )
+        conn.commit()
+        return True
+
+    def lookup(self, token: str) -> tuple[int, float] | None:
+        row = self.pool.reader().execute(
+            'SELECT user_id, expires_at FROM sessions WHERE token_hash = ?;',
+            (hash_token(token),),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def extend(self, token: str, expires_at: float) -> None:
+        conn = self.pool.writer()
+        conn.execute('UPDATE sessions SET expires_at = ? WHERE token_hash = ?;', (expires_at, hash_token(token),))
+        conn.commit()
+
+    def delete_token(self, token: str) -> bool:
+        conn = self.pool.writer()
+        cursor = conn.execute('DELETE FROM sessions WHERE token_hash = ?;', (hash_token(token),))
+        conn.commit()
+        return cursor.rowcount > 0
+
+    # only the hashes are stored so the removed tokens cannot be returned, callers clear their cache by user
+    def delete_user(self, user_id: int) -> list[str]:
+        conn = self.pool.writer()
+        conn.execute('DELETE FROM sessions WHERE user_id = ?;', (user_id,))
+        conn.commit()
+        return []
+
+    def sweep(self, now: float) -> int:
+        conn = self.pool.writer()
+        cursor = conn.execute('DELETE FROM sessions WHERE expires_at <= ?;', (now,))
+        conn.commit()
+        return cursor.rowcount
+
+class SessionSweeper:
+    # daemon thread that removes expired sessions from a store every interval_seconds
+    def __init__(self, store: MemorySessionStore | SQLiteSessionStore, interval_seconds: float = 300.0) -> None:
+        self.store: MemorySessionStore | SQLiteSessionStore = store
+        self.interval_seconds: float = interval_seconds
+        self.stopped: threading.Event = threading.Event()
+        self.swept: int = 0
+        self.thread: threading.Thread = threading.Thread(target=self._run, name='session-sweeper', daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval_seconds):
+            try:
+                self.swept += self.store.sweep(time.time())
+            except Exception as e:
+                sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+
+    def stop(self) -> None:
+        self.stopped.set()
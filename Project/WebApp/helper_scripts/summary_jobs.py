@@ -0,0 +1,121 @@
+import queue
+import sys
+import threading
+import time
+from typing import Callable
+
+class SummaryJobQueue:
+    # bounded pool of worker threads that generate summaries off the request path
+    # jobs are keyed by article_id so asking twice for the same summary never queues it twice
+    # statuses: pending (queued), running, done, failed, unknown (never queued or already forgotten)
+    # on_status(article_id, status, error) is called on every change, e.g. to share it with other processes, it runs
+    # outside the lock on the thread that made the change, each change waits for the article's previous one to be
+    # reported (reported_events) so they reach it in order and a fast worker cannot report running before pending
+    def __init__(self, summarize: Callable[[int, int], tuple[bool, str]], num_workers: int = 2, max_queue: int = 1024, keep_finished: int = 4096, on_status: Callable[[int, str, str | None], None] | None = None) -> None:
+        self.summarize: Callable[[int, int], tuple[bool, str]] = summarize
+        self.on_status: Callable[[int, str, str | None], None] | None = on_status
+        self.jobs: queue.Queue[tuple[int, int] | None] = queue.Queue(maxsize=max_queue)
+        self.statuses: dict[int, dict[str, str | float | None]] = dict()
+        self.finished_order: list[int] = []
+        self.keep_finished: int = keep_finished
+        self.lock: threading.Lock = threading.Lock()
+        # article_id -> set once the article's latest change has been reported, guarded by lock
+        self.reported_events: dict[int, threading.Event] = dict()
+        self.workers: list[threading.Thread] = [
+            threading.Thread(target=self._work, name=f'summary-worker-{i}', daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    # queues a summary for article_id on behalf of user_id and returns its status
+    # returns 'rejected' when the queue is full
+    def enqueue(self, article_id: int, user_id: int) -> str:
+        with self.lock:
+            current = self.statuses.get(article_id)
+            if current is not None and current['status'] in ('pending', 'running'):
+                return current['status']
+            try:
+                self.jobs.put_nowait((article_id, user_id))
+            except queue.Full:
+                return 'rejected'
+            self.statuses[article_id] = {'status': 'pending', 'error': None, 'queued_at': time.time()}
+            turn = self._take_report_turn(article_id)
+        self._report(article_id, 'pending', None, turn)
+        return 'pending'
+
+    def status(self, article_id: int) -> dict[str, str | float | None]:
+        with self.lock:
+            return dict(self.statuses.get(article_id, {'status': 'unknown', 'error': None}))
+
+    # called under the lock right after a change, returns the event of the previous change and this change's event
+    def _take_report_turn(self, article_id: int) -> tuple[threading.Event | None, threading.Event]:
+        previous = self.reported_events.get(article_id)
+        current = threading.Event()
+        self.reported_events[article_id] = current
+        return (previous, current)
+
+    # called without the lock, waits for the previous change of the article to be reported first
+    def _report(self, article_id: int, status: str, error: str | None, turn: tuple[threading.Event | None, threading.Event]) -> None:
+        previous, current = turn
+        try:
+            if previous is not None:
+                previous.wait()
+            if self.on_status is not None:
+                self.on_status(article_id, status, error)
+        except Exception as e:
+            sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        finally:
+            current.set()
+            with self.lock:
+                if self.reported_events.get(article_id) is current:
+                    del self.reported_events[article_id]
+
+    def pending_count(self) -> int:
+        return self.jobs.qsize()
+
+    def _finish(self, article_id: int, status: str, error: str | None) -> None:
+        with self.lock:
+            self.statuses[article_id] = {'status': status, 'error': error, 'finished_at': time.time()}
+            self.finished_order.append(article_id)
+            # finished jobs are only kept around long enough for pollers to see them
+            while len(self.finished_order) > self.keep_finished:
+                old_id = self.finished_order.pop(0)
+                if self.statuses.get(old_id, {}).get('status') in ('done', 'failed'):
+                    del self.statuses[old_id]
+            turn = self._take_report_turn(article_id)
+        self._report(article_id, status, error, turn)
+
+    def _work(self) -> None:
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            article_id, user_id = job
+            with self.lock:
+                self.statuses[article_id] = {'status': 'running', 'error': None, 'started_at': time.time()}
+                turn = self._take_report_turn(article_id)
+            self._report(article_id, 'running', None, turn)
+            try:
+                success, message = self.summarize(article_id, user_id)
+            except Exception as e:
+                sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+                success, message = (False, 'Unable to generate summary.')
+            self._finish(article_id, 'done' if success else 'failed', None if success else message)
+            self.jobs.task_done()
+
+    # stops the workers, with wait=True queued jobs are finished first
+    def shutdown(self, wait: bool = True) -> None:
+        if not wait:
+            while True:
+                try:
+                    self.jobs.get_nowait()
+                    self.jobs.task_done()
+                except queue.Empty:
+                    break
+        for _ in self.workers:
+            self.jobs.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.join()
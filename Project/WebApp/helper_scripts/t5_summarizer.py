@@ -4,7 +4,8 @@ import nltk
 from nltk.tokenize import sent_tokenize
 import sys
 
-nltk.download('punkt_tab')
+# sent_tokenize needs the punkt_tab data, it is no longer downloaded on import:
+# python -m nltk.downloader punkt_tab
 
 def is_gpu_sufficient(min_vram_gb=6):
     if not torch.cuda.is_available():
@@ -1,17 +1,23 @@
 import sys
-import spacy
-import pytextrank
-import spacy.cli
+from typing import Any, Iterable, Iterator
 
 class TextRanker:
     def __init__(self, sentence_count: int = 5, model_name = None) -> None:
         self.sentence_count: int = sentence_count
-        spacy.cli.download("en_core_web_sm")
-        self.nlp = spacy.load("en_core_web_sm")
+        # imported here so importing this module stays cheap, pytextrank registers the "textrank" pipe
+        import spacy
+        import pytextrank
+        # the model ships as a pip package (requirements.txt), nothing is downloaded at runtime
+        try:
+            self.nlp = spacy.load("en_core_web_sm")
+        except OSError as e:
+            raise OSError('spaCy model en_core_web_sm is not installed, install it with: pip install -r requirements.txt') from e
         self.nlp.add_pipe("textrank")
 
     def generate_summary(self, text: str) -> tuple[bool, str]:
-        doc: str = self.nlp(text)
+        return self.summarize_doc(self.nlp(text))
+
+    def summarize_doc(self, doc) -> tuple[bool, str]:
         try:
             summary: str = ' '.join([sent.text.strip() for sent in doc._.textrank.summary(limit_sentences=self.sentence_count)])
         except Exception as e:
@@ -19,4 +25,10 @@ class TextRanker:
             return (False, 'Unable to generate summary.')
         if len(summary) > 0 and len(summary) < 2048:
             return (True, summary)
-        return (False, 'Unable to generate summary.')
\ No newline at end of file
+        return (False, 'Unable to generate summary.')
+
+    # streams (text, context) pairs through nlp.pipe and yields (context, (success, summary))
+    # in input order, n_process > 1 parses batches in worker processes
+    def generate_summaries(self, texts_with_context: Iterable[tuple[str, Any]], batch_size: int = 16, n_process: int = 1) -> Iterator[tuple[Any, tuple[bool, str]]]:
+        for doc, context in self.nlp.pipe(texts_with_context, as_tuples=True, batch_size=batch_size, n_process=n_process):
+            yield (context, self.summarize_doc(doc))
\ No newline at end of file
@@ -1,8 +1,8 @@
-# Two Way Dict
+# Two Way Dict, a user can hold several tokens (one per logged in browser)
 class TokenDict:
     def __init__(self) -> None:
         self.token_to_user: dict[str, int] = dict()
-        self.user_to_token: dict[str, int] = dict()
+        self.user_to_tokens: dict[int, set[str]] = dict()
     
     # returns -1 if token is not in dict otherwise
     # returns the user_id associated with the token provided
@@ -17,28 +17,34 @@ class TokenDict:
         if user_id < 0:
             return False
         self.token_to_user[token] = user_id
-        self.user_to_token[user_id] = token
+        self.user_to_tokens.setdefault(user_id, set()).add(token)
         return True
     
     # returns None if both or neither of user_id and token are provided otherwise 
     # returns True if provided arg was in dict before deletion and False if not
+    # deleting by user_id removes every token of that user
     def delete(self, *, user_id: int | None = None, token: str | None = None) -> bool:
         if (user_id is None) == (token is None):
             return False
         if user_id is not None:
             if not self.contains(user_id=user_id):
                 return False
-            token = self.user_to_token[user_id]
-            del self.user_to_token[user_id]
-            del self.token_to_user[token]
+            for user_token in self.user_to_tokens.pop(user_id):
+                del self.token_to_user[user_token]
             return True
         if token is not None:
             if not self.contains(token=token):
                 return False
-            user_id = self.token_to_user[token]
-            del self.token_to_user[token]
-            del self.user_to_token[user_id]
+            user_id = self.token_to_user.pop(token)
+            user_tokens = self.user_to_tokens[user_id]
+            user_tokens.discard(token)
+            if not user_tokens:
+                del self.user_to_tokens[user_id]
             return True
+    
+    # tokens currently held by user_id
+    def tokens_for(self, user_id: int) -> set[str]:
+        return set(self.user_to_tokens.get(user_id, ()))
         
     # returns None if both or neither of user_id and token are provided otherwise 
     # returns True if provided arg is in dict and False if not
@@ -46,6 +52,6 @@ class TokenDict:
         if (user_id is None) == (token is None):
             return None
         if user_id is not None:
-            return user_id in self.user_to_token
+            return user_id in self.user_to_tokens
         if token is not None:
             return token in self.token_to_user
\ No newline at end of file
@@ -0,0 +1,205 @@
+import threading
+import pathlib as pl
+import numpy as np
+from typing import Iterable
+from .vector_store import MmapVectorFile
+
+class VectorMatrix:
+    # keeps every article vector in one contiguous float32 matrix with a parallel id array
+    # so a recommendation is a single matrix-vector product instead of a python loop
+    # rows are appended into spare capacity (grown by doubling) and removed by moving the last row into the hole
+    # with mmap_path the matrix lives in an append-only MmapVectorFile instead, opening it maps the existing
+    # rows without reading them and removals leave a tombstone (id -1) that is masked at query time, once
+    # tombstones make up more than compact_fraction of the rows the live rows are moved down over them in place
+    def __init__(self, dim: int | None = None, initial_capacity: int = 1024, mmap_path: pl.Path | str | None = None, compact_fraction: float = 0.25) -> None:
+        self.dim: int | None = dim
+        self.capacity: int = max(1, initial_capacity)
+        self.size: int = 0
+        self.tombstones: int = 0
+        self.ids: np.ndarray = np.empty(self.capacity, dtype=np.int64)
+        self.matrix: np.ndarray | None = np.empty((self.capacity, dim), dtype=np.float32) if dim is not None else None
+        self.id_to_row: dict[int, int] = dict()
+        self.lock: threading.RLock = threading.RLock()
+        self.compact_fraction: float = compact_fraction
+        self.mmap_file: MmapVectorFile | None = MmapVectorFile(mmap_path) if mmap_path is not None else None
+        if self.mmap_file is not None:
+            if self.mmap_file.exists():
+                self._attach_mmap()
+            else:
+                self.matrix = None
+
+    def _attach_mmap(self) -> None:
+        self.dim, self.capacity, self.size = self.mmap_file.dim, self.mmap_file.capacity, self.mmap_file.size
+        self.ids, self.matrix = self.mmap_file.ids, self.mmap_file.vectors
+        ids = self.ids[:self.size]
+        live = np.flatnonzero(ids >= 0)
+        self.id_to_row = dict(zip(ids[live].tolist(), live.tolist()))
+        if len(self.id_to_row) < len(live):
+            # a compaction cut short left a row behind twice, the later copy is the one kept
+            ids[np.setdiff1d(live, list(self.id_to_row.values()), assume_unique=True)] = -1
+        self.tombstones = self.size - len(self.id_to_row)
+
+    def flush(self) -> None:
+        # nothing to write before the first vector creates the file
+        if self.mmap_file is not None and self.matrix is not None:
+            with self.lock:
+                self.mmap_file.set_size(self.size)
+                self.mmap_file.flush()
+
+    # releases the memory-mapped file (and its lock), the matrix must not be used afterwards
+    def close(self) -> None:
+        if self.mmap_file is not None:
+            with self.lock:
+                if self.matrix is not None:
+                    self.mmap_file.set_size(self.size)
+                self.mmap_file.close()
+
+    # ids and vectors of the live rows (copies)
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        with self.lock:
+            ids = self.ids[:self.size]
+            if self.tombstones:
+                live = ids >= 0
+                return (np.array(ids[live]), np.array(self.matrix[:self.size][live]))
+            return (np.array(ids), np.array(self.matrix[:self.size]) if self.matrix is not None else np.empty((0, self.dim or 0), dtype=np.float32))
+
+    def __len__(self) -> int:
+        return self.size - self.tombstones
+
+    def __contains__(self, article_id: int) -> bool:
+        return article_id in self.id_to_row
+
+    def _ensure_capacity(self, dim: int, needed: int) -> None:
+        if self.matrix is None:
+            self.dim = dim
+            if self.mmap_file is not None:
+                self.mmap_file.create(dim, self.capacity)
+                self.ids, self.matrix = self.mmap_file.ids, self.mmap_file.vectors
+            else:
+                self.matrix = np.empty((self.capacity, dim), dtype=np.float32)
+        if dim != self.dim:
+            raise ValueError(f'Vector dimension {dim} does not match index dimension {self.dim}.')
+        if needed <= self.capacity:
+            return
+        new_capacity = self.capacity
+        while new_capacity < needed:
+            new_capacity *= 2
+        if self.mmap_file is not None:
+            self.mmap_file.set_size(self.size)
+            self.mmap_file.grow(new_capacity)
+            self.ids, self.matrix, self.capacity = self.mmap_file.ids, self.mmap_file.vectors, new_capacity
+            return
+        new_matrix = np.empty((new_capacity, self.dim), dtype=np.float32)
+        new_matrix[:self.size] = self.matrix[:self.size]
+        new_ids = np.empty(new_capacity, dtype=np.int64)
+        new_ids[:self.size] = self.ids[:self.size]
+        self.matrix, self.ids, self.capacity = new_matrix, new_ids, new_capacity
+
+    # inserts or replaces the vector for article_id
+    def add(self, article_id: int, vector: np.ndarray) -> None:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        with self.lock:
+            row = self.id_to_row.get(article_id)
+            if row is not None:
+                self.matrix[row] = vector
+                return
+            self._ensure_capacity(vector.shape[0], self.size + 1)
+            self.matrix[self.size] = vector
+            self.ids[self.size] = article_id
+            self.id_to_row[article_id] = self.size
+            self.size += 1
+            if self.mmap_file is not None:
+                self.mmap_file.set_size(self.size)
+
+    # bulk insert used at startup, vectors is an (n, dim) array aligned with article_ids
+    def add_many(self, article_ids: Iterable[int], vectors: np.ndarray) -> None:
+        article_ids = [int(i) for i in article_ids]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(article_ids) == 0:
+            return
+        with self.lock:
+            if any(i in self.id_to_row for i in article_ids):
+                for article_id, vector in zip(article_ids, vectors):
+                    self.add(article_id, vector)
+                return
+            self._ensure_capacity(vectors.shape[1], self.size + len(article_ids))
+            start, end = self.size, self.size + len(article_ids)
+            self.matrix[start:end] = vectors
+            self.ids[start:end] = article_ids
+            for offset, article_id in enumerate(article_ids):
+                self.id_to_row[article_id] = start + offset
+            self.size = end
+            if self.mmap_file is not None:
+                self.mmap_file.set_size(self.size)
+
+    # returns True if the article was present
+    def remove(self, article_id: int) -> bool:
+        with self.lock:
+            row = self.id_to_row.pop(article_id, None)
+            if row is None:
+                return False
+            if self.mmap_file is not None:
+                self.ids[row] = -1
+                self.tombstones += 1
+                if self.tombstones > self.compact_fraction * self.size:
+                    self.compact()
+                return True
+            last = self.size - 1
+            if row != last:
+                self.matrix[row] = self.matrix[last]
+                moved_id = int(self.ids[last])
+                self.ids[row] = moved_id
+                self.id_to_row[moved_id] = row
+            self.size = last
+            return True
+
+    # moves the live rows of a memory-mapped matrix down over its tombstones, keeping their order, and returns
+    # how many rows were reclaimed, rows only ever move to a lower index so it copies chunk by chunk in place
+    def compact(self, chunk_rows: int = 4096) -> int:
+        with self.lock:
+            if self.mmap_file is None or not self.tombstones:
+                return 0
+            live = np.flatnonzero(self.ids[:self.size] >= 0)
+            for start in range(0, len(live), chunk_rows):
+                rows = live[start:start + chunk_rows]
+                self.matrix[start:start + len(rows)] = self.matrix[rows]
+                self.ids[start:start + len(rows)] = self.ids[rows]
+            reclaimed = self.size - len(live)
+            self.ids[len(live):self.size] = -1
+            self.size = len(live)
+            self.tombstones = 0
+            self.id_to_row = dict(zip(self.ids[:self.size].tolist(), range(self.size)))
+            self.mmap_file.set_size(self.size)
+            self.mmap_file.flush()
+            return reclaimed
+
+    # returns a copy of the stored vector or None
+    def get(self, article_id: int) -> np.ndarray | None:
+        with self.lock:
+            row = self.id_to_row.get(article_id)
+            if row is None:
+                return None
+            return self.matrix[row].copy()
+
+    # scores every stored vector against query with one matrix-vector product and
+    # returns up to k (article_id, score) pairs sorted by descending score
+    # ids in exclude_ids are masked out in bulk before selection
+    def top_k(self, query: np.ndarray, k: int, exclude_ids: Iterable[int] | None = None) -> list[tuple[int, float]]:
+        with self.lock:
+            if len(self) == 0 or k <= 0:
+                return []
+            ids = self.ids[:self.size]
+            scores = self.matrix[:self.size] @ np.asarray(query, dtype=np.float32).reshape(-1)
+            if exclude_ids is not None:
+                exclude = np.fromiter(exclude_ids, dtype=np.int64)
+                if exclude.size:
+                    scores[np.isin(ids, exclude)] = -np.inf
+            if self.tombstones:
+                scores[ids < 0] = -np.inf
+            k = min(k, self.size)
+            if k < self.size:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(self.size)
+            top = top[np.argsort(-scores[top], kind='stable')]
+            return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
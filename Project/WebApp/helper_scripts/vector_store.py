@@ -0,0 +1,225 @@
+import argparse
+import fcntl
+import io
+import os
+import pathlib as pl
+import pickle
+import sqlite3 as sq3
+import sys
+import numpy as np
+from typing import Iterable
+
+# article_heuristics.vector holds a raw little-endian float32 blob (4 * dim bytes, no header)
+VECTOR_DTYPE = np.dtype('<f4')
+
+def serialize_vector(vector: np.ndarray) -> bytes:
+    return np.ascontiguousarray(vector, dtype=VECTOR_DTYPE).reshape(-1).tobytes()
+
+# returns a read-only view over data, no copy is made
+def deserialize_vector(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=VECTOR_DTYPE)
+
+class _NumpyOnlyUnpickler(pickle.Unpickler):
+    # legacy rows were written with pickle.dumps(ndarray), only the globals
+    # needed to rebuild an ndarray are allowed so a crafted row cannot run code
+    # (protocols 2 and 3 carry the raw bytes through _codecs.encode, protocol 5 through _frombuffer)
+    ALLOWED: set[tuple[str, str]] = {
+        ('numpy.core.multiarray', '_reconstruct'),
+        ('numpy._core.multiarray', '_reconstruct'),
+        ('numpy.core.multiarray', 'scalar'),
+        ('numpy._core.multiarray', 'scalar'),
+        ('numpy.core.numeric', '_frombuffer'),
+        ('numpy._core.numeric', '_frombuffer'),
+        ('numpy', 'ndarray'),
+        ('numpy', 'dtype'),
+        ('_codecs', 'encode'),
+    }
+
+    def find_class(self, module: str, name: str):
+        if (module, name) in _NumpyOnlyUnpickler.ALLOWED:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f'Refusing to load {module}.{name} from a vector blob.')
+
+# decodes a pre-migration pickled vector, returns None if data is not one
+def decode_legacy_vector(data: bytes) -> np.ndarray | None:
+    # pickle protocol 2+ starts with PROTO (0x80, version) and ends with STOP (b'.')
+    if len(data) < 3 or data[0] != 0x80 or not 2 <= data[1] <= 5 or data[-1] != 0x2e:
+        return None
+    try:
+        vector = _NumpyOnlyUnpickler(io.BytesIO(data)).load()
+    except Exception:
+        return None
+    if not isinstance(vector, np.ndarray):
+        return None
+    return np.asarray(vector, dtype=VECTOR_DTYPE).reshape(-1)
+
+# turns (article_id, blob) rows into an id array and one (n, dim) matrix built from a single buffer
+# pickled rows are decoded and returned separately so the caller can rewrite them
+def decode_vector_rows(rows: Iterable[tuple[int, bytes]]) -> tuple[np.ndarray, np.ndarray, list[tuple[int, np.ndarray]]]:
+    raw_ids: list[int] = []
+    raw_blobs: list[bytes] = []
+    legacy: list[tuple[int, np.ndarray]] = []
+    for article_id, blob in rows:
+        vector = decode_legacy_vector(blob)
+        if vector is not None:
+            legacy.append((article_id, vector))
+        else:
+            raw_ids.append(article_id)
+            raw_blobs.append(blob)
+    lengths = {len(blob) for blob in raw_blobs} | {vector.nbytes for _, vector in legacy}
+    if len(lengths) > 1:
+        raise ValueError(f'Stored vectors have inconsistent sizes: {sorted(lengths)} bytes.')
+    dim = lengths.pop() // VECTOR_DTYPE.itemsize if lengths else 0
+    matrix = np.frombuffer(b''.join(raw_blobs), dtype=VECTOR_DTYPE).reshape(len(raw_blobs), dim)
+    if legacy:
+        matrix = np.concatenate([matrix, np.stack([vector for _, vector in legacy])])
+    ids = np.array(raw_ids + [article_id for article_id, _ in legacy], dtype=np.int64)
+    return (ids, matrix, legacy)
+
+def write_vectors(conn: sq3.Connection, rows: Iterable[tuple[int, np.ndarray]]) -> int:
+    params = [(serialize_vector(vector), article_id) for article_id, vector in rows]
+    if params:
+        conn.executemany('UPDATE article_heuristics SET vector = ? WHERE article_id = ?;', params)
+        conn.commit()
+    return len(params)
+
+# converts every pickled row in article_heuristics to the raw format, returns the number converted
+def migrate_pickled_vectors(conn: sq3.Connection, batch_size: int = 1000) -> int:
+    converted = 0
+    last_id = -1
+    while True:
+        rows = conn.execute(
+            'SELECT article_id, vector FROM article_heuristics '
+            'WHERE article_id > ? AND vector IS NOT NULL AND substr(vector, 1, 1) = x\'80\' '
+            'ORDER BY article_id LIMIT ?;',
+            (last_id, batch_size,),
+        ).fetchall()
+        if not rows:
+            return converted
+        last_id = rows[-1][0]
+        legacy = [(article_id, vector) for article_id, vector in ((r[0], decode_legacy_vector(r[1])) for r in rows) if vector is not None]
+        converted += write_vectors(conn, legacy)
+
+class MmapVectorFile:
+    # append-only on-disk copy of the vector matrix, mapped with np.memmap so opening it costs
+    # nothing no matter how many rows it holds
+    #   <path>.ids : 32 byte header (magic, dim, size, capacity as int64) then one int64 id per row,
+    #                a deleted row keeps its vector and has its id overwritten with -1
+    #   <path>.f32 : capacity rows of dim little-endian float32
+    # appends and tombstones are not coordinated between processes, so a process holds an flock on <path>.lock
+    # for as long as the file is open and a second one opening it gets a RuntimeError
+    MAGIC = 0x31434556_45434345
+    HEADER_INTS = 4
+
+    def __init__(self, path: pl.Path | str) -> None:
+        self.path: pl.Path = pl.Path(path)
+        self.ids_path: pl.Path = self.path.with_name(self.path.name + '.ids')
+        self.vectors_path: pl.Path = self.path.with_name(self.path.name + '.f32')
+        self.lock_file = open(self.path.with_name(self.path.name + '.lock'), 'a')
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock_file.close()
+            raise RuntimeError(f'{self.path} is open in another process, the memory-mapped vector file has a single writer.')
+        self.header: np.memmap | None = None
+        self.ids: np.memmap | None = None
+        self.vectors: np.memmap | None = None
+        self.dim: int = 0
+        self.capacity: int = 0
+        if self.exists():
+            self._map()
+
+    def exists(self) -> bool:
+        return self.ids_path.exists() and self.vectors_path.exists()
+
+    @property
+    def size(self) -> int:
+        return int(self.header[2]) if self.header is not None else 0
+
+    def create(self, dim: int, capacity: int = 1024) -> None:
+        with open(self.ids_path, 'wb') as ids_file:
+            ids_file.write(np.array([MmapVectorFile.MAGIC, dim, 0, capacity], dtype='<i8').tobytes())
+            ids_file.truncate(8 * (MmapVectorFile.HEADER_INTS + capacity))
+        with open(self.vectors_path, 'wb') as vectors_file:
+            vectors_file.truncate(VECTOR_DTYPE.itemsize * dim * capacity)
+        self._map()
+
+    def _map(self) -> None:
+        self.header = np.memmap(self.ids_path, dtype='<i8', mode='r+', shape=(MmapVectorFile.HEADER_INTS,))
+        if int(self.header[0]) != MmapVectorFile.MAGIC:
+            raise ValueError(f'{self.ids_path} is not a vector id file.')
+        self.dim = int(self.header[1])
+        self.capacity = int(self.header[3])
+        self.ids = np.memmap(self.ids_path, dtype='<i8', mode='r+', offset=8 * MmapVectorFile.HEADER_INTS, shape=(self.capacity,))
+        self.vectors = np.memmap(self.vectors_path, dtype=VECTOR_DTYPE, mode='r+', shape=(self.capacity, self.dim))
+
+    def set_size(self, size: int) -> None:
+        self.header[2] = size
+
+    def grow(self, capacity: int) -> None:
+        self.flush()
+        self.header[3] = capacity
+        self.header.flush()
+        self.header = self.ids = self.vectors = None
+        os.truncate(self.ids_path, 8 * (MmapVectorFile.HEADER_INTS + capacity))
+        os.truncate(self.vectors_path, VECTOR_DTYPE.itemsize * self.dim * capacity)
+        self._map()
+
+    def flush(self) -> None:
+        for mapped in (self.header, self.ids, self.vectors):
+            if mapped is not None:
+                mapped.flush()
+
+    # flushes, unmaps and releases the lock
+    def close(self) -> None:
+        self.flush()
+        self.header = self.ids = self.vectors = None
+        if not self.lock_file.closed:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+
+    def delete(self) -> None:
+        self.close()
+        for path in (self.ids_path, self.vectors_path):
+            if path.exists():
+                os.remove(path)
+
+# path of a memory-mapped vector file, kept next to the sqlite file ('vectors' for articles, 'passages')
+def mmap_path_for(db_path: str, name: str = 'vectors') -> pl.Path:
+    db_path = pl.Path(db_path)
+    return db_path.with_name(db_path.stem + '.' + name)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Maintain stored article vectors.')
+    parser.add_argument('command', choices=['migrate', 'build-mmap'], help='migrate: convert pickled vector rows to raw float32, build-mmap: rewrite the memory-mapped vector file from the database')
+    parser.add_argument('db_path', help='path to the sqlite database')
+    args = parser.parse_args(argv)
+    conn = sq3.connect(args.db_path)
+    try:
+        converted = migrate_pickled_vectors(conn)
+        print(f'Converted {converted} pickled vectors.')
+        if args.command == 'build-mmap':
+            from .vector_index import VectorMatrix
+            rows = conn.execute(
+                'SELECT article_heuristics.article_id, article_heuristics.vector '
+                'FROM article_heuristics '
+                'JOIN articles ON articles.article_id = article_heuristics.article_id '
+                'WHERE article_heuristics.vector IS NOT NULL AND articles.active = 1 '
+                'ORDER BY article_heuristics.article_id;'
+            ).fetchall()
+            ids, matrix, _ = decode_vector_rows(rows)
+            path = mmap_path_for(args.db_path)
+            MmapVectorFile(path).delete()
+            vectors = VectorMatrix(mmap_path=path)
+            vectors.add_many(ids, matrix)
+            vectors.flush()
+            print(f'Wrote {len(vectors)} vectors to {path}.ids / {path}.f32')
+    except Exception as e:
+        sys.stderr.write(f'{e.__class__.__name__}: {str(e)}\n')
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,42 @@
-from sentence_transformers import SentenceTransformer
+import re
+import zlib
 import numpy as np
 
+WORD_PATTERN = re.compile(r'\w+')
+
 class ArticleVectorizer:
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    # with local_files_only the model must already be in the huggingface cache (the docker image
+    # downloads it at build time) instead of being fetched on first start
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', local_files_only: bool = False):
+        from sentence_transformers import SentenceTransformer
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
+        self.model = SentenceTransformer(model_name, local_files_only=local_files_only)
+
+    def encode(self, text: str, normalize_embeddings=True) -> np.ndarray:
+        return self.model.encode(text, normalize_embeddings=normalize_embeddings)
+
+    # encodes many texts in one call, returns an (n, dim) float32 array
+    def encode_batch(self, texts: list[str], batch_size: int = 64, normalize_embeddings=True) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings), dtype=np.float32)
+
+class HashingVectorizer:
+    # offline stand-in for ArticleVectorizer with the same interface, each word is hashed to a
+    # signed dimension so texts sharing words get similar vectors, used by benchmarks and tests
+    # where the real model is unavailable or would dominate the timings
+    def __init__(self, dim: int = 384):
+        self.model_name = f'hashing-{dim}'
+        self.dim = dim
 
     def encode(self, text: str, normalize_embeddings=True) -> np.ndarray:
-        return self.model.encode(text, normalize_embeddings=normalize_embeddings)
\ No newline at end of file
+        return self.encode_batch([text], normalize_embeddings=normalize_embeddings)[0]
+
+    def encode_batch(self, texts: list[str], batch_size: int = 64, normalize_embeddings=True) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in WORD_PATTERN.findall(text.lower()):
+                digest = zlib.crc32(word.encode('utf-8'))
+                vectors[row, digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms > 0, norms, 1.0)
+        return vectors
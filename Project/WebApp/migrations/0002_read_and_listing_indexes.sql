@@ -0,0 +1,8 @@
+-- recommender: SELECT article_id FROM user_reads WHERE user_id = ? (covering, no table lookups)
+CREATE INDEX IF NOT EXISTS user_reads_user_id ON user_reads(user_id, article_id);
+
+-- /home recent articles: WHERE active = 1 ORDER BY submitted_timestamp DESC
+CREATE INDEX IF NOT EXISTS articles_active_submitted ON articles(active, submitted_timestamp);
+
+-- /profile: WHERE submitter_user_id = ? AND active = 1 ORDER BY submitted_timestamp DESC
+CREATE INDEX IF NOT EXISTS articles_submitter ON articles(submitter_user_id, active, submitted_timestamp);
@@ -0,0 +1,11 @@
+-- materialized recommendations: the most similar active articles of each article, best first by score
+-- maintained by DBManager.create_article / delete_article, rebuilt by helper_scripts/neighbors.py
+CREATE TABLE IF NOT EXISTS article_neighbors (
+    article_id INTEGER NOT NULL REFERENCES articles(article_id),
+    neighbor_id INTEGER NOT NULL REFERENCES articles(article_id),
+    score REAL NOT NULL,
+    PRIMARY KEY (article_id, neighbor_id)
+) WITHOUT ROWID;
+
+-- delete_article: the lists that contain the deleted article
+CREATE INDEX IF NOT EXISTS article_neighbors_neighbor_id ON article_neighbors(neighbor_id);
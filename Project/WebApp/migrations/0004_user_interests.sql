@@ -0,0 +1,10 @@
+-- per-user interest vector: decayed running mean of the vectors of the articles the user read, weight is the
+-- decayed number of reads behind it and read_count the reads applied so far (the version of the home feed)
+-- updated in the same transaction that flushes the reads into user_reads
+CREATE TABLE IF NOT EXISTS user_interests (
+    user_id INTEGER NOT NULL PRIMARY KEY REFERENCES users(user_id),
+    vector BLOB NOT NULL,
+    weight REAL NOT NULL,
+    read_count INTEGER NOT NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,8 @@
+-- status of summaries queued or failed in any web worker, so a poll answered by another worker of the same
+-- database still sees it, the row is removed once the summary is stored (the summary itself then answers done)
+CREATE TABLE IF NOT EXISTS summary_jobs (
+    article_id INTEGER NOT NULL PRIMARY KEY REFERENCES articles(article_id),
+    status TEXT NOT NULL,
+    error TEXT,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
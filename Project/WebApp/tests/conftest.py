@@ -0,0 +1,5 @@
+import pathlib as pl
+import sys
+
+# the tests import helper_scripts the way api.py does, from the WebApp directory
+sys.path.insert(0, str(pl.Path(__file__).resolve().parent.parent))
@@ -0,0 +1,116 @@
+import pathlib as pl
+import sqlite3 as sq3
+import pytest
+from helper_scripts.audit_log import AuditLogBuffer
+from helper_scripts.connection_pool import ConnectionPool
+from helper_scripts.migrations import apply_migrations
+
+DB_INIT_PATH = pl.Path(__file__).resolve().parent.parent / 'db_init.sql'
+
+@pytest.fixture
+def pool(tmp_path):
+    db_path = str(tmp_path / 'audit.sqlite3')
+    conn = sq3.connect(db_path)
+    apply_migrations(conn, DB_INIT_PATH)
+    conn.execute("INSERT INTO users (user_id, username, encrypted_passkey) VALUES (1, 'alice', 'x');")
+    conn.execute("INSERT INTO articles (article_id, title, submitter_user_id) VALUES (1, 'First', 1), (2, 'Second', 1);")
+    conn.commit()
+    conn.close()
+    pool = ConnectionPool(db_path)
+    yield pool
+    pool.close_all()
+
+# the flusher thread never wakes on its own during a test, every write comes from flush() or close()
+def make_buffer(pool: ConnectionPool, **kwargs) -> AuditLogBuffer:
+    return AuditLogBuffer(pool, flush_interval_seconds=3600, **kwargs)
+
+def count(pool: ConnectionPool, table: str) -> int:
+    return pool.reader().execute(f'SELECT COUNT(*) FROM {table};').fetchone()[0]
+
+def test_flush_writes_every_table_in_one_batch(pool):
+    buffer = make_buffer(pool)
+    try:
+        assert buffer.log_user_action(1, 3)
+        assert buffer.log_article_action(1, 1, 1)
+        assert buffer.log_article_read(1, 2)
+        assert count(pool, 'user_logs') == 0
+        assert buffer.flush() == 3
+        assert (count(pool, 'user_logs'), count(pool, 'article_logs'), count(pool, 'user_reads')) == (1, 1, 1)
+        assert buffer.flush() == 0
+        assert buffer.stats() == {'queued': 0, 'flushed': 3, 'dropped': 0, 'failed': 0, 'batches': 1}
+    finally:
+        buffer.close()
+
+def test_pending_reads_until_flushed(pool):
+    buffer = make_buffer(pool)
+    try:
+        buffer.log_article_read(1, 1)
+        buffer.log_article_read(1, 2)
+        buffer.log_article_read(2, 1)
+        assert buffer.pending_reads(1) == {1, 2}
+        buffer.flush()
+        assert buffer.pending_reads(1) == set()
+    finally:
+        buffer.close()
+
+def test_events_past_max_pending_are_dropped(pool):
+    buffer = make_buffer(pool, max_pending=2)
+    try:
+        assert buffer.log_user_action(1, 3)
+        assert buffer.log_user_action(1, 4)
+        assert not buffer.log_user_action(1, 3)
+        assert buffer.stats()['dropped'] == 1
+        assert buffer.flush() == 2
+        # a flush frees room again
+        assert buffer.log_user_action(1, 3)
+    finally:
+        buffer.close()
+
+def test_unknown_table_is_rejected(pool):
+    buffer = make_buffer(pool)
+    try:
+        with pytest.raises(ValueError):
+            buffer.append('users', (1,))
+    finally:
+        buffer.close()
+
+def test_close_writes_what_is_queued_and_stops_accepting(pool):
+    buffer = make_buffer(pool)
+    buffer.log_user_action(1, 3)
+    buffer.log_article_read(1, 1)
+    buffer.close()
+    assert not buffer.flusher.is_alive()
+    assert (count(pool, 'user_logs'), count(pool, 'user_reads')) == (1, 1)
+    assert not buffer.log_user_action(1, 4)
+    assert buffer.stats()['dropped'] == 1
+    # a second close is a no-op
+    buffer.close()
+
+def test_failed_batch_is_counted_and_not_retried(pool):
+    buffer = make_buffer(pool)
+    try:
+        # user 99 does not exist, so the foreign key fails the whole transaction
+        buffer.log_user_action(1, 3)
+        buffer.log_user_action(99, 3)
+        assert buffer.flush() == 0
+        assert count(pool, 'user_logs') == 0
+        assert buffer.stats()['failed'] == 2 and buffer.stats()['queued'] == 0
+    finally:
+        buffer.close()
+
+def test_on_flush_sees_the_batch_and_cannot_lose_it(pool):
+    seen = []
+    def on_flush(conn, rows_by_table):
+        seen.append({table: len(rows) for table, rows in rows_by_table.items()})
+        conn.execute("INSERT INTO users (user_id, username, encrypted_passkey) VALUES (2, 'bob', 'x');")
+        raise RuntimeError('hook failed')
+    buffer = make_buffer(pool, on_flush=on_flush)
+    try:
+        buffer.log_article_read(1, 1)
+        buffer.log_article_read(1, 2)
+        assert buffer.flush() == 2
+        assert seen == [{'user_reads': 2}]
+        # the hook's own writes are rolled back, the log rows are kept
+        assert count(pool, 'user_reads') == 2 and count(pool, 'users') == 1
+    finally:
+        buffer.close()
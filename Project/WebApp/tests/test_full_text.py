@@ -0,0 +1,67 @@
+import pathlib as pl
+import sqlite3 as sq3
+import pytest
+from helper_scripts.full_text import BM25_WEIGHTS, fts_query, index_article, unindex_article
+from helper_scripts.migrations import apply_migrations
+
+DB_INIT_PATH = pl.Path(__file__).resolve().parent.parent / 'db_init.sql'
+
+@pytest.fixture
+def conn():
+    conn = sq3.connect(':memory:')
+    apply_migrations(conn, DB_INIT_PATH)
+    yield conn
+    conn.close()
+
+# article ids matching text, best bm25 score first, the way search_articles orders them
+def search(conn: sq3.Connection, text: str, column: str | None = None) -> list[int]:
+    return [row[0] for row in conn.execute(
+        f'SELECT rowid FROM articles_fts WHERE articles_fts MATCH ? ORDER BY bm25(articles_fts, {", ".join(str(w) for w in BM25_WEIGHTS)});',
+        (fts_query(text, column),),
+    )]
+
+def test_words_become_quoted_terms():
+    assert fts_query('protein folding') == '"protein" "folding"*'
+    assert fts_query('protein folding', prefix_last=False) == '"protein" "folding"'
+    assert fts_query('protein', column='title') == 'title : ("protein"*)'
+
+def test_no_searchable_words():
+    assert fts_query('') is None
+    assert fts_query(None) is None
+    assert fts_query('  -- ** "" ') is None
+
+def test_fts_syntax_is_escaped():
+    # operators, column filters, quotes and parentheses are dropped or quoted as plain words
+    assert fts_query('cells NOT "protein" OR title:gene*') == '"cells" "NOT" "protein" "OR" "title" "gene"*'
+    assert fts_query('NEAR(a b) ^c') == '"NEAR" "a" "b" "c"*'
+
+@pytest.mark.parametrize('text', ['AND', 'a OR', '"unbalanced', 'title:', 'NEAR(', '-x', '(((', 'body : x', '*'])
+def test_hostile_input_never_breaks_the_match(conn, text):
+    index_article(conn, 1, 'AND OR', 'x', 'near title body unbalanced')
+    if fts_query(text) is None:
+        return
+    search(conn, text)
+
+def test_prefix_match_on_the_last_word(conn):
+    index_article(conn, 1, 'Protein folding', 'A. Author', 'How chains fold.')
+    assert search(conn, 'protein fol') == [1]
+    assert search(conn, 'prot folding') == []
+
+def test_title_matches_outrank_body_matches(conn):
+    index_article(conn, 1, 'Unrelated title', 'A. Author', 'ribosome ribosome assembly in cells')
+    index_article(conn, 2, 'Ribosome assembly', 'B. Author', 'a short note on cells')
+    index_article(conn, 3, 'Cell walls', 'Ribosome Lab', 'nothing about it here')
+    assert search(conn, 'ribosome') == [2, 3, 1]
+
+def test_column_filter(conn):
+    index_article(conn, 1, 'Genes', 'A. Author', 'a body about proteins')
+    index_article(conn, 2, 'Proteins', 'A. Author', 'a body about genes')
+    assert search(conn, 'proteins', column='title') == [2]
+    assert sorted(search(conn, 'proteins')) == [1, 2]
+
+def test_reindex_and_unindex(conn):
+    index_article(conn, 1, 'Old title', None, 'old body')
+    index_article(conn, 1, 'New title', None, 'new body')
+    assert search(conn, 'old') == [] and search(conn, 'new') == [1]
+    unindex_article(conn, 1)
+    assert search(conn, 'new') == []
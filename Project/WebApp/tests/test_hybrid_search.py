@@ -0,0 +1,23 @@
+from helper_scripts.hybrid_search import RRF_K, normalize_query, reciprocal_rank_fusion
+
+def test_normalize_query():
+    assert normalize_query('  Protein   Folding\n') == 'protein folding'
+    assert normalize_query('') == ''
+    assert normalize_query(None) == ''
+
+def test_fusion_scores():
+    fused = dict(reciprocal_rank_fusion([[1, 2], [2, 3]]))
+    assert fused[2] == 1 / (RRF_K + 2) + 1 / (RRF_K + 1)
+    assert fused[1] == 1 / (RRF_K + 1)
+    assert fused[3] == 1 / (RRF_K + 2)
+
+def test_ids_in_both_lists_rise_to_the_top():
+    keyword = [10, 11, 12, 13]
+    semantic = [20, 21, 13, 22]
+    assert [article_id for article_id, _ in reciprocal_rank_fusion([keyword, semantic])][:3] == [13, 10, 20]
+
+def test_ties_keep_first_seen_order():
+    assert [article_id for article_id, _ in reciprocal_rank_fusion([[5, 4], [7, 6]])] == [5, 7, 4, 6]
+    # an empty semantic list (the embedding missed its budget) leaves the keyword order as it was
+    assert [article_id for article_id, _ in reciprocal_rank_fusion([[5, 4], []])] == [5, 4]
+    assert reciprocal_rank_fusion([[], []]) == []
@@ -0,0 +1,111 @@
+import os
+import pytest
+from helper_scripts.article_store import PackArticleStore
+
+@pytest.fixture
+def store(tmp_path):
+    pack_store = PackArticleStore(tmp_path, cache_bytes=2**20, max_pack_bytes=4096)
+    yield pack_store
+    pack_store.close()
+
+def test_write_and_read(store):
+    store.write('articles', 1, 'first article')
+    store.write('summaries', 1, 'first summary')
+    store.write('articles', 2, 'ünïcödé ' * 50)
+    assert store.read('articles', 1) == 'first article'
+    assert store.read('summaries', 1) == 'first summary'
+    assert store.read('articles', 2) == 'ünïcödé ' * 50
+    assert store.exists('articles', 2) and not store.exists('summaries', 2)
+    assert store.ids('articles') == [1, 2]
+    with pytest.raises(FileNotFoundError):
+        store.read('articles', 3)
+
+def test_exclusive_write(store):
+    store.write('articles', 1, 'one')
+    with pytest.raises(FileExistsError):
+        store.write('articles', 1, 'again')
+    store.write('articles', 1, 'replaced', exclusive=False)
+    assert store.read('articles', 1) == 'replaced'
+    with pytest.raises(ValueError):
+        store.write('notes', 1, 'unknown kind')
+
+def test_read_many(store):
+    for article_id in range(1, 6):
+        store.write('articles', article_id, f'text {article_id}')
+    assert store.read_many('articles', [5, 1, 9, 3]) == {5: 'text 5', 1: 'text 1', 3: 'text 3'}
+    assert store.read_many('articles', []) == {}
+
+def test_delete(store):
+    store.write('articles', 1, 'one')
+    assert store.delete('articles', 1)
+    assert not store.delete('articles', 1)
+    assert not store.exists('articles', 1)
+    with pytest.raises(FileNotFoundError):
+        store.read('articles', 1)
+
+def test_new_pack_past_max_pack_bytes(store):
+    for article_id in range(1, 40):
+        store.write('articles', article_id, os.urandom(200).hex())
+    assert len(store.pack_ids()) > 1
+    assert all(os.path.getsize(store.pack_path(pack_id)) < 4096 + 1024 for pack_id in store.pack_ids())
+    assert len(store.read_many('articles', list(range(1, 40)))) == 39
+
+def test_compact_keeps_live_records(store):
+    texts = {article_id: os.urandom(100).hex() for article_id in range(1, 40)}
+    for article_id, text in texts.items():
+        store.write('articles', article_id, text)
+    for article_id in range(1, 40, 2):
+        store.delete('articles', article_id)
+    before = store.stats()
+    reclaimed = store.compact()
+    after = store.stats()
+    assert reclaimed > 0 and after['pack_bytes'] == before['pack_bytes'] - reclaimed
+    assert after['records'] == before['records'] == 19
+    assert store.read_many('articles', list(texts)) == {article_id: text for article_id, text in texts.items() if article_id % 2 == 0}
+    # nothing left to reclaim
+    assert store.compact() == 0
+
+def test_compact_never_reuses_a_pack_id(store):
+    store.write('articles', 1, 'old text')
+    assert store.read('articles', 1) == 'old text'
+    old_pack = store.pack_ids()[-1]
+    store.delete('articles', 1)
+    store.compact()
+    # the newest pack and the empty compaction target are both gone
+    assert store.pack_ids() == []
+    store.write('articles', 2, 'new text')
+    assert store.pack_ids()[-1] > old_pack + 1
+    assert store.read('articles', 2) == 'new text'
+
+def test_pack_ids_survive_reopen(tmp_path):
+    store = PackArticleStore(tmp_path)
+    store.write('articles', 1, 'text')
+    store.delete('articles', 1)
+    store.compact()
+    store.close()
+    reopened = PackArticleStore(tmp_path)
+    try:
+        reopened.write('articles', 2, 'text')
+        assert reopened.pack_ids() == [3]
+    finally:
+        reopened.close()
+
+def test_compaction_drops_cached_records(store):
+    store.write('articles', 1, 'one')
+    store.write('articles', 2, 'two')
+    store.read('articles', 1)
+    store.read('articles', 2)
+    store.delete('articles', 2)
+    store.compact(min_live_ratio=1.0)
+    assert store.cache.stats()['invalidations'] == 2
+    assert store.read('articles', 1) == 'one'
+
+def test_reads_from_a_second_store(tmp_path, store):
+    store.write('articles', 1, 'shared')
+    other = PackArticleStore(tmp_path)
+    try:
+        assert other.read('articles', 1) == 'shared'
+        store.write('articles', 2, 'written after the other store mapped the pack')
+        assert other.read('articles', 2) == 'written after the other store mapped the pack'
+    finally:
+        other.close()
@@ -0,0 +1,41 @@
+import base64
+from helper_scripts.pagination import FIRST_PAGE_KEY, decode_cursor, encode_cursor, page_key, split_page
+
+def test_cursor_round_trip():
+    for submitted_timestamp, article_id in [('2024-01-01 00:00:00', 1), ('1999-12-31 23:59:59', 2**62), ('2024-06-15 12:30:45', 123456)]:
+        cursor = encode_cursor(submitted_timestamp, article_id)
+        assert '=' not in cursor
+        assert decode_cursor(cursor) == (submitted_timestamp, article_id)
+
+def test_cursor_is_url_safe():
+    # ids whose encoding would contain + or / in standard base64
+    for article_id in range(2000):
+        cursor = encode_cursor('2024-01-01 00:00:00', article_id)
+        assert '+' not in cursor and '/' not in cursor
+        assert decode_cursor(cursor) == ('2024-01-01 00:00:00', article_id)
+
+def test_invalid_cursors_decode_to_none():
+    def encode(raw: bytes) -> str:
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    for cursor in ['', 'not a cursor', '@@@', encode(b'2024-01-01 00:00:00'), encode(b'2024-01-01 00:00:00|x'), encode(b'2024-13-01 00:00:00|1'), encode(b'a|b|c'), encode(b'\xff\xfe|1')]:
+        assert decode_cursor(cursor) is None, cursor
+
+def test_page_key():
+    assert page_key(None) == FIRST_PAGE_KEY
+    assert page_key(encode_cursor('2024-01-01 00:00:00', 5)) == ('2024-01-01 00:00:00', 5)
+    assert page_key('garbage') is None
+
+def test_split_page():
+    rows = [(article_id, f'2024-01-{31 - article_id:02d} 00:00:00') for article_id in range(1, 8)]
+    page, next_cursor = split_page(rows[:4], 3, timestamp_index=1)
+    assert page == rows[:3]
+    assert decode_cursor(next_cursor) == (rows[2][1], rows[2][0])
+    # exactly limit rows (or fewer) is the last page
+    assert split_page(rows[:3], 3, timestamp_index=1) == (rows[:3], None)
+    assert split_page(rows[:1], 3, timestamp_index=1) == (rows[:1], None)
+    assert split_page([], 3, timestamp_index=1) == ([], None)
+
+def test_split_page_id_index():
+    rows = [('2024-01-02 00:00:00', 'title', 9), ('2024-01-01 00:00:00', 'title', 4)]
+    _, next_cursor = split_page(rows, 1, timestamp_index=0, id_index=2)
+    assert decode_cursor(next_cursor) == ('2024-01-02 00:00:00', 9)
@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+from helper_scripts.vector_index import VectorMatrix
+
+def unit(*values: float) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+# ids 1..n with vectors at increasing angles from (1, 0), so scores against (1, 0) fall with the id
+def fan(n: int) -> tuple[list[int], np.ndarray]:
+    angles = np.linspace(0.0, np.pi / 2, n)
+    return (list(range(1, n + 1)), np.stack([np.cos(angles), np.sin(angles)], axis=1).astype(np.float32))
+
+@pytest.fixture(params=['memory', 'mmap'])
+def matrix(request, tmp_path):
+    vectors = VectorMatrix(initial_capacity=2) if request.param == 'memory' else VectorMatrix(initial_capacity=2, mmap_path=tmp_path / 'vectors')
+    yield vectors
+    vectors.close()
+
+def test_add_get_and_grow(matrix):
+    ids, vectors = fan(10)
+    for article_id, vector in zip(ids, vectors):
+        matrix.add(article_id, vector)
+    assert len(matrix) == 10 and matrix.capacity >= 10
+    assert np.allclose(matrix.get(7), vectors[6])
+    assert matrix.get(99) is None
+    # adding an existing id replaces its vector in place
+    matrix.add(7, unit(0, 1))
+    assert len(matrix) == 10 and np.allclose(matrix.get(7), unit(0, 1))
+
+def test_add_many_matches_add(matrix):
+    ids, vectors = fan(50)
+    matrix.add_many(ids[:30], vectors[:30])
+    matrix.add_many(ids[20:], vectors[20:])
+    assert len(matrix) == 50
+    assert all(np.allclose(matrix.get(article_id), vector) for article_id, vector in zip(ids, vectors))
+
+def test_top_k_order_and_k_bounds(matrix):
+    ids, vectors = fan(20)
+    matrix.add_many(ids, vectors)
+    query = unit(1, 0)
+    assert [article_id for article_id, _ in matrix.top_k(query, 5)] == [1, 2, 3, 4, 5]
+    # k == size - 1, k == size and k > size go through the argpartition and full-sort branches
+    assert [article_id for article_id, _ in matrix.top_k(query, 19)] == ids[:19]
+    assert [article_id for article_id, _ in matrix.top_k(query, 20)] == ids
+    assert [article_id for article_id, _ in matrix.top_k(query, 100)] == ids
+    assert matrix.top_k(query, 0) == []
+    scores = [score for _, score in matrix.top_k(query, 20)]
+    assert scores == sorted(scores, reverse=True)
+
+def test_top_k_on_empty_matrix(matrix):
+    assert matrix.top_k(unit(1, 0), 3) == []
+
+def test_top_k_exclude_ids(matrix):
+    ids, vectors = fan(10)
+    matrix.add_many(ids, vectors)
+    query = unit(1, 0)
+    assert [article_id for article_id, _ in matrix.top_k(query, 3, exclude_ids=[1, 3])] == [2, 4, 5]
+    # excluded rows are dropped rather than padded with -inf scores
+    assert [article_id for article_id, _ in matrix.top_k(query, 10, exclude_ids=ids[2:])] == [1, 2]
+    assert matrix.top_k(query, 3, exclude_ids=ids) == []
+    assert [article_id for article_id, _ in matrix.top_k(query, 2, exclude_ids=iter([1]))] == [2, 3]
+    assert [article_id for article_id, _ in matrix.top_k(query, 2, exclude_ids=[])] == [1, 2]
+
+def test_remove(matrix):
+    ids, vectors = fan(10)
+    matrix.add_many(ids, vectors)
+    assert matrix.remove(1) and matrix.remove(10) and matrix.remove(5)
+    assert not matrix.remove(5) and not matrix.remove(99)
+    assert len(matrix) == 7 and 5 not in matrix and 6 in matrix
+    query = unit(1, 0)
+    assert [article_id for article_id, _ in matrix.top_k(query, 3)] == [2, 3, 4]
+    assert [article_id for article_id, _ in matrix.top_k(query, 10)] == [2, 3, 4, 6, 7, 8, 9]
+    # the rows that moved or stayed still hold their own vectors
+    assert all(np.allclose(matrix.get(article_id), vectors[article_id - 1]) for article_id in [2, 3, 4, 6, 7, 8, 9])
+    matrix.add(5, vectors[4])
+    assert [article_id for article_id, _ in matrix.top_k(query, 5)] == [2, 3, 4, 5, 6]
+
+def test_snapshot_skips_removed_rows(matrix):
+    ids, vectors = fan(6)
+    matrix.add_many(ids, vectors)
+    matrix.remove(2)
+    snapshot_ids, snapshot_vectors = matrix.snapshot()
+    assert sorted(snapshot_ids.tolist()) == [1, 3, 4, 5, 6]
+    assert all(np.allclose(vector, vectors[article_id - 1]) for article_id, vector in zip(snapshot_ids.tolist(), snapshot_vectors))
+
+def test_dimension_mismatch(matrix):
+    matrix.add(1, unit(1, 0))
+    with pytest.raises(ValueError):
+        matrix.add(2, np.ones(3, dtype=np.float32))
+
+def test_mmap_tombstones_survive_reopen(tmp_path):
+    ids, vectors = fan(30)
+    matrix = VectorMatrix(initial_capacity=4, mmap_path=tmp_path / 'vectors')
+    matrix.add_many(ids, vectors)
+    matrix.remove(1)
+    matrix.remove(2)
+    assert matrix.tombstones == 2 and len(matrix) == 28
+    matrix.close()
+    reopened = VectorMatrix(mmap_path=tmp_path / 'vectors')
+    try:
+        assert len(reopened) == 28 and reopened.tombstones == 2
+        assert 1 not in reopened and 3 in reopened
+        # tombstoned rows keep their vectors on disk but never come back from top_k
+        assert [article_id for article_id, _ in reopened.top_k(unit(1, 0), 3)] == [3, 4, 5]
+        assert [article_id for article_id, _ in reopened.top_k(unit(1, 0), 30)] == ids[2:]
+        reopened.add(31, unit(1, 0))
+        assert reopened.top_k(unit(1, 0), 1)[0][0] == 31
+    finally:
+        reopened.close()
+
+def test_mmap_compacts_past_the_tombstone_fraction(tmp_path):
+    ids, vectors = fan(20)
+    matrix = VectorMatrix(initial_capacity=4, mmap_path=tmp_path / 'vectors')
+    matrix.add_many(ids, vectors)
+    for article_id in range(1, 6):
+        matrix.remove(article_id)
+    assert matrix.tombstones == 5 and matrix.size == 20
+    # the sixth tombstone passes a quarter of the rows and the live rows move down over them
+    matrix.remove(20)
+    assert matrix.tombstones == 0 and matrix.size == 14 and len(matrix) == 14
+    assert matrix.ids[:14].tolist() == ids[5:19]
+    assert all(np.allclose(matrix.get(article_id), vectors[article_id - 1]) for article_id in ids[5:19])
+    assert [article_id for article_id, _ in matrix.top_k(unit(1, 0), 3)] == [6, 7, 8]
+    matrix.close()
+    reopened = VectorMatrix(mmap_path=tmp_path / 'vectors')
+    try:
+        assert len(reopened) == 14 and reopened.tombstones == 0
+        assert sorted(reopened.id_to_row) == ids[5:19]
+    finally:
+        reopened.close()
+
+def test_mmap_reopen_drops_rows_left_twice(tmp_path):
+    ids, vectors = fan(4)
+    matrix = VectorMatrix(mmap_path=tmp_path / 'vectors')
+    matrix.add_many(ids, vectors)
+    # what a compaction stopped between copying row 3 down and shrinking the file leaves behind
+    matrix.ids[0] = 3
+    matrix.close()
+    reopened = VectorMatrix(mmap_path=tmp_path / 'vectors')
+    try:
+        assert len(reopened) == 3 and reopened.tombstones == 1
+        assert [article_id for article_id, _ in reopened.top_k(unit(1, 0), 4)] == [2, 3, 4]
+    finally:
+        reopened.close()
+
+def test_mmap_file_has_a_single_writer(tmp_path):
+    matrix = VectorMatrix(mmap_path=tmp_path / 'vectors')
+    try:
+        matrix.add(1, unit(1, 0))
+        with pytest.raises(RuntimeError):
+            VectorMatrix(mmap_path=tmp_path / 'vectors')
+    finally:
+        matrix.close()
+    VectorMatrix(mmap_path=tmp_path / 'vectors').close()
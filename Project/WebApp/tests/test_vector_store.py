@@ -0,0 +1,66 @@
+import io
+import pickle
+import sqlite3 as sq3
+import numpy as np
+import pytest
+from helper_scripts.vector_store import _NumpyOnlyUnpickler, decode_legacy_vector, decode_vector_rows, deserialize_vector, migrate_pickled_vectors, serialize_vector
+
+# unpickling it calls record.append('ran'), standing in for a crafted blob that runs code
+class _Payload:
+    def __init__(self, record: list[str]) -> None:
+        self.record = record
+
+    def __reduce__(self):
+        return (self.record.append, ('ran',))
+
+def test_raw_round_trip():
+    vector = np.arange(4, dtype=np.float32)
+    assert len(serialize_vector(vector)) == 16
+    assert np.array_equal(deserialize_vector(serialize_vector(vector)), vector)
+
+def test_legacy_pickle_is_decoded():
+    vector = np.linspace(-1, 1, 8).astype(np.float32)
+    for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+        assert np.array_equal(decode_legacy_vector(pickle.dumps(vector, protocol=protocol)), vector)
+
+def test_legacy_pickle_of_other_globals_is_refused():
+    record: list[str] = []
+    blob = pickle.dumps(_Payload(record), protocol=2)
+    with pytest.raises(pickle.UnpicklingError):
+        _NumpyOnlyUnpickler(io.BytesIO(blob)).load()
+    assert decode_legacy_vector(blob) is None
+    assert record == []
+
+def test_non_vector_pickles_are_not_legacy_vectors():
+    assert decode_legacy_vector(pickle.dumps([1.0, 2.0], protocol=2)) is None
+    # a raw blob is never mistaken for a pickle
+    assert decode_legacy_vector(serialize_vector(np.ones(4, dtype=np.float32))) is None
+
+def test_decode_vector_rows_mixes_raw_and_legacy():
+    raw = np.array([1, 0, 0], dtype=np.float32)
+    legacy = np.array([0, 1, 0], dtype=np.float32)
+    ids, matrix, converted = decode_vector_rows([(1, serialize_vector(raw)), (2, pickle.dumps(legacy, protocol=4))])
+    assert ids.tolist() == [1, 2]
+    assert np.array_equal(matrix, np.stack([raw, legacy]))
+    assert [article_id for article_id, _ in converted] == [2]
+
+def test_decode_vector_rows_rejects_mixed_sizes():
+    with pytest.raises(ValueError):
+        decode_vector_rows([(1, serialize_vector(np.ones(3))), (2, serialize_vector(np.ones(4)))])
+
+def test_migrate_rewrites_only_legacy_rows():
+    conn = sq3.connect(':memory:')
+    conn.execute('CREATE TABLE article_heuristics (article_id INTEGER PRIMARY KEY, vector BLOB);')
+    record: list[str] = []
+    rows = [
+        (1, serialize_vector(np.ones(2, dtype=np.float32))),
+        (2, pickle.dumps(np.array([3, 4], dtype=np.float32), protocol=2)),
+        (3, pickle.dumps(_Payload(record), protocol=2)),
+    ]
+    conn.executemany('INSERT INTO article_heuristics (article_id, vector) VALUES (?, ?);', rows)
+    assert migrate_pickled_vectors(conn, batch_size=1) == 1
+    stored = dict(conn.execute('SELECT article_id, vector FROM article_heuristics;').fetchall())
+    assert stored[1] == rows[0][1]
+    assert np.array_equal(deserialize_vector(stored[2]), [3, 4])
+    # the refused blob is left as it was for someone to look at
+    assert stored[3] == rows[2][1] and record == []